@@ -1,7 +1,11 @@
 import os
+from concurrent.futures import ThreadPoolExecutor
 
 from spiffworkflow_proxy.blueprint import proxy_blueprint
 from flask import Flask
+from flask import jsonify
+from flask import request
+from flask.wrappers import Response
 
 app = Flask(__name__)
 app.config.from_pyfile("config.py", silent=True)
@@ -14,5 +18,24 @@ if app.config.get("ENV", "development") != "production":
 # available services.
 app.register_blueprint(proxy_blueprint)
 
+
+# Runs a batch of commands, as sent by spiffworkflow-backend when several service tasks
+# are ready at once, by handing each of them to the /v1/do endpoint of the blueprint.
+# The request looks like {"commands": [{"operator_identifier": "...", "params": {...}}]}
+# and the response has the status code and body /v1/do returned for each command, in order.
+@app.route("/v1/do-batch", methods=["POST"])
+def do_batch() -> Response:
+    commands = request.get_json()["commands"]
+
+    def do_command(command: dict) -> dict:
+        with app.test_client() as client:
+            response = client.post(f"/v1/do/{command['operator_identifier']}", json=command["params"])
+            return {"status_code": response.status_code, "body": response.get_data(as_text=True)}
+
+    with ThreadPoolExecutor(max_workers=max(1, min(len(commands), 20))) as executor:
+        responses = list(executor.map(do_command, commands))
+    return jsonify({"responses": responses})
+
+
 if __name__ == "__main__":
     app.run(host="localhost", port=7004)
@@ -0,0 +1,108 @@
+"""Compares saving task, bpmn process and event rows with the orm bulk methods against BulkWriter.
+
+Usage: benchmark_bulk_writes.py PROCESS_INSTANCE_ID [ROW_COUNT]
+
+Rows are copies of the rows of the given process instance with new guids. Everything is rolled back afterwards.
+"""
+
+import sys
+import time
+from collections.abc import Callable
+from uuid import uuid4
+
+from spiffworkflow_backend import create_app
+from spiffworkflow_backend.helpers.bulk_writer import BulkWriter
+from spiffworkflow_backend.helpers.query_counter import count_queries
+from spiffworkflow_backend.models.bpmn_process import BpmnProcessModel
+from spiffworkflow_backend.models.db import db
+from spiffworkflow_backend.models.process_instance import ProcessInstanceModel
+from spiffworkflow_backend.models.process_instance_event import ProcessInstanceEventModel
+from spiffworkflow_backend.models.task import TaskModel
+
+
+def new_task_models(task_models: list[TaskModel], row_count: int) -> list[TaskModel]:
+    return [
+        TaskModel(
+            guid=str(uuid4()),
+            bpmn_process_id=task_model.bpmn_process_id,
+            process_instance_id=task_model.process_instance_id,
+            task_definition_id=task_model.task_definition_id,
+            state=task_model.state,
+            properties_json=task_model.properties_json,
+            json_data_hash=task_model.json_data_hash,
+            python_env_data_hash=task_model.python_env_data_hash,
+            runtime_info=task_model.runtime_info,
+            start_in_seconds=task_model.start_in_seconds,
+            end_in_seconds=task_model.end_in_seconds,
+        )
+        for task_model in (task_models[index % len(task_models)] for index in range(row_count))
+    ]
+
+
+def new_events(process_instance: ProcessInstanceModel, row_count: int) -> list[ProcessInstanceEventModel]:
+    return [
+        ProcessInstanceEventModel(
+            process_instance_id=process_instance.id,
+            event_type="task_completed",
+            task_guid=str(uuid4()),
+            timestamp=time.time(),
+        )
+        for _ in range(row_count)
+    ]
+
+
+def upsert_with_bulk_writer(models: list) -> None:
+    # BulkWriter writes one table at a time
+    BulkWriter.upsert_models([model for model in models if isinstance(model, TaskModel)])
+    BulkWriter.upsert_models([model for model in models if isinstance(model, BpmnProcessModel)])
+
+
+def time_write(name: str, write: Callable[[], None]) -> None:
+    start = time.perf_counter()
+    with count_queries() as query_counter:
+        write()
+        db.session.flush()
+    elapsed = time.perf_counter() - start
+    db.session.rollback()
+    print(f"{name:<45} {elapsed:>8.3f}s {query_counter.count:>6} statements")  # noqa: T201
+
+
+def main(process_instance_id: int, row_count: int) -> None:
+    app = create_app()
+    with app.app_context():
+        process_instance = ProcessInstanceModel.query.filter_by(id=process_instance_id).first()
+        if process_instance is None:
+            raise Exception(f"Could not find process instance: {process_instance_id}")
+        task_models = TaskModel.query.filter_by(process_instance_id=process_instance.id).all()
+        bpmn_processes = BpmnProcessModel.query.filter_by(top_level_process_id=process_instance.bpmn_process_id).all()
+        bpmn_processes.append(process_instance.bpmn_process)
+        print(f"Writing {row_count} rows to {db.engine.dialect.name}")  # noqa: T201
+
+        time_write(
+            "insert tasks with bulk_save_objects", lambda: db.session.bulk_save_objects(new_task_models(task_models, row_count))
+        )
+        time_write("insert tasks with BulkWriter", lambda: BulkWriter.upsert_models(new_task_models(task_models, row_count)))
+        time_write(
+            "insert events with bulk_save_objects", lambda: db.session.bulk_save_objects(new_events(process_instance, row_count))
+        )
+        time_write("insert events with BulkWriter", lambda: BulkWriter.insert_models(new_events(process_instance, row_count)))
+
+        def update_existing(write: Callable[[list], None]) -> Callable[[], None]:
+            def update() -> None:
+                existing_task_models = TaskModel.query.filter_by(process_instance_id=process_instance.id).all()
+                for task_model in existing_task_models:
+                    task_model.runtime_info = {"benchmark": str(uuid4())}
+                for bpmn_process in bpmn_processes:
+                    bpmn_process.properties_json = {**bpmn_process.properties_json, "benchmark": str(uuid4())}
+                write(existing_task_models + bpmn_processes)
+
+            return update
+
+        time_write("update existing rows with bulk_save_objects", update_existing(db.session.bulk_save_objects))
+        time_write("update existing rows with BulkWriter", update_existing(upsert_with_bulk_writer))
+
+
+if len(sys.argv) < 2:
+    raise Exception("Process instance id not supplied")
+
+main(int(sys.argv[1]), int(sys.argv[2]) if len(sys.argv) > 2 else 1000)
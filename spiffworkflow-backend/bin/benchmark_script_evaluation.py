@@ -0,0 +1,50 @@
+"""Compares evaluating gateway conditions and running script tasks with and without the compiled code cache.
+
+Usage: benchmark_script_evaluation.py [ITERATION_COUNT]
+
+Each iteration evaluates a condition and runs a short script against the same task data, like an exclusive gateway
+and a script task in a loop or a multi-instance body would.
+"""
+
+import sys
+import time
+
+from spiffworkflow_backend import create_app
+from spiffworkflow_backend.helpers.lru_cache import LruCache
+from spiffworkflow_backend.services.process_instance_processor import BaseCustomScriptEngineEnvironment
+from spiffworkflow_backend.services.process_instance_processor import CustomBpmnScriptEngine
+
+CONDITION = "invoice_total > 1000 and approver_group in ['finance', 'management'] and not is_expedited"
+SCRIPT = """
+line_totals = [line["quantity"] * line["price"] for line in lines]
+invoice_total = sum(line_totals)
+needs_review = invoice_total > 1000
+"""
+
+
+def time_iterations(name: str, code_cache_size: int, iteration_count: int) -> None:
+    BaseCustomScriptEngineEnvironment._code_cache = LruCache(code_cache_size)
+    environment = CustomBpmnScriptEngine().environment
+    task_data = {
+        "invoice_total": 1500,
+        "approver_group": "finance",
+        "is_expedited": False,
+        "lines": [{"quantity": 3, "price": 250}, {"quantity": 1, "price": 800}],
+    }
+    start = time.perf_counter()
+    for _ in range(iteration_count):
+        environment.evaluate(CONDITION, task_data)
+        environment.execute(SCRIPT, task_data)
+    elapsed = time.perf_counter() - start
+    print(f"{name:<25} {elapsed:>8.3f}s {elapsed / iteration_count * 1_000_000:>8.1f}us per iteration")  # noqa: T201
+
+
+def main(iteration_count: int) -> None:
+    app = create_app()
+    with app.app_context():
+        print(f"Running {iteration_count} iterations")  # noqa: T201
+        time_iterations("without code cache", 0, iteration_count)
+        time_iterations("with code cache", 100, iteration_count)
+
+
+main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
@@ -0,0 +1,105 @@
+"""empty message
+
+Revision ID: 39b07256091c
+Revises: d9a8e5d05ee7
+Create Date: 2026-10-17 11:41:06.618400
+
+"""
+import json
+import zlib
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+# revision identifiers, used by Alembic.
+revision = '39b07256091c'
+down_revision = 'd9a8e5d05ee7'
+branch_labels = None
+depends_on = None
+
+json_data_table = sa.table(
+    'json_data',
+    sa.column('hash', sa.String),
+    sa.column('data', sa.JSON),
+    sa.column('codec', sa.String),
+    sa.column('compressed_data', sa.LargeBinary),
+    sa.column('dictionary_id', sa.Integer),
+)
+json_data_dictionary_table = sa.table(
+    'json_data_dictionary',
+    sa.column('id', sa.Integer),
+    sa.column('dictionary', sa.LargeBinary),
+)
+
+
+def decompress_into_data_column() -> None:
+    """Fills in data from compressed_data so no record loses its data when the compressed columns are dropped.
+
+    The records are marked as not looked at for compression yet so they can be compressed again later.
+    """
+    conn = op.get_bind()
+    dictionary_bytes_by_id: dict[int, bytes] = {}
+    while True:
+        rows = conn.execute(
+            sa.select(
+                json_data_table.c.hash,
+                json_data_table.c.codec,
+                json_data_table.c.compressed_data,
+                json_data_table.c.dictionary_id,
+            )
+            .where(json_data_table.c.compressed_data.is_not(None))
+            .limit(1000)
+        ).all()
+        if not rows:
+            break
+        for row in rows:
+            dictionary_bytes = None
+            if row.dictionary_id is not None:
+                if row.dictionary_id not in dictionary_bytes_by_id:
+                    dictionary_bytes_by_id[row.dictionary_id] = conn.execute(
+                        sa.select(json_data_dictionary_table.c.dictionary).where(
+                            json_data_dictionary_table.c.id == row.dictionary_id
+                        )
+                    ).scalar_one()
+                dictionary_bytes = dictionary_bytes_by_id[row.dictionary_id]
+            if row.codec == 'zstd':
+                import zstandard  # type: ignore
+
+                dict_data = zstandard.ZstdCompressionDict(dictionary_bytes) if dictionary_bytes is not None else None
+                data_bytes = zstandard.ZstdDecompressor(dict_data=dict_data).decompress(row.compressed_data)
+            else:
+                decompressor = zlib.decompressobj(zdict=dictionary_bytes) if dictionary_bytes is not None else zlib.decompressobj()
+                data_bytes = decompressor.decompress(row.compressed_data) + decompressor.flush()
+            conn.execute(
+                json_data_table.update()
+                .where(json_data_table.c.hash == row.hash)
+                .values(data=json.loads(data_bytes), codec=None, compressed_data=None, dictionary_id=None)
+            )
+
+
+def upgrade():
+    # ### commands auto generated by Alembic - please adjust! ###
+    with op.batch_alter_table('json_data', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('compressed_data', sa.LargeBinary().with_variant(mysql.LONGBLOB(), 'mysql'), nullable=True))
+        batch_op.add_column(sa.Column('dictionary_id', sa.Integer(), nullable=True))
+        batch_op.alter_column('data',
+               existing_type=sa.JSON(),
+               nullable=True)
+        batch_op.create_foreign_key('json_data_dictionary_id_fk', 'json_data_dictionary', ['dictionary_id'], ['id'])
+
+    # ### end Alembic commands ###
+
+
+def downgrade():
+    decompress_into_data_column()
+    # ### commands auto generated by Alembic - please adjust! ###
+    with op.batch_alter_table('json_data', schema=None) as batch_op:
+        batch_op.drop_constraint('json_data_dictionary_id_fk', type_='foreignkey')
+        batch_op.alter_column('data',
+               existing_type=sa.JSON(),
+               nullable=False)
+        batch_op.drop_column('dictionary_id')
+        batch_op.drop_column('compressed_data')
+
+    # ### end Alembic commands ###
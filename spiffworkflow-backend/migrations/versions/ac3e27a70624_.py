@@ -0,0 +1,116 @@
+"""empty message
+
+Revision ID: ac3e27a70624
+Revises: 39b07256091c
+Create Date: 2026-10-17 12:20:25.329569
+
+"""
+import copy
+import json
+import zlib
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'ac3e27a70624'
+down_revision = '39b07256091c'
+branch_labels = None
+depends_on = None
+
+json_data_table = sa.table(
+    "json_data",
+    sa.column("hash", sa.String),
+    sa.column("data", sa.JSON),
+    sa.column("codec", sa.String),
+    sa.column("compressed_data", sa.LargeBinary),
+    sa.column("dictionary_id", sa.Integer),
+    sa.column("delta_base_hash", sa.String),
+)
+json_data_dictionary_table = sa.table(
+    "json_data_dictionary",
+    sa.column("id", sa.Integer),
+    sa.column("dictionary", sa.LargeBinary),
+)
+
+
+def stored_data(conn: sa.Connection, row: sa.Row) -> dict:
+    if row.compressed_data is None:
+        return row.data
+    dictionary_bytes = None
+    if row.dictionary_id is not None:
+        dictionary_bytes = conn.execute(
+            sa.select(json_data_dictionary_table.c.dictionary).where(json_data_dictionary_table.c.id == row.dictionary_id)
+        ).scalar_one()
+    if row.codec == "zstd":
+        import zstandard  # type: ignore
+
+        dict_data = zstandard.ZstdCompressionDict(dictionary_bytes) if dictionary_bytes is not None else None
+        data_bytes = zstandard.ZstdDecompressor(dict_data=dict_data).decompress(row.compressed_data)
+    else:
+        decompressor = zlib.decompressobj(zdict=dictionary_bytes) if dictionary_bytes is not None else zlib.decompressobj()
+        data_bytes = decompressor.decompress(row.compressed_data) + decompressor.flush()
+    return json.loads(data_bytes)
+
+
+def rebuild_deltas_in_full() -> None:
+    """Stores the data of every delta in full since older code cannot tell that a record is a delta.
+
+    Deltas whose bases are stored in full are rebuilt first, a level at a time, until none are left.
+    """
+    conn = op.get_bind()
+    base_table = json_data_table.alias("base")
+    columns = [
+        json_data_table.c.hash,
+        json_data_table.c.data,
+        json_data_table.c.codec,
+        json_data_table.c.compressed_data,
+        json_data_table.c.dictionary_id,
+    ]
+    while True:
+        rows = conn.execute(
+            sa.select(*columns, json_data_table.c.delta_base_hash)
+            .join(base_table, base_table.c.hash == json_data_table.c.delta_base_hash)
+            .where(json_data_table.c.delta_base_hash.is_not(None), base_table.c.delta_base_hash.is_(None))
+            .limit(1000)
+        ).all()
+        if not rows:
+            break
+        base_rows = conn.execute(
+            sa.select(*columns).where(json_data_table.c.hash.in_({row.delta_base_hash for row in rows}))
+        ).all()
+        base_data_by_hash = {base_row.hash: stored_data(conn, base_row) for base_row in base_rows}
+        for row in rows:
+            delta = stored_data(conn, row)
+            data = copy.deepcopy(base_data_by_hash[row.delta_base_hash])
+            for key in delta["removed"]:
+                del data[key]
+            data.update(delta["set"])
+            for key, items in delta["appended"].items():
+                data[key].extend(items)
+            conn.execute(
+                json_data_table.update()
+                .where(json_data_table.c.hash == row.hash)
+                .values(data=data, codec=None, compressed_data=None, dictionary_id=None, delta_base_hash=None)
+            )
+
+    remaining_delta_count = conn.execute(
+        sa.select(sa.func.count()).select_from(json_data_table).where(json_data_table.c.delta_base_hash.is_not(None))
+    ).scalar_one()
+    if remaining_delta_count > 0:
+        raise Exception(f"Could not rebuild {remaining_delta_count} json data deltas because their bases are missing")
+
+
+def upgrade():
+    # ### commands auto generated by Alembic - please adjust! ###
+    with op.batch_alter_table('json_data', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('delta_base_hash', sa.String(length=255), nullable=True))
+
+    # ### end Alembic commands ###
+
+
+def downgrade():
+    rebuild_deltas_in_full()
+    with op.batch_alter_table('json_data', schema=None) as batch_op:
+        batch_op.drop_column('delta_base_hash')
@@ -1,10 +1,92 @@
+import heapq
 import os
+import threading
+import time
+from collections.abc import Callable
+from datetime import datetime
+from datetime import timezone
 
 import flask.wrappers
 from apscheduler.schedulers.background import BackgroundScheduler  # type: ignore
 from apscheduler.schedulers.base import BaseScheduler  # type: ignore
 
 from spiffworkflow_backend.background_processing.background_processing_service import BackgroundProcessingService
+from spiffworkflow_backend.models.process_instance import ProcessInstanceStatus
+from spiffworkflow_backend.services.background_wakeup_service import BACKGROUND_WAKEUP_STATUS_TOPICS_WITHOUT_CELERY
+from spiffworkflow_backend.services.background_wakeup_service import BACKGROUND_WAKEUP_TOPIC_FUTURE_TASK
+from spiffworkflow_backend.services.background_wakeup_service import BACKGROUND_WAKEUP_TOPIC_MESSAGE
+from spiffworkflow_backend.services.background_wakeup_service import BackgroundWakeupService
+from spiffworkflow_backend.services.process_instance_service import ProcessInstanceService
+
+
+class BackgroundJobWaker:
+    """Moves up the next run of a scheduled job when a wakeup says there is work for it.
+
+    Jobs are added to the scheduler wrapped with wakeable and registered for a topic with the number of seconds after the
+    wakeup time at which they can find the work. A wakeup that comes in while its job is running is kept and runs the job
+    again once it finishes, since the running job may have looked for work before it was there.
+    """
+
+    # later wakeups are dropped. polling picks up their work.
+    MAX_PENDING_WAKEUPS_PER_JOB = 10000
+
+    def __init__(self, scheduler: BaseScheduler) -> None:
+        self.scheduler = scheduler
+        self._jobs_by_topic: dict[str, list[tuple[str, int]]] = {}
+        self._pending_wakeups: dict[str, list[int]] = {}
+        self._running_job_ids: set[str] = set()
+        self._lock = threading.Lock()
+
+    def wakeable(self, job_id: str, function: Callable[[], None]) -> Callable[[], None]:
+        self._pending_wakeups.setdefault(job_id, [])
+
+        def run_job() -> None:
+            self._job_started(job_id)
+            try:
+                function()
+            finally:
+                self._job_finished(job_id)
+
+        return run_job
+
+    def add_job(self, topic: str, job_id: str, delay_in_seconds: int = 0) -> None:
+        self._jobs_by_topic.setdefault(topic, []).append((job_id, delay_in_seconds))
+        self._pending_wakeups.setdefault(job_id, [])
+
+    def wake(self, topic: str, not_before_in_seconds: int) -> None:
+        for job_id, delay_in_seconds in self._jobs_by_topic.get(topic, []):
+            with self._lock:
+                pending_wakeups = self._pending_wakeups[job_id]
+                run_at_in_seconds = not_before_in_seconds + delay_in_seconds
+                if run_at_in_seconds not in pending_wakeups and len(pending_wakeups) < self.MAX_PENDING_WAKEUPS_PER_JOB:
+                    heapq.heappush(pending_wakeups, run_at_in_seconds)
+                self._schedule_next_wakeup(job_id)
+
+    def _schedule_next_wakeup(self, job_id: str) -> None:
+        pending_wakeups = self._pending_wakeups[job_id]
+        if job_id in self._running_job_ids or len(pending_wakeups) == 0:
+            return
+        job = self.scheduler.get_job(job_id)
+        if job is None:
+            return
+        # a run time in the past could be skipped as a misfire
+        run_at = datetime.fromtimestamp(max(pending_wakeups[0], time.time()), timezone.utc)
+        if job.next_run_time is None or run_at < job.next_run_time:
+            job.modify(next_run_time=run_at)
+
+    def _job_started(self, job_id: str) -> None:
+        with self._lock:
+            self._running_job_ids.add(job_id)
+            pending_wakeups = self._pending_wakeups[job_id]
+            # this run looks for all of the work that was there by now
+            now = time.time()
+            while len(pending_wakeups) > 0 and pending_wakeups[0] <= now:
+                heapq.heappop(pending_wakeups)
+
+    def _job_finished(self, job_id: str) -> None:
+        with self._lock:
+            self._running_job_ids.discard(job_id)
+            self._schedule_next_wakeup(job_id)
 
 
 def should_start_apscheduler(app: flask.app.Flask) -> bool:
@@ -27,77 +109,124 @@ def start_apscheduler_if_appropriate(app: flask.app.Flask, scheduler_class: Base
 
 def start_apscheduler(app: flask.app.Flask, scheduler_class: BaseScheduler = BackgroundScheduler) -> None:
     scheduler = scheduler_class()
+    waker = BackgroundJobWaker(scheduler)
 
     if app.config["SPIFFWORKFLOW_BACKEND_CELERY_ENABLED"]:
-        _add_jobs_for_celery_based_configuration(app, scheduler)
+        _add_jobs_for_celery_based_configuration(app, scheduler, waker)
     else:
-        _add_jobs_for_non_celery_based_configuration(app, scheduler)
+        _add_jobs_for_non_celery_based_configuration(app, scheduler, waker)
 
-    _add_jobs_that_should_run_regardless_of_celery_config(app, scheduler)
+    _add_jobs_that_should_run_regardless_of_celery_config(app, scheduler, waker)
+
+    # started first since a blocking scheduler does not return from start
+    if app.config["SPIFFWORKFLOW_BACKEND_BACKGROUND_SCHEDULER_WAKEUPS_ENABLED"]:
+        threading.Thread(
+            target=BackgroundWakeupService.listen,
+            args=(app, waker.wake, threading.Event()),
+            name="background_wakeup_listener",
+            daemon=True,
+        ).start()
 
     scheduler.start()
 
 
-def _add_jobs_for_celery_based_configuration(app: flask.app.Flask, scheduler: BaseScheduler) -> None:
+def _add_jobs_for_celery_based_configuration(app: flask.app.Flask, scheduler: BaseScheduler, waker: BackgroundJobWaker) -> None:
     future_task_execution_interval_in_seconds = app.config[
         "SPIFFWORKFLOW_BACKEND_BACKGROUND_SCHEDULER_FUTURE_TASK_EXECUTION_INTERVAL_IN_SECONDS"
     ]
 
     scheduler.add_job(
-        BackgroundProcessingService(app).process_future_tasks,
+        waker.wakeable("process_future_tasks", BackgroundProcessingService(app).process_future_tasks),
         "interval",
         seconds=future_task_execution_interval_in_seconds,
+        id="process_future_tasks",
+    )
+    # future tasks are queued once they are within the lookahead
+    waker.add_job(
+        BACKGROUND_WAKEUP_TOPIC_FUTURE_TASK,
+        "process_future_tasks",
+        delay_in_seconds=-app.config["SPIFFWORKFLOW_BACKEND_BACKGROUND_SCHEDULER_FUTURE_TASK_LOOKAHEAD_IN_SECONDS"],
     )
 
 
-def _add_jobs_for_non_celery_based_configuration(app: flask.app.Flask, scheduler: BaseScheduler) -> None:
-    # TODO: polling intervals for messages job
+def _add_jobs_for_non_celery_based_configuration(
+    app: flask.app.Flask, scheduler: BaseScheduler, waker: BackgroundJobWaker
+) -> None:
     polling_interval_in_seconds = app.config["SPIFFWORKFLOW_BACKEND_BACKGROUND_SCHEDULER_POLLING_INTERVAL_IN_SECONDS"]
     user_input_required_polling_interval_in_seconds = app.config[
         "SPIFFWORKFLOW_BACKEND_BACKGROUND_SCHEDULER_USER_INPUT_REQUIRED_POLLING_INTERVAL_IN_SECONDS"
     ]
     # TODO: add job to release locks to simplify other queries
     # TODO: add job to delete completed entires
-    # TODO: add job to run old/low priority instances so they do not get drowned out
 
     # we should be able to remove these once we switch over to future tasks for non-celery configuration
     scheduler.add_job(
-        BackgroundProcessingService(app).process_waiting_process_instances,
+        waker.wakeable("process_waiting_process_instances", BackgroundProcessingService(app).process_waiting_process_instances),
         "interval",
         seconds=polling_interval_in_seconds,
+        id="process_waiting_process_instances",
     )
     scheduler.add_job(
-        BackgroundProcessingService(app).process_running_process_instances,
+        waker.wakeable("process_running_process_instances", BackgroundProcessingService(app).process_running_process_instances),
         "interval",
         seconds=polling_interval_in_seconds,
+        id="process_running_process_instances",
     )
     scheduler.add_job(
-        BackgroundProcessingService(app).process_user_input_required_process_instances,
+        waker.wakeable(
+            "process_user_input_required_process_instances",
+            BackgroundProcessingService(app).process_user_input_required_process_instances,
+        ),
         "interval",
         seconds=user_input_required_polling_interval_in_seconds,
+        id="process_user_input_required_process_instances",
     )
+    for status in BACKGROUND_WAKEUP_STATUS_TOPICS_WITHOUT_CELERY:
+        waker.add_job(status, f"process_{status}_process_instances", ProcessInstanceService.BACKGROUND_MIN_AGE_IN_SECONDS)
 
 
-def _add_jobs_that_should_run_regardless_of_celery_config(app: flask.app.Flask, scheduler: BaseScheduler) -> None:
+def _add_jobs_that_should_run_regardless_of_celery_config(
+    app: flask.app.Flask, scheduler: BaseScheduler, waker: BackgroundJobWaker
+) -> None:
     not_started_polling_interval_in_seconds = app.config[
         "SPIFFWORKFLOW_BACKEND_BACKGROUND_SCHEDULER_NOT_STARTED_POLLING_INTERVAL_IN_SECONDS"
     ]
 
     # TODO: see if we can queue with celery instead on celery based configuration
     scheduler.add_job(
-        BackgroundProcessingService(app).process_message_instances_with_app_context,
+        waker.wakeable("process_message_instances", BackgroundProcessingService(app).process_message_instances_with_app_context),
         "interval",
-        seconds=10,
+        seconds=app.config["SPIFFWORKFLOW_BACKEND_BACKGROUND_SCHEDULER_MESSAGE_POLLING_INTERVAL_IN_SECONDS"],
+        id="process_message_instances",
     )
+    waker.add_job(BACKGROUND_WAKEUP_TOPIC_MESSAGE, "process_message_instances")
 
     # when you create a process instance via the API and do not use the run API method, this would pick up the instance.
     scheduler.add_job(
-        BackgroundProcessingService(app).process_not_started_process_instances,
+        waker.wakeable(
+            "process_not_started_process_instances", BackgroundProcessingService(app).process_not_started_process_instances
+        ),
         "interval",
         seconds=not_started_polling_interval_in_seconds,
+        id="process_not_started_process_instances",
+    )
+    waker.add_job(
+        ProcessInstanceStatus.not_started.value,
+        "process_not_started_process_instances",
+        ProcessInstanceService.BACKGROUND_MIN_AGE_IN_SECONDS,
     )
     scheduler.add_job(
         BackgroundProcessingService(app).remove_stale_locks,
         "interval",
-        seconds=app.config["MAX_INSTANCE_LOCK_DURATION_IN_SECONDS"],
+        seconds=int(app.config["SPIFFWORKFLOW_BACKEND_INSTANCE_LOCK_LEASE_DURATION_IN_SECONDS"]),
     )
+
+    json_data_compression_interval_in_seconds = app.config[
+        "SPIFFWORKFLOW_BACKEND_BACKGROUND_SCHEDULER_JSON_DATA_COMPRESSION_INTERVAL_IN_SECONDS"
+    ]
+    if app.config["SPIFFWORKFLOW_BACKEND_JSON_DATA_CODEC"] and json_data_compression_interval_in_seconds > 0:
+        scheduler.add_job(
+            BackgroundProcessingService(app).compress_json_data,
+            "interval",
+            seconds=json_data_compression_interval_in_seconds,
+        )
@@ -1,17 +1,22 @@
 import time
+from typing import Any
 
 import flask
+from flask import current_app
 from sqlalchemy import and_
 from sqlalchemy import or_
 
 from spiffworkflow_backend.background_processing.celery_tasks.process_instance_task_producer import (
     queue_future_task_if_appropriate,
 )
+from spiffworkflow_backend.data_migrations.json_data_compression_migrator import JsonDataCompressionMigrator
 from spiffworkflow_backend.models.db import db
+from spiffworkflow_backend.models.db import supports_skip_locked
 from spiffworkflow_backend.models.future_task import FutureTaskModel
 from spiffworkflow_backend.models.process_instance import ProcessInstanceModel
 from spiffworkflow_backend.models.process_instance import ProcessInstanceStatus
 from spiffworkflow_backend.models.task import TaskModel  # noqa: F401
+from spiffworkflow_backend.services.json_data_compression_service import JsonDataCompressionService
 from spiffworkflow_backend.services.message_service import MessageService
 from spiffworkflow_backend.services.process_instance_lock_service import ProcessInstanceLockService
 from spiffworkflow_backend.services.process_instance_service import ProcessInstanceService
@@ -54,10 +59,19 @@ class BackgroundProcessingService:
             MessageService.correlate_all_message_instances(execution_mode="synchronous")
 
     def remove_stale_locks(self) -> None:
-        """If something has been locked for a certain amount of time it is probably stale so unlock it."""
+        """Unlocks process instances whose lock lease expired, since whatever locked them is no longer running them."""
         with self.app.app_context():
             ProcessInstanceLockService.remove_stale_locks()
 
+    def compress_json_data(self) -> None:
+        """Trains missing compression dictionaries and compresses json data that was written before compression was turned on."""
+        with self.app.app_context():
+            if self.app.config["SPIFFWORKFLOW_BACKEND_JSON_DATA_USE_DICTIONARIES"]:
+                JsonDataCompressionService.train_missing_dictionaries()
+            JsonDataCompressionMigrator.compress_existing_json_data(
+                self.app.config["SPIFFWORKFLOW_BACKEND_JSON_DATA_COMPRESSION_BATCH_SIZE"]
+            )
+
     def process_future_tasks(self) -> None:
         """Timer related tasks go in the future_task table.
 
@@ -74,27 +88,74 @@ class BackgroundProcessingService:
 
     @classmethod
     def do_process_future_tasks(cls, future_task_lookahead_in_seconds: int) -> None:
-        future_tasks = cls.imminent_future_tasks(future_task_lookahead_in_seconds)
+        future_tasks = cls.claim_imminent_future_tasks(
+            future_task_lookahead_in_seconds, current_app.config["SPIFFWORKFLOW_BACKEND_BACKGROUND_SCHEDULER_CLAIM_BATCH_SIZE"]
+        )
         for future_task in future_tasks:
-            process_instance = (
-                ProcessInstanceModel.query.join(TaskModel, TaskModel.process_instance_id == ProcessInstanceModel.id)
-                .filter(TaskModel.guid == future_task.guid)
-                .first()
-            )
-            if process_instance and process_instance.allowed_to_run():
-                queue_future_task_if_appropriate(
-                    process_instance, eta_in_seconds=future_task.run_at_in_seconds, task_guid=future_task.guid
+            queued = False
+            try:
+                process_instance = (
+                    ProcessInstanceModel.query.join(TaskModel, TaskModel.process_instance_id == ProcessInstanceModel.id)
+                    .filter(TaskModel.guid == future_task.guid)
+                    .first()
                 )
-            else:
-                # if we are not allowed to run the process instance, we should not keep processing the future task
-                future_task.archived_for_process_instance_status = True
+                if process_instance and process_instance.allowed_to_run():
+                    queued = queue_future_task_if_appropriate(
+                        process_instance, eta_in_seconds=future_task.run_at_in_seconds, task_guid=future_task.guid
+                    )
+                else:
+                    # if we are not allowed to run the process instance, we should not keep processing the future task
+                    future_task.archived_for_process_instance_status = True
+            finally:
+                if not queued:
+                    # it was claimed by marking it as queued, so undo that for whoever looks at it next
+                    future_task.queued_to_run_at_in_seconds = None  # type: ignore
+                    db.session.add(future_task)
+                    db.session.commit()
+
+    @classmethod
+    def claim_imminent_future_tasks(cls, future_task_lookahead_in_seconds: int, limit: int) -> list[FutureTaskModel]:
+        """Marks up to limit imminent future tasks as queued in one transaction and returns them.
+
+        Other pollers skip the rows while they are being claimed and do not see them as imminent afterward,
+        so each future task is only queued by one of them.
+        """
+        query = cls._imminent_future_tasks_query(future_task_lookahead_in_seconds).order_by(FutureTaskModel.run_at_in_seconds)
+        future_tasks: list[FutureTaskModel] = []
+        if supports_skip_locked():
+            future_tasks = query.limit(limit).with_for_update(skip_locked=True).all()
+            for future_task in future_tasks:
+                future_task.queued_to_run_at_in_seconds = future_task.run_at_in_seconds
                 db.session.add(future_task)
-                db.session.commit()
+        else:
+            # only the poller whose update changed the row gets to queue it
+            for future_task in query.limit(limit).all():
+                claimed_count = (
+                    db.session.query(FutureTaskModel)
+                    .filter(
+                        FutureTaskModel.guid == future_task.guid,
+                        FutureTaskModel.run_at_in_seconds == future_task.run_at_in_seconds,
+                        or_(
+                            FutureTaskModel.queued_to_run_at_in_seconds != FutureTaskModel.run_at_in_seconds,
+                            FutureTaskModel.queued_to_run_at_in_seconds == None,  # noqa: E711
+                        ),
+                    )
+                    .update({"queued_to_run_at_in_seconds": future_task.run_at_in_seconds}, synchronize_session=False)
+                )
+                if claimed_count == 1:
+                    future_tasks.append(future_task)
+        db.session.commit()
+        return future_tasks
 
     @classmethod
     def imminent_future_tasks(cls, future_task_lookahead_in_seconds: int) -> list[FutureTaskModel]:
+        future_tasks: list[FutureTaskModel] = cls._imminent_future_tasks_query(future_task_lookahead_in_seconds).all()
+        return future_tasks
+
+    @classmethod
+    def _imminent_future_tasks_query(cls, future_task_lookahead_in_seconds: int) -> Any:
         lookahead = time.time() + future_task_lookahead_in_seconds
-        future_tasks: list[FutureTaskModel] = FutureTaskModel.query.filter(
+        return FutureTaskModel.query.filter(
             and_(
                 FutureTaskModel.completed == False,  # noqa: E712
                 FutureTaskModel.archived_for_process_instance_status == False,  # noqa: E712
@@ -104,5 +165,4 @@ class BackgroundProcessingService:
                     FutureTaskModel.queued_to_run_at_in_seconds == None,  # noqa: E711
                 ),
             )
-        ).all()
-        return future_tasks
+        )
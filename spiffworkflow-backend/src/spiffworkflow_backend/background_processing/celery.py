@@ -24,6 +24,8 @@ def celery_init_app(app: flask.app.Flask) -> Celery:
         "accept_content": ["json"],
         "enable_utc": True,
         "worker_redirect_stdouts_level": "DEBUG",
+        # one redis list per queue priority, so celery workers take process instances in the order the queue would
+        "broker_transport_options": {"priority_steps": list(range(10))},
     }
 
     celery_app = Celery(app.name)
@@ -9,11 +9,13 @@ from spiffworkflow_backend.models.db import db
 from spiffworkflow_backend.models.future_task import FutureTaskModel
 from spiffworkflow_backend.models.process_instance import ProcessInstanceModel
 from spiffworkflow_backend.models.task import TaskModel  # noqa: F401
+from spiffworkflow_backend.services.process_instance_lock_service import ProcessInstanceLockLostError
 from spiffworkflow_backend.services.process_instance_lock_service import ProcessInstanceLockService
 from spiffworkflow_backend.services.process_instance_queue_service import ProcessInstanceIsAlreadyLockedError
 from spiffworkflow_backend.services.process_instance_queue_service import ProcessInstanceQueueService
 from spiffworkflow_backend.services.process_instance_service import ProcessInstanceService
 from spiffworkflow_backend.services.process_instance_tmp_service import ProcessInstanceTmpService
+from spiffworkflow_backend.services.warm_processor_cache_service import WarmProcessorCacheService
 from spiffworkflow_backend.services.workflow_execution_service import TaskRunnability
 
 ten_minutes = 60 * 10
@@ -54,16 +56,19 @@ def celery_task_process_instance_run(self, process_instance_id: int, task_guid:
     try:
         task_guid_for_requeueing = task_guid
         with ProcessInstanceQueueService.dequeued(process_instance):
+            # both strategies run against the same processor and the process instance is only saved once at the end.
             # run ready tasks to force them to run in case they have instructions on them since queue_instructions_for_end_user
             # has a should_break_before that will exit if there are instructions.
-            ProcessInstanceService.run_process_instance_with_processor(
-                process_instance, execution_strategy_name="run_current_ready_tasks", should_schedule_waiting_timer_events=False
-            )
-            # we need to save instructions to the db so the frontend progress page can view them,
-            # and this is the only way to do it
-            _processor, task_runnability = ProcessInstanceService.run_process_instance_with_processor(
+            # then we need to save instructions to the db so the frontend progress page can view them,
+            # and queue_instructions_for_end_user (the default background strategy with celery) is the main way to do it.
+            # time_sliced queues them too, and requeues long running instances after their slice below.
+            background_execution_strategy_name = current_app.config[
+                "SPIFFWORKFLOW_BACKEND_ENGINE_STEP_DEFAULT_STRATEGY_BACKGROUND"
+            ]
+            processor, task_runnability = ProcessInstanceService.run_process_instance_with_execution_strategies(
                 process_instance,
-                execution_strategy_name="queue_instructions_for_end_user",
+                execution_strategy_names=["run_current_ready_tasks", background_execution_strategy_name],
+                processor=WarmProcessorCacheService.checkout(process_instance),
             )
             # currently, whenever we get a task_guid, that means that that task, which was a future task, is ready to run.
             # there is an assumption that it was successfully processed by run_process_instance_with_processor above.
@@ -82,9 +87,10 @@ def celery_task_process_instance_run(self, process_instance_id: int, task_guid:
                         db.session.commit()
                         task_guid_for_requeueing = None
         if task_runnability == TaskRunnability.has_ready_tasks:
+            WarmProcessorCacheService.keep(processor)
             queue_process_instance_if_appropriate(process_instance, task_guid=task_guid_for_requeueing)
         return {"ok": True, "process_instance_id": process_instance_id, "task_guid": task_guid}
-    except ProcessInstanceIsAlreadyLockedError as exception:
+    except (ProcessInstanceIsAlreadyLockedError, ProcessInstanceLockLostError) as exception:
         current_app.logger.info(
             f"{logger_prefix}: Could not run process instance with worker: {current_app.config['PROCESS_UUID']}"
             f" - {proc_index}. Error was: {str(exception)}"
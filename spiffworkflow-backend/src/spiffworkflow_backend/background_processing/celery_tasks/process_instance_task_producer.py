@@ -6,7 +6,10 @@ from flask import current_app
 from spiffworkflow_backend.background_processing import CELERY_TASK_PROCESS_INSTANCE_RUN
 from spiffworkflow_backend.exceptions.api_error import ApiError
 from spiffworkflow_backend.helpers.spiff_enum import ProcessInstanceExecutionMode
+from spiffworkflow_backend.models.db import db
 from spiffworkflow_backend.models.process_instance import ProcessInstanceModel
+from spiffworkflow_backend.models.process_instance_queue import PROCESS_INSTANCE_QUEUE_PRIORITY_DEFAULT
+from spiffworkflow_backend.models.process_instance_queue import ProcessInstanceQueueModel
 
 
 def queue_enabled_for_process_model(process_instance: ProcessInstanceModel) -> bool:
@@ -35,6 +38,16 @@ def should_queue_process_instance(process_instance: ProcessInstanceModel, execut
     return False
 
 
+def celery_priority(process_instance: ProcessInstanceModel) -> int:
+    # the redis transport, with the priority steps from celery_init_app, delivers lower numbers first like the queue does
+    priority = (
+        db.session.query(ProcessInstanceQueueModel.priority)  # type: ignore
+        .filter(ProcessInstanceQueueModel.process_instance_id == process_instance.id)
+        .scalar()
+    )
+    return PROCESS_INSTANCE_QUEUE_PRIORITY_DEFAULT if priority is None else int(priority)
+
+
 def queue_future_task_if_appropriate(
     process_instance: ProcessInstanceModel, eta_in_seconds: float, task_guid: str | None = None
 ) -> bool:
@@ -51,7 +64,12 @@ def queue_future_task_if_appropriate(
         # (maybe due to subsecond stuff, maybe because of clock skew within the cluster of computers running spiff)
         # celery_task_process_instance_run.apply_async(kwargs=args_to_celery, countdown=countdown + 1)  # type: ignore
 
-        async_result = celery.current_app.send_task(CELERY_TASK_PROCESS_INSTANCE_RUN, kwargs=args_to_celery, countdown=countdown)
+        async_result = celery.current_app.send_task(
+            CELERY_TASK_PROCESS_INSTANCE_RUN,
+            kwargs=args_to_celery,
+            countdown=countdown,
+            priority=celery_priority(process_instance),
+        )
         message = (
             f"Queueing process instance ({process_instance.id}) for future task ({task_guid}). "
             f"new celery task id: ({async_result.task_id})"
@@ -79,7 +97,9 @@ def queue_process_instance_if_appropriate(
     #     )
 
     if should_queue_process_instance(process_instance, execution_mode):
-        async_result = celery.current_app.send_task(CELERY_TASK_PROCESS_INSTANCE_RUN, (process_instance.id, task_guid))
+        async_result = celery.current_app.send_task(
+            CELERY_TASK_PROCESS_INSTANCE_RUN, (process_instance.id, task_guid), priority=celery_priority(process_instance)
+        )
         current_app.logger.info(f"Queueing process instance ({process_instance.id}) for celery ({async_result.task_id})")
         return True
     return False
@@ -72,11 +72,32 @@ config_from_env("SPIFFWORKFLOW_BACKEND_BACKGROUND_SCHEDULER_ALLOW_OPTIMISTIC_CHE
 config_from_env("SPIFFWORKFLOW_BACKEND_BACKGROUND_SCHEDULER_POLLING_INTERVAL_IN_SECONDS", default=10)
 config_from_env("SPIFFWORKFLOW_BACKEND_BACKGROUND_SCHEDULER_NOT_STARTED_POLLING_INTERVAL_IN_SECONDS", default=30)
 config_from_env("SPIFFWORKFLOW_BACKEND_BACKGROUND_SCHEDULER_USER_INPUT_REQUIRED_POLLING_INTERVAL_IN_SECONDS", default=120)
+config_from_env("SPIFFWORKFLOW_BACKEND_BACKGROUND_SCHEDULER_MESSAGE_POLLING_INTERVAL_IN_SECONDS", default=10)
+# run background jobs as soon as there is work for them instead of at their next poll. polling stays on as a safety net,
+# so the polling intervals can be raised. wakeups reach other processes with postgres and only the same process otherwise.
+# they are only sent for work the scheduler runs itself, so not for process instances that celery workers run.
+config_from_env("SPIFFWORKFLOW_BACKEND_BACKGROUND_SCHEDULER_WAKEUPS_ENABLED", default=True)
+# most process instances and future tasks one poll works through. other pollers skip what it claimed. future tasks
+# are claimed together and handed to celery right away. process instances are claimed one at a time as they are run.
+config_from_env("SPIFFWORKFLOW_BACKEND_BACKGROUND_SCHEDULER_CLAIM_BATCH_SIZE", default=100)
+# waiting this many seconds is worth one priority level, so low priority instances are not starved by higher priority ones.
+# 0 always runs higher priority instances first.
+config_from_env("SPIFFWORKFLOW_BACKEND_QUEUE_PRIORITY_AGING_INTERVAL_IN_SECONDS", default=300)
+# strategy used to run process instances in the background.
+# defaults to greedy, or queue_instructions_for_end_user when celery is enabled.
+config_from_env("SPIFFWORKFLOW_BACKEND_ENGINE_STEP_DEFAULT_STRATEGY_BACKGROUND")
+# the time_sliced strategy stops running a process instance after this many engine steps or seconds, whichever comes first,
+# and requeues it so one long running instance cannot keep a worker to itself. 0 turns off that limit.
+config_from_env("SPIFFWORKFLOW_BACKEND_ENGINE_STEP_TIME_SLICE_MAX_STEPS", default=1000)
+config_from_env("SPIFFWORKFLOW_BACKEND_ENGINE_STEP_TIME_SLICE_MAX_SECONDS", default=30)
 
 ### background with celery
 config_from_env("SPIFFWORKFLOW_BACKEND_CELERY_ENABLED", default=False)
 config_from_env("SPIFFWORKFLOW_BACKEND_CELERY_BROKER_URL", default="redis://localhost")
 config_from_env("SPIFFWORKFLOW_BACKEND_CELERY_RESULT_BACKEND", default="redis://localhost")
+# number of processors a celery worker keeps in memory for instances it requeues so the next run can skip loading them.
+# a kept processor is only used if nothing has happened to its instance since it was saved. 0 disables this.
+config_from_env("SPIFFWORKFLOW_BACKEND_CELERY_WARM_PROCESSOR_CACHE_SIZE", default=0)
 
 # give a little overlap to ensure we do not miss items although the query will handle it either way
 config_from_env("SPIFFWORKFLOW_BACKEND_BACKGROUND_SCHEDULER_FUTURE_TASK_LOOKAHEAD_IN_SECONDS", default=301)
@@ -98,6 +119,24 @@ config_from_env(
     "SPIFFWORKFLOW_BACKEND_CONNECTOR_PROXY_TYPEAHEAD_URL",
     default="https://emehvlxpwodjawtgi7ctkbvpse0vmaow.lambda-url.us-east-1.on.aws",
 )
+# service task commands are sent over a keep-alive session per worker process. the pool size is how many connections
+# it keeps to the proxy, which should be about SPIFFWORKFLOW_BACKEND_ENGINE_STEP_MAX_WORKERS.
+config_from_env("SPIFFWORKFLOW_BACKEND_CONNECTOR_PROXY_POOL_SIZE", default=32)
+# failures to connect are retried with exponential backoff. commands that got a response with one of the comma
+# separated status codes, like "502,503,504", are retried too, which is only safe if the connectors are idempotent.
+config_from_env("SPIFFWORKFLOW_BACKEND_CONNECTOR_PROXY_RETRIES", default=2)
+config_from_env("SPIFFWORKFLOW_BACKEND_CONNECTOR_PROXY_RETRY_BACKOFF_FACTOR", default="0.5")
+config_from_env("SPIFFWORKFLOW_BACKEND_CONNECTOR_PROXY_RETRY_STATUS_CODES", default="")
+# send the service tasks that are ready at the same time, like after a parallel gateway, to the connector proxy
+# in one request to its /v1/do-batch endpoint. if the proxy does not have that endpoint, they are sent one by one.
+config_from_env("SPIFFWORKFLOW_BACKEND_CONNECTOR_PROXY_USE_BATCH", default=False)
+# comma separated operators, like "http/GetRequestV2", that are safe to call more than once and so can be sent in batches.
+# a batch calls the connectors of tasks that may not end up running, like when an earlier task fails, and those
+# connectors are called again when the tasks are retried. operators with side effects should not be listed.
+config_from_env("SPIFFWORKFLOW_BACKEND_CONNECTOR_PROXY_BATCH_OPERATORS", default="")
+# number of connector responses each worker process keeps in memory for operators that opt in to caching with
+# connector_response_cache in process_model.json or the connectorResponseCacheTtlSeconds service task property.
+config_from_env("SPIFFWORKFLOW_BACKEND_CONNECTOR_RESPONSE_CACHE_SIZE", default=1000)
 
 ### database
 config_from_env("SPIFFWORKFLOW_BACKEND_DATABASE_TYPE", default="mysql")  # can also be sqlite, postgres
@@ -107,6 +146,11 @@ config_from_env("SPIFFWORKFLOW_BACKEND_DATABASE_URI")
 config_from_env("SPIFFWORKFLOW_BACKEND_DATABASE_PASSWORD")
 # we only use this in one place, and it checks to see if it is None.
 config_from_env("SPIFFWORKFLOW_BACKEND_DATABASE_POOL_SIZE")
+# rows that are written in bulk, like the tasks of a process instance when it is saved, are split into statements
+# whose text and binary values add up to at most this many bytes. keep it well below max_allowed_packet when using mysql.
+config_from_env("SPIFFWORKFLOW_BACKEND_BULK_WRITE_MAX_BYTES", default=2097152)
+# with postgres, stream larger bulk writes with COPY rather than sending multi-row inserts.
+config_from_env("SPIFFWORKFLOW_BACKEND_BULK_WRITE_USE_POSTGRES_COPY", default=False)
 
 ### open id
 config_from_env("SPIFFWORKFLOW_BACKEND_AUTHENTICATION_DISABLED", default=False)
@@ -221,6 +265,65 @@ config_from_env("SPIFFWORKFLOW_BACKEND_PROCESS_INSTANCE_FILE_DATA_FILESYSTEM_PAT
 # timeouts for process instances locks as they are run to avoid stale locks
 config_from_env("SPIFFWORKFLOW_BACKEND_ALLOW_CONFISCATING_LOCK_AFTER_SECONDS", default="600")
 config_from_env("SPIFFWORKFLOW_BACKEND_MAX_INSTANCE_LOCK_DURATION_IN_SECONDS", default="300")
+# process instance locks are leases that the process holding them renews every heartbeat interval while it runs the instance.
+# a lock that was not renewed for the lease duration, like one from a worker that crashed, can be taken by anything else,
+# so a run stops at its next engine step once its lease runs out. 0 turns off the heartbeat, which stops every run
+# that takes longer than the lease duration.
+config_from_env("SPIFFWORKFLOW_BACKEND_INSTANCE_LOCK_LEASE_DURATION_IN_SECONDS", default=60)
+config_from_env("SPIFFWORKFLOW_BACKEND_INSTANCE_LOCK_HEARTBEAT_INTERVAL_IN_SECONDS", default=15)
+
+### caching
+# number of deserialized bpmn process definitions (with their subprocess specs) each worker process keeps in memory.
+# definitions are immutable once stored, so this only bounds memory. set to 0 to disable.
+config_from_env("SPIFFWORKFLOW_BACKEND_PROCESS_DEFINITION_SPEC_CACHE_SIZE", default=100)
+# number of parsed process models (bpmn and dmn files plus called processes) each worker process keeps in memory
+# for starting new instances. entries are checked against the file contents before use. set to 0 to disable.
+config_from_env("SPIFFWORKFLOW_BACKEND_PROCESS_MODEL_SPEC_CACHE_SIZE", default=50)
+# number of process_model.json files each worker process keeps in memory for settings read while running instances,
+# like metadata_extraction_paths. entries are checked against the modification time of the file. set to 0 to disable.
+config_from_env("SPIFFWORKFLOW_BACKEND_PROCESS_MODEL_JSON_CACHE_SIZE", default=500)
+# number of compiled script task scripts and expressions, like gateway conditions, each worker process keeps in memory
+# so they are not compiled again every time they run. set to 0 to disable.
+config_from_env("SPIFFWORKFLOW_BACKEND_SCRIPT_CODE_CACHE_SIZE", default=2000)
+# number of compiled jinja templates, like instructionsForEndUser and forms, each worker process keeps in memory.
+# set to 0 to disable.
+config_from_env("SPIFFWORKFLOW_BACKEND_JINJA_TEMPLATE_CACHE_SIZE", default=500)
+
+### parallel engine steps
+# ready tasks on parallel branches run in a thread pool each worker process keeps for its whole life.
+# max workers sizes that pool. the per process instance limit is how many steps of one instance can be in it at once.
+config_from_env("SPIFFWORKFLOW_BACKEND_ENGINE_STEP_MAX_WORKERS", default=32)
+config_from_env("SPIFFWORKFLOW_BACKEND_ENGINE_STEP_MAX_WORKERS_PER_PROCESS_INSTANCE", default=10)
+
+### script process pool
+# script tasks with the runScriptInProcessPool property run in a pool of this many processes each worker process starts
+# the first time it needs one, so cpu heavy scripts can use more than one core. 0 runs them like any other script.
+config_from_env("SPIFFWORKFLOW_BACKEND_SCRIPT_PROCESS_POOL_SIZE", default=2)
+# limits for each script run in the pool. tasks can override them with processTimeoutInSeconds and processMemoryLimitInMb.
+config_from_env("SPIFFWORKFLOW_BACKEND_SCRIPT_PROCESS_POOL_TIMEOUT_IN_SECONDS", default=60)
+config_from_env("SPIFFWORKFLOW_BACKEND_SCRIPT_PROCESS_POOL_MEMORY_LIMIT_IN_MB", default=512)
+
+### task data
+# only read the data of finished tasks from the database when something uses it rather than when the instance is loaded.
+# helps with instances that have many tasks with large data. batch size is how many records to fetch per query.
+config_from_env("SPIFFWORKFLOW_BACKEND_LAZY_LOAD_TASK_DATA", default=False)
+config_from_env("SPIFFWORKFLOW_BACKEND_LAZY_LOAD_TASK_DATA_BATCH_SIZE", default=25)
+# store task data as the keys that differ from the data of the parent task rather than a full copy each time.
+# every checkpoint interval levels down a chain of these, the data is stored in full again to keep reading it quick.
+config_from_env("SPIFFWORKFLOW_BACKEND_TASK_DATA_DELTA_ENCODING", default=False)
+config_from_env("SPIFFWORKFLOW_BACKEND_TASK_DATA_DELTA_CHECKPOINT_INTERVAL", default=10)
+
+### json data compression
+# compress task data and other json_data records as they are written. can be "zlib" or "zstd", which needs the zstandard package.
+# records smaller than the minimum size are stored as they are. reading compressed records works whether or not this is set.
+config_from_env("SPIFFWORKFLOW_BACKEND_JSON_DATA_CODEC")
+config_from_env("SPIFFWORKFLOW_BACKEND_JSON_DATA_COMPRESSION_MIN_BYTES", default=1024)
+# compress with dictionaries trained on the data of each process model. the data of one model compresses much better this way.
+config_from_env("SPIFFWORKFLOW_BACKEND_JSON_DATA_USE_DICTIONARIES", default=False)
+# how often the background scheduler compresses records written before a codec was set, and trains missing dictionaries.
+# 0 disables it. batch size is how many records it compresses per run.
+config_from_env("SPIFFWORKFLOW_BACKEND_BACKGROUND_SCHEDULER_JSON_DATA_COMPRESSION_INTERVAL_IN_SECONDS", default=0)
+config_from_env("SPIFFWORKFLOW_BACKEND_JSON_DATA_COMPRESSION_BATCH_SIZE", default=500)
 
 ### other
 config_from_env(
@@ -16,6 +16,8 @@ SPIFFWORKFLOW_BACKEND_AUTH_CONFIGS = None
 
 SPIFFWORKFLOW_BACKEND_LOG_LEVEL = environ.get("SPIFFWORKFLOW_BACKEND_LOG_LEVEL", default="debug")
 SPIFFWORKFLOW_BACKEND_GIT_COMMIT_ON_SAVE = False
+# tests renew leases themselves rather than from a thread that would write to the database behind their back
+SPIFFWORKFLOW_BACKEND_INSTANCE_LOCK_HEARTBEAT_INTERVAL_IN_SECONDS = 0
 
 SPIFFWORKFLOW_BACKEND_WEBHOOK_PROCESS_MODEL_IDENTIFIER = "test_group/simple_script"
 SPIFFWORKFLOW_BACKEND_GITHUB_WEBHOOK_SECRET = "test_github_webhook_secret"  # noqa: S105
@@ -0,0 +1,25 @@
+from flask import current_app
+from spiffworkflow_backend.models.db import db
+from spiffworkflow_backend.models.json_data import JsonDataModel
+
+
+class JsonDataCompressionMigrator:
+    @classmethod
+    def compress_existing_json_data(cls, batch_size: int) -> int:
+        """Compresses up to batch_size json_data records that were written before a codec was set.
+
+        These are compressed without a dictionary since records are shared between process models.
+        Returns the number of records that were looked at so callers can tell when there are none left.
+        """
+        codec = current_app.config["SPIFFWORKFLOW_BACKEND_JSON_DATA_CODEC"]
+        if not codec:
+            return 0
+
+        json_data_records = JsonDataModel.query.filter(JsonDataModel.codec == None).limit(batch_size).all()  # noqa: E711
+        for json_data_record in json_data_records:
+            compressed_record = JsonDataModel.compressed_record(json_data_record.hash, json_data_record.data, codec)
+            for column_name in ["data", "codec", "compressed_data", "dictionary_id"]:
+                setattr(json_data_record, column_name, compressed_record[column_name])
+            db.session.add(json_data_record)
+        db.session.commit()
+        return len(json_data_records)
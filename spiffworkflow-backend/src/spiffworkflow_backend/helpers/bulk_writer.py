@@ -0,0 +1,265 @@
+import io
+import json
+from collections.abc import Iterable
+from collections.abc import Iterator
+from typing import Any
+from uuid import uuid4
+
+from flask import current_app
+from spiffworkflow_backend.models.db import SpiffworkflowBaseDBModel
+from spiffworkflow_backend.models.db import db
+from spiffworkflow_backend.models.db import dialect_name
+from sqlalchemy import Column
+from sqlalchemy import Table
+from sqlalchemy import and_
+from sqlalchemy import case
+from sqlalchemy import inspect
+from sqlalchemy import text
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.postgresql import Insert as PostgresInsert
+from sqlalchemy.dialects.postgresql import insert as postgres_insert
+from sqlalchemy.dialects.sqlite import Insert as SqliteInsert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm.attributes import instance_state
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.types import JSON
+from sqlalchemy.types import TypeDecorator
+
+# keeps statements well under the limits databases have on the number of bound parameters
+BULK_WRITE_MAX_ROWS_PER_STATEMENT = 1000
+
+# what values other than text and binary ones are counted as when estimating the size of a statement
+BULK_WRITE_ESTIMATED_BYTES_PER_VALUE = 16
+
+# COPY needs a few extra statements for the temporary table so it is only worth it for larger writes
+BULK_WRITE_POSTGRES_COPY_MIN_ROWS = 50
+
+
+class BulkWriter:
+    """Writes many rows to one table in a handful of statements with sqlalchemy core rather than the orm.
+
+    Rows are split so the text and binary values of a statement add up to at most
+    SPIFFWORKFLOW_BACKEND_BULK_WRITE_MAX_BYTES, which keeps them under limits like max_allowed_packet in mysql.
+    With postgres, larger writes can be streamed with COPY instead.
+    """
+
+    @classmethod
+    def insert_models(cls, models: Iterable[SpiffworkflowBaseDBModel]) -> None:
+        """Inserts new models. Autoincrement ids are not filled in on them like they would be by the session."""
+        models = list(models)
+        if len(models) > 0:
+            cls.insert(models[0].__table__, cls.rows_from_models(models))
+
+    @classmethod
+    def upsert_models(cls, models: Iterable[SpiffworkflowBaseDBModel], conflict_column_names: list[str]) -> None:
+        """Inserts the models, or updates every column of the ones whose conflict columns match an existing row.
+
+        Models that were added to the session but not flushed yet are left for it to insert when it flushes.
+        Other models the session tracks are marked as saved so it does not write them again when it flushes.
+        """
+        models = [model for model in models if not instance_state(model).pending]
+        if len(models) > 0:
+            cls.upsert(models[0].__table__, cls.rows_from_models(models), conflict_column_names=conflict_column_names)
+            cls._mark_models_as_saved(models)
+
+    @classmethod
+    def insert(cls, table: Table, rows: list[dict[str, Any]], ignore_existing: bool = False) -> None:
+        """Inserts the rows. Rows whose primary key already exists are skipped if ignore_existing is set."""
+        cls._write(table, rows, [] if ignore_existing else None)
+
+    @classmethod
+    def upsert(
+        cls,
+        table: Table,
+        rows: list[dict[str, Any]],
+        conflict_column_names: list[str] | None = None,
+        update_column_names: list[str] | None = None,
+    ) -> None:
+        """Inserts the rows, or updates the ones whose conflict columns match an existing row.
+
+        conflict_column_names defaults to the primary key and must otherwise be a unique constraint of the table.
+        update_column_names defaults to every column other than the primary key and the conflict columns.
+        """
+        if update_column_names is None:
+            key_names = {column.name for column in table.primary_key.columns} | set(conflict_column_names or [])
+            update_column_names = [column.name for column in table.columns if column.name not in key_names]
+        cls._write(table, rows, update_column_names, conflict_column_names)
+
+    @classmethod
+    def rows_from_models(cls, models: list[SpiffworkflowBaseDBModel]) -> list[dict[str, Any]]:
+        """Returns the column values of the models, leaving out primary keys that the database will generate."""
+        mapper = inspect(type(models[0]))
+        columns_by_attribute = [(key, column) for key, column in mapper.columns.items() if isinstance(column, Column)]
+        rows = []
+        for model in models:
+            # read loaded values straight from the instance rather than through the attribute descriptors
+            loaded_values = instance_state(model).dict
+            row = {}
+            for key, column in columns_by_attribute:
+                value = loaded_values[key] if key in loaded_values else getattr(model, key)
+                if value is None and column.primary_key:
+                    continue
+                row[column.name] = value
+            rows.append(row)
+        return rows
+
+    @classmethod
+    def _write(
+        cls,
+        table: Table,
+        rows: list[dict[str, Any]],
+        update_column_names: list[str] | None,
+        conflict_column_names: list[str] | None = None,
+    ) -> None:
+        """Writes the rows. update_column_names says what to do with rows that exist already.
+
+        None means it is an error, an empty list means they are skipped, and otherwise those columns are updated.
+        Rows exist already if their conflict columns match, which are the primary key unless given.
+        """
+        conflict_column_names = conflict_column_names or [column.name for column in table.primary_key.columns]
+        if len(rows) == 0:
+            return
+
+        # one statement is used for many rows so every row needs to have the same columns
+        rows_by_columns: dict[tuple[str, ...], list[dict[str, Any]]] = {}
+        for row in rows:
+            rows_by_columns.setdefault(tuple(row.keys()), []).append(row)
+
+        use_copy = current_app.config["SPIFFWORKFLOW_BACKEND_BULK_WRITE_USE_POSTGRES_COPY"] and dialect_name() == "postgresql"
+        for column_names, rows_with_same_columns in rows_by_columns.items():
+            if use_copy and len(rows_with_same_columns) >= BULK_WRITE_POSTGRES_COPY_MIN_ROWS:
+                cls._copy_to_postgres(
+                    table, list(column_names), rows_with_same_columns, update_column_names, conflict_column_names
+                )
+                continue
+            # sent as an executemany so the statement is compiled once. the drivers turn it into multi-row statements.
+            statement = cls._insert_statement(table, update_column_names, conflict_column_names)
+            for chunk in cls._chunks(rows_with_same_columns):
+                db.session.execute(statement, chunk)
+
+    @classmethod
+    def _insert_statement(cls, table: Table, update_column_names: list[str] | None, conflict_column_names: list[str]) -> Any:
+        dialect = dialect_name()
+        if dialect == "mysql":
+            mysql_statement = mysql_insert(table)
+            if update_column_names is None:
+                return mysql_statement
+            # mysql checks every unique key for duplicates. updating a key column to itself is how it spells do nothing.
+            if len(update_column_names) == 0:
+                return mysql_statement.on_duplicate_key_update(
+                    {name: mysql_statement.inserted[name] for name in conflict_column_names}
+                )
+            # only update rows whose conflict columns match, like on conflict does, rather than ones that match on
+            # another unique key. the conflict columns are never updated so this condition means the same for each column.
+            conflict_columns_match = and_(
+                *[table.columns[name] == mysql_statement.inserted[name] for name in conflict_column_names]
+            )
+            return mysql_statement.on_duplicate_key_update(
+                {
+                    name: case((conflict_columns_match, mysql_statement.inserted[name]), else_=table.columns[name])
+                    for name in update_column_names
+                    if name not in conflict_column_names
+                }
+            )
+
+        statement: PostgresInsert | SqliteInsert = sqlite_insert(table) if dialect == "sqlite" else postgres_insert(table)
+        if update_column_names is None:
+            return statement
+        if len(update_column_names) == 0:
+            return statement.on_conflict_do_nothing(index_elements=conflict_column_names)
+        return statement.on_conflict_do_update(
+            index_elements=conflict_column_names, set_={name: statement.excluded[name] for name in update_column_names}
+        )
+
+    @classmethod
+    def _chunks(cls, rows: list[dict[str, Any]]) -> Iterator[list[dict[str, Any]]]:
+        """Splits rows into chunks that fit in one statement. A row that is too big on its own gets a chunk to itself.
+
+        Only text and binary values are measured since serializing every row just to size it costs about as much as
+        the write. Other values, like json, count as a few bytes each and the number of rows per statement is capped.
+        """
+        max_bytes = current_app.config["SPIFFWORKFLOW_BACKEND_BULK_WRITE_MAX_BYTES"]
+        chunk: list[dict[str, Any]] = []
+        chunk_bytes = 0
+        for row in rows:
+            row_bytes = sum(
+                len(value) if isinstance(value, str | bytes) else BULK_WRITE_ESTIMATED_BYTES_PER_VALUE for value in row.values()
+            )
+            if chunk and (chunk_bytes + row_bytes > max_bytes or len(chunk) >= BULK_WRITE_MAX_ROWS_PER_STATEMENT):
+                yield chunk
+                chunk = []
+                chunk_bytes = 0
+            chunk.append(row)
+            chunk_bytes += row_bytes
+        if chunk:
+            yield chunk
+
+    @classmethod
+    def _copy_to_postgres(
+        cls,
+        table: Table,
+        column_names: list[str],
+        rows: list[dict[str, Any]],
+        update_column_names: list[str] | None,
+        conflict_column_names: list[str],
+    ) -> None:
+        """Streams the rows with COPY, through a temporary table if existing rows have to be skipped or updated."""
+        buffer = io.StringIO()
+        columns = [table.columns[name] for name in column_names]
+        for row in rows:
+            buffer.write("\t".join(cls._copy_value(column, row[column.name]) for column in columns))
+            buffer.write("\n")
+        buffer.seek(0)
+
+        column_list = ", ".join(f'"{name}"' for name in column_names)
+        copy_table_name = table.name
+        if update_column_names is not None:
+            copy_table_name = f"bulk_write_{table.name}_{uuid4().hex}"
+            db.session.execute(
+                text(f'CREATE TEMPORARY TABLE "{copy_table_name}" (LIKE "{table.name}" INCLUDING DEFAULTS) ON COMMIT DROP')
+            )
+
+        # the raw connection is part of the transaction of the session so this is committed or rolled back with it
+        cursor = db.session.connection().connection.driver_connection.cursor()  # type: ignore
+        try:
+            cursor.copy_expert(f'COPY "{copy_table_name}" ({column_list}) FROM STDIN', buffer)
+        finally:
+            cursor.close()
+
+        if update_column_names is not None:
+            conflict_column_list = ", ".join(f'"{name}"' for name in conflict_column_names)
+            on_conflict = "DO NOTHING"
+            if len(update_column_names) > 0:
+                on_conflict = "DO UPDATE SET " + ", ".join(f'"{name}" = EXCLUDED."{name}"' for name in update_column_names)
+            # the names all come from the table definition rather than from the rows
+            db.session.execute(
+                text(
+                    f'INSERT INTO "{table.name}" ({column_list}) SELECT {column_list} FROM "{copy_table_name}" '  # noqa: S608
+                    f"ON CONFLICT ({conflict_column_list}) {on_conflict}"
+                )
+            )
+            db.session.execute(text(f'DROP TABLE "{copy_table_name}"'))
+
+    @classmethod
+    def _copy_value(cls, column: Column, value: Any) -> str:
+        """Formats the value for the text format of COPY."""
+        if value is None:
+            return "\\N"
+        column_type = column.type.impl_instance if isinstance(column.type, TypeDecorator) else column.type
+        if isinstance(column_type, JSON):
+            formatted_value = json.dumps(value)
+        elif isinstance(value, bool):
+            formatted_value = "t" if value else "f"
+        else:
+            formatted_value = str(value)
+        return formatted_value.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+    @classmethod
+    def _mark_models_as_saved(cls, models: list[SpiffworkflowBaseDBModel]) -> None:
+        for model in models:
+            state = instance_state(model)
+            if not state.persistent or not state.modified:
+                continue
+            for key in state.mapper.columns.keys():
+                if key in state.committed_state:
+                    set_committed_value(model, key, state.dict.get(key))  # type: ignore
@@ -0,0 +1,36 @@
+import threading
+from collections.abc import Generator
+from contextlib import contextmanager
+from typing import Any
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+_thread_local = threading.local()
+
+
+class QueryCounter:
+    def __init__(self) -> None:
+        self.count = 0
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _count_query(*_args: Any, **_kwargs: Any) -> None:
+    for counter in getattr(_thread_local, "query_counters", []):
+        counter.count += 1
+
+
+@contextmanager
+def count_queries() -> Generator[QueryCounter, None, None]:
+    """Counts the sql statements the current thread sends to the database inside the block.
+
+    Blocks can be nested, in which case the statements are counted by each of them.
+    """
+    counter = QueryCounter()
+    if not hasattr(_thread_local, "query_counters"):
+        _thread_local.query_counters = []
+    _thread_local.query_counters.append(counter)
+    try:
+        yield counter
+    finally:
+        _thread_local.query_counters.remove(counter)
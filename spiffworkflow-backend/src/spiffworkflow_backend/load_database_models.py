@@ -70,6 +70,9 @@ from spiffworkflow_backend.models.task_definition import (
     TaskDefinitionModel,
 )  # noqa: F401
 from spiffworkflow_backend.models.json_data import JsonDataModel  # noqa: F401
+from spiffworkflow_backend.models.json_data_dictionary import (
+    JsonDataDictionaryModel,
+)  # noqa: F401
 from spiffworkflow_backend.models.bpmn_process_definition_relationship import (
     BpmnProcessDefinitionRelationshipModel,
 )  # noqa: F401
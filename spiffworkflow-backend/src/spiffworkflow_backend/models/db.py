@@ -24,6 +24,11 @@ def dialect_name() -> str:
     return cast(str, db.engine.dialect.name)
 
 
+def supports_skip_locked() -> bool:
+    """Whether SELECT ... FOR UPDATE SKIP LOCKED can be used. postgres and mysql 8 have it, sqlite does not."""
+    return dialect_name() in ["postgresql", "mysql"]
+
+
 class SpiffworkflowBaseDBModel(db.Model):  # type: ignore
     __abstract__ = True
 
@@ -1,42 +1,214 @@
 from __future__ import annotations
 
+import copy
 import json
+import sys
+import zlib
 from hashlib import sha256
-from typing import TypedDict
+from typing import Any
+
+if sys.version_info < (3, 11):
+    from typing_extensions import NotRequired
+    from typing_extensions import TypedDict
+else:
+    from typing import NotRequired
+    from typing import TypedDict
 
 from flask import current_app
-from sqlalchemy.dialects.mysql import insert as mysql_insert
-from sqlalchemy.dialects.postgresql import insert as postgres_insert
+from sqlalchemy import ForeignKey
+from sqlalchemy import orm
+from sqlalchemy.dialects.mysql import LONGBLOB
+from sqlalchemy.orm.attributes import set_committed_value
 
+from spiffworkflow_backend.helpers.bulk_writer import BulkWriter
+from spiffworkflow_backend.helpers.lru_cache import LruCache
 from spiffworkflow_backend.models.db import SpiffworkflowBaseDBModel
 from spiffworkflow_backend.models.db import db
+from spiffworkflow_backend.models.json_data_dictionary import JsonDataDictionaryModel
+
+JSON_DATA_CODECS = ["zlib", "zstd"]
+
+# dictionaries are at most 32KB so this keeps a few MB of them in memory per worker
+JSON_DATA_DICTIONARY_CACHE_SIZE = 100
+
+# the codec of records that were looked at for compression but are stored as they are because they are too small
+JSON_DATA_NOT_COMPRESSED = "none"
+
+# no chain of deltas should get anywhere near this long. hitting it means the chain loops back on itself.
+JSON_DATA_DELTA_MAX_DEPTH = 1000
 
 
 class JsonDataModelNotFoundError(Exception):
     pass
 
 
+class JsonDataCodecError(Exception):
+    pass
+
+
+class JsonDataDeltaError(Exception):
+    pass
+
+
 class JsonDataDict(TypedDict):
     hash: str
     data: dict
+    # set when data is a delta against the data of the record with this hash rather than the data itself
+    delta_base_hash: NotRequired[str | None]
+
+
+class JsonDataCodec:
+    """Compresses json data into the bytes stored in the compressed_data column of json_data records.
 
+    zlib is always available. zstd needs the zstandard package. Either can use a dictionary from the
+    json_data_dictionary table, which is looked up by id when decompressing.
+    """
 
-# delta algorithm <- just to save it for when we want to try to implement it:
-#   a = {"hey": { "hey2": 2, "hey3": 3, "hey6": 7 }, "hey30": 3, "hey40": 4}
-#   b = {"hey": { "hey2": 4, "hey5": 3 }, "hey20": 2, "hey30": 3}
-#   a_keys = set(a.keys())
-#   b_keys = set(b.keys())
-#   removed = a_keys - b_keys
-#   added_keys = b_keys - a_keys
-#   keys_present_in_both = a_keys & b_keys
-#   changed = {}
-#   for key_in_both in keys_present_in_both:
-#       if a[key_in_both] != b[key_in_both]:
-#           changed[key_in_both] = b[key_in_both]
-#   added = {}
-#   for added_key in added_keys:
-#       added[added_key] = b[added_key]
-#   final_tuple = [added, removed, changed]
+    _dictionaries: LruCache[int, bytes] | None = None
+
+    @classmethod
+    def compress(cls, data_json: str, codec: str, dictionary: JsonDataDictionaryModel | None = None) -> bytes:
+        data_bytes = data_json.encode("utf8")
+        dictionary_bytes = dictionary.dictionary if dictionary is not None else None
+        if codec == "zlib":
+            if dictionary_bytes is None:
+                compressor = zlib.compressobj()
+            else:
+                compressor = zlib.compressobj(zdict=dictionary_bytes)
+            return compressor.compress(data_bytes) + compressor.flush()
+        elif codec == "zstd":
+            zstandard = cls.zstandard()
+            dict_data = zstandard.ZstdCompressionDict(dictionary_bytes) if dictionary_bytes is not None else None
+            compressed: bytes = zstandard.ZstdCompressor(dict_data=dict_data).compress(data_bytes)
+            return compressed
+        raise JsonDataCodecError(f"Unknown json data codec '{codec}'. Valid codecs are: {JSON_DATA_CODECS}")
+
+    @classmethod
+    def decompress(cls, compressed_data: bytes, codec: str, dictionary_id: int | None) -> dict:
+        dictionary_bytes = cls.dictionary_bytes(dictionary_id) if dictionary_id is not None else None
+        if codec == "zlib":
+            if dictionary_bytes is None:
+                decompressor = zlib.decompressobj()
+            else:
+                decompressor = zlib.decompressobj(zdict=dictionary_bytes)
+            data_bytes = decompressor.decompress(compressed_data) + decompressor.flush()
+        elif codec == "zstd":
+            zstandard = cls.zstandard()
+            dict_data = zstandard.ZstdCompressionDict(dictionary_bytes) if dictionary_bytes is not None else None
+            data_bytes = zstandard.ZstdDecompressor(dict_data=dict_data).decompress(compressed_data)
+        else:
+            raise JsonDataCodecError(f"Cannot decompress json data with unknown codec '{codec}'")
+        data: dict = json.loads(data_bytes)
+        return data
+
+    @classmethod
+    def is_compressed(cls, codec: str | None) -> bool:
+        return codec in JSON_DATA_CODECS
+
+    @classmethod
+    def dictionary_bytes(cls, dictionary_id: int) -> bytes:
+        dictionary_bytes = cls.dictionaries().get(dictionary_id)
+        if dictionary_bytes is None:
+            cls.load_dictionaries({dictionary_id})
+            dictionary_bytes = cls.dictionaries().get(dictionary_id)
+        if dictionary_bytes is None:
+            raise JsonDataCodecError(f"Could not find json data dictionary with id: {dictionary_id}")
+        return dictionary_bytes
+
+    @classmethod
+    def load_dictionaries(cls, dictionary_ids: set[int]) -> None:
+        """Fetches the dictionaries that are not cached yet in one query so each one is only read once per worker."""
+        dictionaries = cls.dictionaries()
+        missing_dictionary_ids = {dictionary_id for dictionary_id in dictionary_ids if dictionaries.get(dictionary_id) is None}
+        if not missing_dictionary_ids:
+            return
+        # this can run while sqlalchemy is loading other rows so do not let it flush anything
+        with db.session.no_autoflush:
+            rows = (
+                JsonDataDictionaryModel.query.with_entities(JsonDataDictionaryModel.id, JsonDataDictionaryModel.dictionary)
+                .filter(JsonDataDictionaryModel.id.in_(missing_dictionary_ids))  # type: ignore
+                .all()
+            )
+        for row in rows:
+            dictionaries.set(row.id, row.dictionary)
+
+    @classmethod
+    def dictionaries(cls) -> LruCache[int, bytes]:
+        # dictionaries never change once they are created so they can be cached for good
+        if cls._dictionaries is None:
+            cls._dictionaries = LruCache(JSON_DATA_DICTIONARY_CACHE_SIZE)
+        return cls._dictionaries
+
+    @classmethod
+    def zstandard(cls) -> Any:
+        try:
+            import zstandard  # type: ignore
+        except ImportError as exception:
+            raise JsonDataCodecError("The zstd json data codec requires the zstandard package to be installed") from exception
+        return zstandard
+
+
+class JsonDataDelta:
+    """Stores a data dict as the top level keys that differ from the data of another json_data record, called its base.
+
+    Lists that only had items added to the end store just the new items, so a loop that appends to a list
+    does not store the whole list again on every pass. Deltas can be based on other deltas. The depth of a
+    record is how many deltas have to be applied to the nearest full record to rebuild it.
+
+    Which record a delta is based on is kept in the delta_base_hash column, never in the data itself,
+    so task data that happens to look like a delta is still read as it is.
+    """
+
+    @classmethod
+    def create(cls, base_data: dict, data: dict) -> dict | None:
+        """Returns None if the data is better stored in full because most of it changed."""
+        if not all(isinstance(key, str) for key in data) or not all(isinstance(key, str) for key in base_data):
+            return None
+
+        set_values = {}
+        appended_items = {}
+        for key, value in data.items():
+            if key not in base_data:
+                set_values[key] = value
+                continue
+            base_value = base_data[key]
+            if cls._same_json(base_value, value):
+                continue
+            if (
+                isinstance(value, list)
+                and isinstance(base_value, list)
+                and len(value) > len(base_value)
+                and cls._same_json(base_value, value[: len(base_value)])
+            ):
+                appended_items[key] = value[len(base_value) :]
+            else:
+                set_values[key] = value
+        if len(set_values) * 2 > len(data):
+            return None
+
+        removed_keys = [key for key in base_data if key not in data]
+        return {"set": set_values, "appended": appended_items, "removed": removed_keys}
+
+    @classmethod
+    def apply(cls, base_data: dict, delta: dict) -> dict:
+        data = copy.deepcopy(base_data)
+        for key in delta["removed"]:
+            del data[key]
+        data.update(delta["set"])
+        for key, items in delta["appended"].items():
+            data[key].extend(items)
+        return data
+
+    @classmethod
+    def _same_json(cls, a: Any, b: Any) -> bool:
+        """Like == except 1, 1.0, and True are all different since they are stored differently."""
+        if type(a) is not type(b):
+            return False
+        if isinstance(a, dict):
+            return a.keys() == b.keys() and all(cls._same_json(value, b[key]) for key, value in a.items())
+        if isinstance(a, list):
+            return len(a) == len(b) and all(cls._same_json(a_item, b_item) for a_item, b_item in zip(a, b, strict=True))
+        return bool(a == b)
 
 
 # to find the users of this model run:
@@ -47,7 +219,25 @@ class JsonDataModel(SpiffworkflowBaseDBModel):
 
     # this is a sha256 hash of spec and serializer_version
     hash: str = db.Column(db.String(255), nullable=False, unique=True, primary_key=True)
-    data: dict = db.Column(db.JSON, nullable=False)
+    # null when the record is compressed. it is filled in from compressed_data as the record is loaded.
+    data: dict = db.Column(db.JSON(none_as_null=True), nullable=True)
+
+    # how data is stored. null means it has not been looked at for compression yet.
+    codec: str | None = db.Column(db.String(50), nullable=True, index=True)
+
+    # the data compressed with the codec when the codec is one of JSON_DATA_CODECS
+    compressed_data: bytes | None = db.Column(db.LargeBinary().with_variant(LONGBLOB, "mysql"), nullable=True)
+    dictionary_id: int | None = db.Column(ForeignKey(JsonDataDictionaryModel.id), nullable=True)  # type: ignore
+
+    # the hash of the record that data is a delta against. null when data is stored in full.
+    delta_base_hash: str | None = db.Column(db.String(255), nullable=True)
+
+    @orm.reconstructor  # type: ignore
+    def decompress_on_load(self) -> None:
+        """Decompresses the data as the record is loaded so nothing else has to care how it is stored."""
+        if self.codec is not None and JsonDataCodec.is_compressed(self.codec) and self.compressed_data is not None:
+            data = JsonDataCodec.decompress(self.compressed_data, self.codec, self.dictionary_id)
+            set_committed_value(self, "data", data)  # type: ignore
 
     @classmethod
     def find_object_by_hash(cls, hash: str) -> JsonDataModel:
@@ -58,20 +248,146 @@ class JsonDataModel(SpiffworkflowBaseDBModel):
 
     @classmethod
     def find_data_dict_by_hash(cls, hash: str) -> dict:
-        return cls.find_object_by_hash(hash).data
+        json_data_dicts = cls.json_data_dicts_by_hash({hash})
+        if hash not in json_data_dicts:
+            raise JsonDataModelNotFoundError(f"Could not find a json data model entry with hash: {hash}")
+        return json_data_dicts[hash]
+
+    @classmethod
+    def json_data_dicts_by_hash(cls, hashes: set[str], delta_depths: dict[str, int] | None = None) -> dict[str, dict]:
+        """Returns the data of the records with the given hashes that exist.
+
+        Records stored as deltas are rebuilt from their bases, which are fetched a level at a time.
+        If delta_depths is given, the depth of each returned record is added to it.
+        """
+        if not hashes:
+            return {}
+        stored_data = cls._stored_data_by_hash(hashes)
+        missing_base_hashes = cls._missing_base_hashes(stored_data)
+        while missing_base_hashes:
+            base_data = cls._stored_data_by_hash(missing_base_hashes)
+            if len(base_data) != len(missing_base_hashes):
+                raise JsonDataModelNotFoundError(
+                    f"Could not find the bases of json data deltas: {sorted(missing_base_hashes - base_data.keys())}"
+                )
+            stored_data.update(base_data)
+            missing_base_hashes = cls._missing_base_hashes(stored_data)
+
+        data_by_hash: dict[str, dict] = {}
+        depths: dict[str, int] = {}
+        for hash in hashes:
+            if hash in stored_data:
+                cls._rebuild_data(hash, stored_data, data_by_hash, depths)
+        if delta_depths is not None:
+            delta_depths.update({hash: depths[hash] for hash in hashes if hash in depths})
+        return {hash: data_by_hash[hash] for hash in hashes if hash in data_by_hash}
+
+    @classmethod
+    def _stored_data_by_hash(cls, hashes: set[str]) -> dict[str, JsonDataDict]:
+        rows = (
+            cls.query.with_entities(cls.hash, cls.data, cls.codec, cls.compressed_data, cls.dictionary_id, cls.delta_base_hash)
+            .filter(cls.hash.in_(hashes))  # type: ignore
+            .all()
+        )
+        JsonDataCodec.load_dictionaries({row.dictionary_id for row in rows if row.dictionary_id is not None})
+        stored_data: dict[str, JsonDataDict] = {}
+        for row in rows:
+            data = row.data
+            if JsonDataCodec.is_compressed(row.codec):
+                data = JsonDataCodec.decompress(row.compressed_data, row.codec, row.dictionary_id)
+            stored_data[row.hash] = {"hash": row.hash, "data": data, "delta_base_hash": row.delta_base_hash}
+        return stored_data
+
+    @classmethod
+    def _missing_base_hashes(cls, stored_data: dict[str, JsonDataDict]) -> set[str]:
+        base_hashes = {record.get("delta_base_hash") for record in stored_data.values()}
+        return {base_hash for base_hash in base_hashes if base_hash is not None} - stored_data.keys()
+
+    @classmethod
+    def _rebuild_data(
+        cls, hash: str, stored_data: dict[str, JsonDataDict], data_by_hash: dict[str, dict], depths: dict[str, int]
+    ) -> None:
+        deltas_to_apply = []
+        current_hash = hash
+        while current_hash not in data_by_hash:
+            record = stored_data[current_hash]
+            base_hash = record.get("delta_base_hash")
+            if base_hash is None:
+                data_by_hash[current_hash] = record["data"]
+                depths[current_hash] = 0
+                break
+            deltas_to_apply.append((current_hash, base_hash))
+            if len(deltas_to_apply) > JSON_DATA_DELTA_MAX_DEPTH:
+                raise JsonDataDeltaError(f"The chain of json data deltas for hash {hash} is too long or loops back on itself")
+            current_hash = base_hash
+
+        for delta_hash, base_hash in reversed(deltas_to_apply):
+            data_by_hash[delta_hash] = JsonDataDelta.apply(data_by_hash[base_hash], stored_data[delta_hash]["data"])
+            depths[delta_hash] = depths[base_hash] + 1
 
     @classmethod
-    def insert_or_update_json_data_records(cls, json_data_hash_to_json_data_dict_mapping: dict[str, JsonDataDict]) -> None:
-        list_of_dicts = [*json_data_hash_to_json_data_dict_mapping.values()]
+    def insert_or_update_json_data_records(
+        cls, json_data_hash_to_json_data_dict_mapping: dict[str, JsonDataDict], process_model_identifier: str | None = None
+    ) -> None:
+        """Inserts the records that do not exist yet.
+
+        If a codec is configured, the data is compressed first, with the latest dictionary for the given
+        process model if dictionaries are turned on.
+        """
+        # every row needs the same keys to be inserted together
+        list_of_dicts: list[dict[str, Any]] = [
+            {
+                "hash": json_data_dict["hash"],
+                "data": json_data_dict["data"],
+                "delta_base_hash": json_data_dict.get("delta_base_hash"),
+            }
+            for json_data_dict in json_data_hash_to_json_data_dict_mapping.values()
+        ]
         if len(list_of_dicts) > 0:
-            on_duplicate_key_stmt = None
-            if current_app.config["SPIFFWORKFLOW_BACKEND_DATABASE_TYPE"] == "mysql":
-                insert_stmt = mysql_insert(JsonDataModel).values(list_of_dicts)
-                on_duplicate_key_stmt = insert_stmt.on_duplicate_key_update(hash=insert_stmt.inserted.hash)
-            else:
-                insert_stmt = postgres_insert(JsonDataModel).values(list_of_dicts)
-                on_duplicate_key_stmt = insert_stmt.on_conflict_do_nothing(index_elements=["hash"])
-            db.session.execute(on_duplicate_key_stmt)
+            codec = current_app.config["SPIFFWORKFLOW_BACKEND_JSON_DATA_CODEC"]
+            if codec:
+                dictionary = None
+                if (
+                    process_model_identifier is not None
+                    and current_app.config["SPIFFWORKFLOW_BACKEND_JSON_DATA_USE_DICTIONARIES"]
+                ):
+                    dictionary = cls.latest_dictionary(process_model_identifier, codec)
+                list_of_dicts = [
+                    {
+                        **cls.compressed_record(json_data_dict["hash"], json_data_dict["data"], codec, dictionary),
+                        "delta_base_hash": json_data_dict["delta_base_hash"],
+                    }
+                    for json_data_dict in list_of_dicts
+                ]
+
+            BulkWriter.insert(cls.__table__, list_of_dicts, ignore_existing=True)
+
+    @classmethod
+    def compressed_record(
+        cls, hash: str, data: dict, codec: str, dictionary: JsonDataDictionaryModel | None = None
+    ) -> dict[str, Any]:
+        """Returns the column values to store the data with, leaving data that is too small to benefit as it is."""
+        data_json = json.dumps(data, sort_keys=True)
+        if len(data_json) >= current_app.config["SPIFFWORKFLOW_BACKEND_JSON_DATA_COMPRESSION_MIN_BYTES"]:
+            compressed_data = JsonDataCodec.compress(data_json, codec, dictionary)
+            if len(compressed_data) < len(data_json):
+                return {
+                    "hash": hash,
+                    "data": None,
+                    "codec": codec,
+                    "compressed_data": compressed_data,
+                    "dictionary_id": dictionary.id if dictionary is not None else None,
+                }
+        return {"hash": hash, "data": data, "codec": JSON_DATA_NOT_COMPRESSED, "compressed_data": None, "dictionary_id": None}
+
+    @classmethod
+    def latest_dictionary(cls, process_model_identifier: str, codec: str) -> JsonDataDictionaryModel | None:
+        dictionary: JsonDataDictionaryModel | None = (
+            JsonDataDictionaryModel.query.filter_by(process_model_identifier=process_model_identifier, codec=codec)
+            .order_by(JsonDataDictionaryModel.id.desc())  # type: ignore
+            .first()
+        )
+        return dictionary
 
     @classmethod
     def insert_or_update_json_data_dict(cls, json_data_dict: JsonDataDict) -> None:
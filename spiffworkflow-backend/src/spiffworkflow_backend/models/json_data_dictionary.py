@@ -0,0 +1,23 @@
+from dataclasses import dataclass
+
+from sqlalchemy.dialects.mysql import LONGBLOB
+
+from spiffworkflow_backend.models.db import SpiffworkflowBaseDBModel
+from spiffworkflow_backend.models.db import db
+
+
+@dataclass
+class JsonDataDictionaryModel(SpiffworkflowBaseDBModel):
+    """A compression dictionary trained on the json data of one process model.
+
+    Compressed json_data records point at the dictionary they were compressed with so these must never be
+    changed or deleted. Training again adds a new dictionary which is then used for new records.
+    """
+
+    __tablename__ = "json_data_dictionary"
+
+    id: int = db.Column(db.Integer, primary_key=True)
+    process_model_identifier: str = db.Column(db.String(255), nullable=False, index=True)
+    codec: str = db.Column(db.String(50), nullable=False)
+    dictionary: bytes = db.Column(db.LargeBinary().with_variant(LONGBLOB, "mysql"), nullable=False)
+    created_at_in_seconds: int = db.Column(db.Integer, nullable=False)
@@ -6,6 +6,11 @@ from spiffworkflow_backend.models.db import SpiffworkflowBaseDBModel
 from spiffworkflow_backend.models.db import db
 from spiffworkflow_backend.models.process_instance import ProcessInstanceModel
 
+# lower numbers run first. instances get the default_priority of their process model or this one.
+PROCESS_INSTANCE_QUEUE_PRIORITY_HIGHEST = 0
+PROCESS_INSTANCE_QUEUE_PRIORITY_LOWEST = 9
+PROCESS_INSTANCE_QUEUE_PRIORITY_DEFAULT = 2
+
 
 @dataclass
 class ProcessInstanceQueueModel(SpiffworkflowBaseDBModel):
@@ -16,6 +21,8 @@ class ProcessInstanceQueueModel(SpiffworkflowBaseDBModel):
     priority: int = db.Column(db.Integer)
     locked_by: str | None = db.Column(db.String(80), index=True, nullable=True)
     locked_at_in_seconds: int | None = db.Column(db.Integer, index=True, nullable=True)
+    # the lock is a lease that the process holding it renews while it runs the instance. once it expires, others can take it.
+    lock_expires_at_in_seconds: int | None = db.Column(db.Integer, index=True, nullable=True)
     status: str = db.Column(db.String(50), index=True)
 
     # for timers. right now the apscheduler jobs without celery check for waiting process instances.
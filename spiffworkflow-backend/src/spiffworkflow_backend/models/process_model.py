@@ -22,6 +22,8 @@ PROCESS_MODEL_SUPPORTED_KEYS_FOR_DISK_SERIALIZATION = [
     "fault_or_suspend_on_exception",
     "exception_notification_addresses",
     "metadata_extraction_paths",
+    "connector_response_cache",
+    "default_priority",
 ]
 
 
@@ -44,6 +46,12 @@ class ProcessModelInfo:
     exception_notification_addresses: list[str] = field(default_factory=list)
     metadata_extraction_paths: list[dict[str, str]] | None = None
 
+    # responses of the operators in here are cached, like {"http/GetRequestV2": {"ttl_seconds": 300}}
+    connector_response_cache: dict[str, dict[str, Any]] | None = None
+
+    # queue priority of new process instances from 0 to 9. lower numbers run first. defaults to 2.
+    default_priority: int | None = None
+
     process_group: Any | None = None
     files: list[File] | None = field(default_factory=list[File])
 
@@ -113,6 +121,12 @@ class ProcessModelInfoSchema(Schema):
             required=False,
         )
     )
+    connector_response_cache = marshmallow.fields.Dict(
+        keys=marshmallow.fields.Str(),
+        values=marshmallow.fields.Dict(),
+        allow_none=True,
+    )
+    default_priority = marshmallow.fields.Integer(allow_none=True)
 
     @post_load
     def make_spec(self, data: dict[str, str | bool | int | NotificationType], **_: Any) -> ProcessModelInfo:
@@ -27,6 +27,7 @@ from spiffworkflow_backend.models.bpmn_process import BpmnProcessModel
 from spiffworkflow_backend.models.bpmn_process_definition import BpmnProcessDefinitionModel
 from spiffworkflow_backend.models.db import db
 from spiffworkflow_backend.models.json_data import JsonDataModel  # noqa: F401
+from spiffworkflow_backend.models.json_data import JsonDataModelNotFoundError
 from spiffworkflow_backend.models.process_instance import ProcessInstanceApiSchema
 from spiffworkflow_backend.models.process_instance import ProcessInstanceCannotBeDeletedError
 from spiffworkflow_backend.models.process_instance import ProcessInstanceModel
@@ -48,6 +49,7 @@ from spiffworkflow_backend.services.authorization_service import AuthorizationSe
 from spiffworkflow_backend.services.error_handling_service import ErrorHandlingService
 from spiffworkflow_backend.services.git_service import GitCommandError
 from spiffworkflow_backend.services.git_service import GitService
+from spiffworkflow_backend.services.process_instance_lock_service import ProcessInstanceLockLostError
 from spiffworkflow_backend.services.process_instance_processor import ProcessInstanceProcessor
 from spiffworkflow_backend.services.process_instance_queue_service import ProcessInstanceIsAlreadyLockedError
 from spiffworkflow_backend.services.process_instance_queue_service import ProcessInstanceIsNotEnqueuedError
@@ -128,6 +130,23 @@ def process_instance_suspend(
     return Response(json.dumps({"ok": True}), status=200, mimetype="application/json")
 
 
+def process_instance_priority_update(
+    process_instance_id: int,
+    modified_process_model_identifier: str,
+    body: dict[str, int],
+) -> flask.wrappers.Response:
+    process_instance = _find_process_instance_by_id_or_raise(process_instance_id)
+    queue_entry = ProcessInstanceQueueModel.query.filter_by(process_instance_id=process_instance.id).first()
+    if queue_entry is None:
+        raise ApiError(
+            error_code="process_instance_not_enqueued",
+            message=f"Cannot set the priority of process instance {process_instance.id}. It has not been enqueued.",
+            status_code=400,
+        )
+    ProcessInstanceQueueService.set_priority(process_instance, body["priority"])
+    return Response(json.dumps({"ok": True}), status=200, mimetype="application/json")
+
+
 def process_instance_resume(
     process_instance_id: int,
     modified_process_model_identifier: str,
@@ -201,17 +220,18 @@ def process_instance_report_show(
         )
     response_result: Report | ProcessInstanceReportModel | None = None
     if report_hash is not None:
-        json_data = JsonDataModel.query.filter_by(hash=report_hash).first()
-        if json_data is None:
+        try:
+            report_metadata = JsonDataModel.find_data_dict_by_hash(report_hash)
+        except JsonDataModelNotFoundError as exception:
             raise ApiError(
                 error_code="report_metadata_not_found",
                 message=f"Could not find report metadata for {report_hash}.",
-            )
+            ) from exception
         response_result = {
             "id": 0,
             "identifier": "custom",
             "name": "custom",
-            "report_metadata": json_data.data,
+            "report_metadata": report_metadata,
         }
     else:
         response_result = ProcessInstanceReportService.report_with_identifier(g.user, report_id, report_identifier)
@@ -687,6 +707,9 @@ def _process_instance_run(
     ) as e:
         ErrorHandlingService.handle_error(process_instance, e)
         raise e
+    except ProcessInstanceLockLostError:
+        # something else has the process instance now so it is not ours to mark as errored
+        raise
     except Exception as e:
         ErrorHandlingService.handle_error(process_instance, e)
         # FIXME: this is going to point someone to the wrong task - it's misinformation for errors in sub-processes.
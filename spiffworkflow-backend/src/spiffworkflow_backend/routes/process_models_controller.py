@@ -54,6 +54,8 @@ def process_model_create(
         "primary_process_id",
         "description",
         "metadata_extraction_paths",
+        "connector_response_cache",
+        "default_priority",
         "fault_or_suspend_on_exception",
         "exception_notification_addresses",
     ]
@@ -141,6 +143,8 @@ def process_model_update(
         "primary_process_id",
         "description",
         "metadata_extraction_paths",
+        "connector_response_cache",
+        "default_priority",
         "fault_or_suspend_on_exception",
         "exception_notification_addresses",
     ]
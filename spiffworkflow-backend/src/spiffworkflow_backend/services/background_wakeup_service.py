@@ -0,0 +1,150 @@
+import select
+import threading
+import time
+from collections import deque
+from collections.abc import Callable
+
+import flask
+from flask import current_app
+from sqlalchemy import text
+from sqlalchemy.event import listens_for
+from sqlalchemy.orm import Session
+from sqlalchemy.orm import SessionTransaction
+
+from spiffworkflow_backend.models.db import db
+from spiffworkflow_backend.models.db import dialect_name
+from spiffworkflow_backend.models.process_instance import ProcessInstanceStatus
+
+# a wakeup is called with the topic and the time in seconds from when there is work for it
+WakeupCallback = Callable[[str, int], None]
+
+# the topic for queue entries is the status of their process instance
+BACKGROUND_WAKEUP_TOPIC_MESSAGE = "message"
+BACKGROUND_WAKEUP_TOPIC_FUTURE_TASK = "future_task"
+
+# the statuses whose process instances the background scheduler runs itself when celery is not enabled
+BACKGROUND_WAKEUP_STATUS_TOPICS_WITHOUT_CELERY = [
+    ProcessInstanceStatus.waiting.value,
+    ProcessInstanceStatus.running.value,
+    ProcessInstanceStatus.user_input_required.value,
+]
+
+_SESSION_INFO_KEY = "background_wakeup_payloads"
+
+
+class BackgroundWakeupService:
+    """Tells the background scheduler that there is work for it, so it can run the job for it right away rather than at
+    its next poll.
+
+    With postgres, wakeups are sent with NOTIFY as part of the transaction that created the work, so they reach the
+    scheduler in any process once that transaction commits and never if it rolls back. Other databases have no
+    equivalent, so their wakeups only reach a scheduler in the process that committed the work, like a single process
+    deployment or the unit tests. Polling picks up everything else.
+    """
+
+    CHANNEL = "spiffworkflow_background_wakeup"
+    RECONNECT_DELAY_IN_SECONDS = 5
+
+    # wakeups that were committed in this process. older ones are dropped if nothing listens for them.
+    _local_payloads: deque[str] = deque(maxlen=10000)
+    _local_condition = threading.Condition()
+
+    @classmethod
+    def topics(cls, celery_enabled: bool) -> list[str]:
+        """Returns the topics the background scheduler has jobs for. Wakeups for any other topic would go unheard."""
+        topics = [BACKGROUND_WAKEUP_TOPIC_MESSAGE, ProcessInstanceStatus.not_started.value]
+        if celery_enabled:
+            return [*topics, BACKGROUND_WAKEUP_TOPIC_FUTURE_TASK]
+        return [*topics, *BACKGROUND_WAKEUP_STATUS_TOPICS_WITHOUT_CELERY]
+
+    @classmethod
+    def notify(cls, topic: str, not_before_in_seconds: int | None = None) -> None:
+        """Sends a wakeup for the topic when the current transaction commits, if the scheduler listens for it."""
+        if not current_app.config["SPIFFWORKFLOW_BACKEND_BACKGROUND_SCHEDULER_WAKEUPS_ENABLED"]:
+            return
+        if topic not in cls.topics(current_app.config["SPIFFWORKFLOW_BACKEND_CELERY_ENABLED"]):
+            return
+        if not_before_in_seconds is None:
+            not_before_in_seconds = round(time.time())
+        payload = f"{topic}:{not_before_in_seconds}"
+        if dialect_name() == "postgresql":
+            db.session.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": cls.CHANNEL, "payload": payload})
+        else:
+            session = db.session()
+            # so the wakeup goes with the transaction even if nothing else was done in it yet
+            if not session.in_transaction():
+                session.begin()
+            session.info.setdefault(_SESSION_INFO_KEY, set()).add(payload)
+
+    @classmethod
+    def publish_locally(cls, payloads: set[str]) -> None:
+        with cls._local_condition:
+            cls._local_payloads.extend(sorted(payloads))
+            cls._local_condition.notify_all()
+
+    @classmethod
+    def wait_for_local_payloads(cls, timeout_in_seconds: float) -> list[str]:
+        with cls._local_condition:
+            if len(cls._local_payloads) == 0:
+                cls._local_condition.wait(timeout_in_seconds)
+            payloads = list(cls._local_payloads)
+            cls._local_payloads.clear()
+        return payloads
+
+    @classmethod
+    def listen(cls, app: flask.app.Flask, on_wakeup: WakeupCallback, stop_event: threading.Event) -> None:
+        """Calls on_wakeup for each wakeup until stop_event is set. Meant to run in its own thread."""
+        with app.app_context():
+            while not stop_event.is_set():
+                try:
+                    if dialect_name() == "postgresql":
+                        cls._listen_to_postgres(on_wakeup, stop_event)
+                    else:
+                        cls._listen_locally(on_wakeup, stop_event)
+                except Exception as exception:
+                    # polling still runs everything, just later
+                    current_app.logger.exception(f"Background wakeups failed, trying again: {exception}")
+                    stop_event.wait(cls.RECONNECT_DELAY_IN_SECONDS)
+
+    @classmethod
+    def _listen_to_postgres(cls, on_wakeup: WakeupCallback, stop_event: threading.Event) -> None:
+        with db.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+            connection.exec_driver_sql(f"LISTEN {cls.CHANNEL}")
+            dbapi_connection = connection.connection.dbapi_connection
+            try:
+                while not stop_event.is_set():
+                    # wait at most a second at a time so stop_event is noticed
+                    if select.select([dbapi_connection], [], [], 1)[0]:
+                        dbapi_connection.poll()  # type: ignore
+                        while dbapi_connection.notifies:  # type: ignore
+                            cls._dispatch(dbapi_connection.notifies.pop(0).payload, on_wakeup)  # type: ignore
+            finally:
+                # the connection goes back to the pool
+                connection.exec_driver_sql("UNLISTEN *")
+
+    @classmethod
+    def _listen_locally(cls, on_wakeup: WakeupCallback, stop_event: threading.Event) -> None:
+        while not stop_event.is_set():
+            for payload in cls.wait_for_local_payloads(1):
+                cls._dispatch(payload, on_wakeup)
+
+    @classmethod
+    def _dispatch(cls, payload: str, on_wakeup: WakeupCallback) -> None:
+        topic, _, not_before_in_seconds = payload.rpartition(":")
+        try:
+            on_wakeup(topic, int(not_before_in_seconds))
+        except Exception as exception:
+            current_app.logger.exception(f"Could not handle background wakeup {payload}: {exception}")
+
+
+@listens_for(Session, "after_commit")
+def publish_committed_background_wakeups(session: Session) -> None:
+    payloads = session.info.pop(_SESSION_INFO_KEY, None)
+    if payloads:
+        BackgroundWakeupService.publish_locally(payloads)
+
+
+@listens_for(Session, "after_soft_rollback")
+def discard_rolled_back_background_wakeups(session: Session, previous_transaction: SessionTransaction) -> None:
+    if previous_transaction.parent is None:
+        session.info.pop(_SESSION_INFO_KEY, None)
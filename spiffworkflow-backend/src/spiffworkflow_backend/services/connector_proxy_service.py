@@ -0,0 +1,119 @@
+import os
+import threading
+import time
+from typing import Any
+
+import requests
+from flask import current_app
+from prometheus_client import Histogram
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from spiffworkflow_backend.config import CONNECTOR_PROXY_COMMAND_TIMEOUT
+
+CONNECTOR_PROXY_CALL_SECONDS = Histogram(
+    "spiffworkflow_connector_proxy_call_seconds",
+    "Time spent calling the connector proxy, by operator",
+    ["operator_identifier"],
+)
+
+# batches have a mix of operators so their timings are recorded under this instead
+CONNECTOR_PROXY_BATCH_OPERATOR_LABEL = "spiff__batch"
+
+
+class ConnectorProxyService:
+    """Sends service task commands to the connector proxy over a pooled keep-alive session.
+
+    Each worker process has its own session so the connections to the proxy are reused from one service task to the
+    next rather than set up for each call. The session is shared by the threads that run parallel engine steps, so
+    its pool is sized with SPIFFWORKFLOW_BACKEND_CONNECTOR_PROXY_POOL_SIZE.
+
+    Only failures to connect, where the request never reached the proxy, are retried unless status codes are set in
+    SPIFFWORKFLOW_BACKEND_CONNECTOR_PROXY_RETRY_STATUS_CODES, since a command that did reach it may not be safe to run twice.
+    """
+
+    _session: requests.Session | None = None
+    _session_pid: int | None = None
+    _session_lock = threading.Lock()
+
+    @classmethod
+    def post(cls, operator_identifier: str, url: str, json_data: Any) -> requests.Response:
+        start = time.perf_counter()
+        try:
+            return cls.session().post(url, json=json_data, timeout=CONNECTOR_PROXY_COMMAND_TIMEOUT)
+        finally:
+            CONNECTOR_PROXY_CALL_SECONDS.labels(operator_identifier=operator_identifier).observe(time.perf_counter() - start)
+
+    @classmethod
+    def post_batch(cls, url: str, commands: list[dict[str, Any]]) -> list[tuple[int, str]] | None:
+        """Sends commands to the /v1/do-batch endpoint of the proxy and returns the status code and body of each.
+
+        Each command is a dict with the operator_identifier and the params that would be posted to /v1/do for it.
+        The proxy responds with {"responses": [{"status_code": 200, "body": "..."}, ...]} in the same order.
+        Returns None if the batch as a whole fails, like with a proxy that has no batch endpoint.
+        """
+        start = time.perf_counter()
+        try:
+            response = cls.session().post(url, json={"commands": commands}, timeout=CONNECTOR_PROXY_COMMAND_TIMEOUT)
+            if response.status_code != 200:
+                current_app.logger.warning(f"Connector proxy batch call returned status code {response.status_code}")
+                return None
+            responses = response.json()["responses"]
+            if len(responses) != len(commands):
+                current_app.logger.warning(
+                    f"Connector proxy batch call returned {len(responses)} responses for {len(commands)} commands"
+                )
+                return None
+            return [(int(command_response["status_code"]), str(command_response["body"])) for command_response in responses]
+        except Exception as exception:
+            current_app.logger.warning(f"Connector proxy batch call failed: {exception.__class__.__name__}: {exception}")
+            return None
+        finally:
+            CONNECTOR_PROXY_CALL_SECONDS.labels(operator_identifier=CONNECTOR_PROXY_BATCH_OPERATOR_LABEL).observe(
+                time.perf_counter() - start
+            )
+
+    @classmethod
+    def session(cls) -> requests.Session:
+        # connections cannot be shared with a process this one forked, like a celery or gunicorn worker
+        if cls._session is None or cls._session_pid != os.getpid():
+            with cls._session_lock:
+                if cls._session is None or cls._session_pid != os.getpid():
+                    cls._session = cls._new_session()
+                    cls._session_pid = os.getpid()
+        return cls._session
+
+    @classmethod
+    def reset(cls) -> None:
+        with cls._session_lock:
+            if cls._session is not None:
+                cls._session.close()
+            cls._session = None
+            cls._session_pid = None
+
+    @classmethod
+    def _new_session(cls) -> requests.Session:
+        retries = int(current_app.config["SPIFFWORKFLOW_BACKEND_CONNECTOR_PROXY_RETRIES"])
+        retry_status_codes = [
+            int(status_code)
+            for status_code in str(current_app.config["SPIFFWORKFLOW_BACKEND_CONNECTOR_PROXY_RETRY_STATUS_CODES"]).split(",")
+            if status_code.strip()
+        ]
+        retry = Retry(
+            total=retries,
+            connect=retries,
+            read=0,
+            status=retries,
+            status_forcelist=retry_status_codes,
+            backoff_factor=float(current_app.config["SPIFFWORKFLOW_BACKEND_CONNECTOR_PROXY_RETRY_BACKOFF_FACTOR"]),
+            # commands are posted. whether they are retried at all is decided by the counts above.
+            allowed_methods=None,
+            # hand the last response back so the usual error handling sees it
+            raise_on_status=False,
+        )
+        pool_size = int(current_app.config["SPIFFWORKFLOW_BACKEND_CONNECTOR_PROXY_POOL_SIZE"])
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        session = requests.Session()
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
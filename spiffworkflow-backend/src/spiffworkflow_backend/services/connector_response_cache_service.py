@@ -0,0 +1,118 @@
+import hashlib
+import json
+import time
+from typing import Any
+from typing import TypedDict
+
+from flask import current_app
+from prometheus_client import Counter
+from SpiffWorkflow.task import Task as SpiffTask  # type: ignore
+
+from spiffworkflow_backend.helpers.lru_cache import LruCache
+from spiffworkflow_backend.services.process_model_service import ProcessModelService
+
+CONNECTOR_RESPONSE_CACHE_HITS = Counter(
+    "spiffworkflow_connector_response_cache_hits", "Connector calls answered from the response cache", ["operator_identifier"]
+)
+CONNECTOR_RESPONSE_CACHE_MISSES = Counter(
+    "spiffworkflow_connector_response_cache_misses",
+    "Connector calls that could be cached but were sent to the connector proxy",
+    ["operator_identifier"],
+)
+
+
+class ConnectorResponseCacheConfig(TypedDict):
+    ttl_seconds: int
+    include_task_data: bool
+
+
+class ConnectorResponseCacheService:
+    """Caches the responses of connector operators that are safe to call once for many service tasks, like lookups.
+
+    Caching is opt-in for each operator, either for a whole process model with connector_response_cache in its
+    process_model.json, like {"http/GetRequestV2": {"ttl_seconds": 300, "include_task_data": false}},
+    or for one service task with the connectorResponseCacheTtlSeconds and connectorResponseCacheIncludeTaskData properties.
+
+    Responses are keyed on the operator and its params as they were before secrets were filled in, so secrets never
+    end up in a key. The key is a hash, and task data is left out of it unless include_task_data is set, in which case
+    the task data is sent to the connector as usual but the response is only reused for tasks with the same data.
+    """
+
+    _cache: LruCache[str, tuple[float, str]] | None = None
+
+    @classmethod
+    def config_for_task(cls, operator_identifier: str, spiff_task: SpiffTask) -> ConnectorResponseCacheConfig | None:
+        """Returns how responses of the operator are cached for the task, or None if they are not."""
+        properties = getattr(spiff_task.task_spec, "extensions", {}).get("properties", {})
+        config: dict[str, Any] | None = None
+        if "connectorResponseCacheTtlSeconds" in properties:
+            config = {
+                "ttl_seconds": properties["connectorResponseCacheTtlSeconds"],
+                "include_task_data": str(properties.get("connectorResponseCacheIncludeTaskData", "")).lower() == "true",
+            }
+        else:
+            tld = current_app.config.get("THREAD_LOCAL_DATA")
+            process_model_identifier = getattr(tld, "process_model_identifier", None)
+            if process_model_identifier is None:
+                return None
+            process_model_config = ProcessModelService.get_connector_response_cache_config(process_model_identifier) or {}
+            config = process_model_config.get(operator_identifier)
+        if config is None:
+            return None
+
+        try:
+            ttl_seconds = int(config.get("ttl_seconds", 0))
+        except (TypeError, ValueError):
+            current_app.logger.warning(
+                f"Not caching responses of connector {operator_identifier}. Invalid ttl_seconds: {config.get('ttl_seconds')}"
+            )
+            return None
+        if ttl_seconds < 1:
+            return None
+        return {"ttl_seconds": ttl_seconds, "include_task_data": str(config.get("include_task_data", False)).lower() == "true"}
+
+    @classmethod
+    def cache_key(
+        cls, operator_identifier: str, bpmn_params: Any, spiff_task: SpiffTask, config: ConnectorResponseCacheConfig
+    ) -> str:
+        """Returns the key for the response. bpmn_params are the evaluated params before secrets are filled in."""
+        key_data: dict[str, Any] = {
+            "operator_identifier": operator_identifier,
+            "params": {name: param["value"] for name, param in bpmn_params.items()},
+        }
+        if config["include_task_data"]:
+            key_data["spiff__task_data"] = spiff_task.data
+        normalized_key_data = json.dumps(key_data, sort_keys=True, separators=(",", ":"), default=str)
+        return hashlib.sha256(normalized_key_data.encode()).hexdigest()
+
+    @classmethod
+    def get_response(cls, operator_identifier: str, cache_key: str) -> str | None:
+        response_text = cls.peek_response(cache_key)
+        if response_text is None:
+            CONNECTOR_RESPONSE_CACHE_MISSES.labels(operator_identifier=operator_identifier).inc()
+        else:
+            CONNECTOR_RESPONSE_CACHE_HITS.labels(operator_identifier=operator_identifier).inc()
+        return response_text
+
+    @classmethod
+    def peek_response(cls, cache_key: str) -> str | None:
+        """Returns the cached response without counting it as a hit or a miss."""
+        cache = cls.cache()
+        cache_entry = cache.get(cache_key)
+        if cache_entry is None:
+            return None
+        (expires_at, response_text) = cache_entry
+        if expires_at <= time.monotonic():
+            cache.delete(cache_key)
+            return None
+        return response_text
+
+    @classmethod
+    def set_response(cls, cache_key: str, config: ConnectorResponseCacheConfig, response_text: str) -> None:
+        cls.cache().set(cache_key, (time.monotonic() + config["ttl_seconds"], response_text))
+
+    @classmethod
+    def cache(cls) -> LruCache[str, tuple[float, str]]:
+        if cls._cache is None:
+            cls._cache = LruCache(current_app.config["SPIFFWORKFLOW_BACKEND_CONNECTOR_RESPONSE_CACHE_SIZE"])
+        return cls._cache
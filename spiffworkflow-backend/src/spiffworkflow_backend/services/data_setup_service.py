@@ -14,6 +14,7 @@ from spiffworkflow_backend.models.reference_cache import ReferenceCacheModel
 from spiffworkflow_backend.services.file_system_service import FileSystemService
 from spiffworkflow_backend.services.message_definition_service import MessageDefinitionService
 from spiffworkflow_backend.services.process_model_service import ProcessModelService
+from spiffworkflow_backend.services.process_model_spec_cache_service import ProcessModelSpecCacheService
 from spiffworkflow_backend.services.reference_cache_service import ReferenceCacheService
 from spiffworkflow_backend.services.spec_file_service import SpecFileService
 
@@ -32,6 +33,9 @@ class DataSetupService:
         """
         current_app.logger.debug("DataSetupService.save_all_process_models() start")
 
+        # the files may have changed underneath us, like after a git pull, so do not trust any parsed specs
+        ProcessModelSpecCacheService.clear()
+
         failing_process_models = []
         files = FileSystemService.walk_files_from_root_path(True, None)
         reference_objects: dict[str, ReferenceCacheModel] = {}
@@ -0,0 +1,147 @@
+import concurrent.futures
+import threading
+from collections.abc import Callable
+from typing import Any
+from typing import TypeVar
+
+import flask.app
+from flask import current_app
+from flask import g
+from flask.ctx import AppContext
+from prometheus_client import Gauge
+
+from spiffworkflow_backend.models.db import db
+
+T = TypeVar("T")
+
+ENGINE_STEP_QUEUE_DEPTH = Gauge(
+    "spiffworkflow_engine_step_queue_depth", "Engine steps waiting for a thread in the engine step executor of this worker"
+)
+ENGINE_STEP_ACTIVE = Gauge(
+    "spiffworkflow_engine_step_active", "Engine steps running in the engine step executor of this worker right now"
+)
+
+
+class EngineStepExecutorService:
+    """Runs the engine steps of parallel branches in a thread pool that lives for the life of the worker process.
+
+    The pool is sized with SPIFFWORKFLOW_BACKEND_ENGINE_STEP_MAX_WORKERS so a process instance that fans out to
+    hundreds of service tasks cannot start hundreds of threads, and each call to run only keeps
+    SPIFFWORKFLOW_BACKEND_ENGINE_STEP_MAX_WORKERS_PER_PROCESS_INSTANCE steps in the pool at once so one instance
+    cannot take every thread from the others.
+
+    Each thread keeps an app context pushed between steps rather than pushing a new one for every step.
+    The db session and g are cleared after each step since those are the parts of the context that hold state.
+    """
+
+    _executor: concurrent.futures.ThreadPoolExecutor | None = None
+    _executor_lock = threading.Lock()
+    _thread_local_data = threading.local()
+
+    _metrics_lock = threading.Lock()
+    _queued_count = 0
+    _active_count = 0
+
+    @classmethod
+    def run(
+        cls,
+        functions: list[Callable[[], T]],
+        app: flask.app.Flask,
+        before_each: Callable[[], None] | None = None,
+    ) -> list[T]:
+        """Calls each function in the pool within an app context for app and returns their results in order.
+
+        before_each is called in the app context before each function. If a function raises, the functions that
+        were not started yet are skipped and the first exception is raised once the running ones finish.
+        """
+        if getattr(cls._thread_local_data, "is_engine_step_thread", False):
+            # a step that runs more steps would wait on the pool it is holding a thread from, so run them here
+            inline_results = []
+            for function in functions:
+                if before_each is not None:
+                    before_each()
+                inline_results.append(function())
+            return inline_results
+
+        max_in_flight = max(1, current_app.config["SPIFFWORKFLOW_BACKEND_ENGINE_STEP_MAX_WORKERS_PER_PROCESS_INSTANCE"])
+        executor = cls.executor()
+        results_by_future: dict[concurrent.futures.Future, int] = {}
+        results: list[Any] = [None] * len(functions)
+        first_exception: BaseException | None = None
+        next_index = 0
+        in_flight: set[concurrent.futures.Future] = set()
+        while next_index < len(functions) or in_flight:
+            while first_exception is None and next_index < len(functions) and len(in_flight) < max_in_flight:
+                cls._change_counts(queued=1)
+                future = executor.submit(cls._run_in_thread, functions[next_index], app, before_each)
+                results_by_future[future] = next_index
+                in_flight.add(future)
+                next_index += 1
+            if first_exception is not None and not in_flight:
+                break
+            done, in_flight = concurrent.futures.wait(in_flight, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                exception = future.exception()
+                if exception is not None:
+                    first_exception = first_exception or exception
+                else:
+                    results[results_by_future[future]] = future.result()
+        if first_exception is not None:
+            raise first_exception
+        return results
+
+    @classmethod
+    def executor(cls) -> concurrent.futures.ThreadPoolExecutor:
+        if cls._executor is None:
+            with cls._executor_lock:
+                if cls._executor is None:
+                    cls._executor = concurrent.futures.ThreadPoolExecutor(
+                        max_workers=current_app.config["SPIFFWORKFLOW_BACKEND_ENGINE_STEP_MAX_WORKERS"],
+                        thread_name_prefix="engine-step",
+                    )
+        return cls._executor
+
+    @classmethod
+    def metrics(cls) -> dict[str, int]:
+        with cls._metrics_lock:
+            return {"queued": cls._queued_count, "active": cls._active_count}
+
+    @classmethod
+    def _run_in_thread(cls, function: Callable[[], T], app: flask.app.Flask, before_each: Callable[[], None] | None) -> T:
+        cls._change_counts(queued=-1, active=1)
+        try:
+            cls._thread_local_data.is_engine_step_thread = True
+            cls._app_context_for_thread(app)
+            try:
+                if before_each is not None:
+                    before_each()
+                return function()
+            finally:
+                # what the teardown of the app context would do, plus clearing what the step put on g
+                db.session.remove()
+                for key in list(g):
+                    g.pop(key)
+        finally:
+            cls._change_counts(active=-1)
+
+    @classmethod
+    def _app_context_for_thread(cls, app: flask.app.Flask) -> AppContext:
+        app_context: AppContext | None = getattr(cls._thread_local_data, "app_context", None)
+        if app_context is not None and app_context.app is not app:
+            app_context.pop()
+            app_context = None
+        if app_context is None:
+            app_context = app.app_context()
+            app_context.push()
+            cls._thread_local_data.app_context = app_context
+        return app_context
+
+    @classmethod
+    def _change_counts(cls, queued: int = 0, active: int = 0) -> None:
+        with cls._metrics_lock:
+            cls._queued_count += queued
+            cls._active_count += active
+
+
+ENGINE_STEP_QUEUE_DEPTH.set_function(lambda: EngineStepExecutorService.metrics()["queued"])
+ENGINE_STEP_ACTIVE.set_function(lambda: EngineStepExecutorService.metrics()["active"])
@@ -2,11 +2,13 @@ import re
 from sys import exc_info
 
 import jinja2
+from flask import current_app
 from jinja2 import TemplateSyntaxError
 from SpiffWorkflow.bpmn.exceptions import WorkflowTaskException  # type: ignore
 from SpiffWorkflow.task import Task as SpiffTask  # type: ignore
 
 from spiffworkflow_backend.exceptions.api_error import ApiError
+from spiffworkflow_backend.helpers.lru_cache import LruCache
 from spiffworkflow_backend.models.task import TaskModel  # noqa: F401
 from spiffworkflow_backend.models.task_instructions_for_end_user import TaskInstructionsForEndUserModel
 from spiffworkflow_backend.services.task_service import TaskModelError
@@ -44,6 +46,11 @@ class JinjaHelpers:
 
 
 class JinjaService:
+    # templates are compiled once per worker process with one environment, since the same instructions for end user
+    # are rendered every time someone polls the progress of a process instance.
+    _environment: jinja2.Environment | None = None
+    _template_cache: LruCache[str, jinja2.Template] | None = None
+
     @classmethod
     def render_instructions_for_end_user(
         cls, task: TaskModel | SpiffTask | None = None, extensions: dict | None = None, task_data: dict | None = None
@@ -67,10 +74,8 @@ class JinjaService:
     def render_jinja_template(
         cls, unprocessed_template: str, task: TaskModel | SpiffTask | None = None, task_data: dict | None = None
     ) -> str:
-        jinja_environment = jinja2.Environment(autoescape=True, lstrip_blocks=True, trim_blocks=True)
-        jinja_environment.filters.update(JinjaHelpers.get_helper_mapping())
         try:
-            template = jinja_environment.from_string(unprocessed_template)
+            template = cls.template_from_string(unprocessed_template)
             if task_data is not None:
                 data = task_data
             elif isinstance(task, TaskModel):
@@ -109,6 +114,30 @@ class JinjaService:
             wfe.add_note("Jinja2 template errors can happen when trying to display task data")
             raise wfe from error
 
+    @classmethod
+    def template_from_string(cls, template_source: str) -> jinja2.Template:
+        """Returns the compiled template, compiling it only the first time. Templates with syntax errors are not cached."""
+        template_cache = cls.template_cache()
+        template = template_cache.get(template_source)
+        if template is None:
+            template = cls.environment().from_string(template_source)
+            template_cache.set(template_source, template)
+        return template
+
+    @classmethod
+    def environment(cls) -> jinja2.Environment:
+        if cls._environment is None:
+            jinja_environment = jinja2.Environment(autoescape=True, lstrip_blocks=True, trim_blocks=True)
+            jinja_environment.filters.update(JinjaHelpers.get_helper_mapping())
+            cls._environment = jinja_environment
+        return cls._environment
+
+    @classmethod
+    def template_cache(cls) -> LruCache[str, jinja2.Template]:
+        if cls._template_cache is None:
+            cls._template_cache = LruCache(current_app.config["SPIFFWORKFLOW_BACKEND_JINJA_TEMPLATE_CACHE_SIZE"])
+        return cls._template_cache
+
     @classmethod
     def add_instruction_for_end_user_if_appropriate(
         cls, spiff_tasks: list[SpiffTask], process_instance_id: int, tasks_that_have_been_seen: set[str]
@@ -0,0 +1,88 @@
+import json
+
+from flask import current_app
+
+from spiffworkflow_backend.models.db import db
+from spiffworkflow_backend.models.json_data import JsonDataCodec
+from spiffworkflow_backend.models.json_data import JsonDataModel
+from spiffworkflow_backend.models.json_data_dictionary import JsonDataDictionaryModel
+from spiffworkflow_backend.models.process_instance import ProcessInstanceModel
+from spiffworkflow_backend.models.task import TaskModel  # noqa: F401
+
+# zlib cannot use more than 32KB of a dictionary
+JSON_DATA_DICTIONARY_SIZE = 32768
+JSON_DATA_DICTIONARY_SAMPLE_COUNT = 500
+JSON_DATA_DICTIONARY_MINIMUM_SAMPLE_COUNT = 10
+
+
+class JsonDataCompressionService:
+    @classmethod
+    def train_dictionary(cls, process_model_identifier: str, codec: str | None = None) -> JsonDataDictionaryModel | None:
+        """Builds a dictionary from the latest task data of the process model and adds it to the db session.
+
+        Returns None if the process model does not have enough task data to be worth it yet.
+        """
+        codec = codec or current_app.config["SPIFFWORKFLOW_BACKEND_JSON_DATA_CODEC"]
+        json_data_hashes = [
+            row.json_data_hash
+            for row in TaskModel.query.with_entities(TaskModel.json_data_hash)
+            .join(ProcessInstanceModel, ProcessInstanceModel.id == TaskModel.process_instance_id)
+            .filter(ProcessInstanceModel.process_model_identifier == process_model_identifier)
+            .order_by(TaskModel.end_in_seconds.desc())  # type: ignore
+            .limit(JSON_DATA_DICTIONARY_SAMPLE_COUNT)
+            .all()
+        ]
+        json_data_dicts = JsonDataModel.json_data_dicts_by_hash(set(json_data_hashes))
+        # oldest first so the newest data ends up at the end of a zlib dictionary where it helps the most
+        samples: list[bytes] = []
+        for json_data_hash in reversed(dict.fromkeys(json_data_hashes)):
+            if json_data_hash in json_data_dicts and json_data_dicts[json_data_hash]:
+                samples.append(json.dumps(json_data_dicts[json_data_hash], sort_keys=True).encode("utf8"))
+        if len(samples) < JSON_DATA_DICTIONARY_MINIMUM_SAMPLE_COUNT:
+            return None
+
+        if codec == "zstd":
+            zstandard = JsonDataCodec.zstandard()
+            try:
+                dictionary_bytes = zstandard.train_dictionary(JSON_DATA_DICTIONARY_SIZE, samples).as_bytes()
+            except zstandard.ZstdError as exception:
+                current_app.logger.warning(
+                    f"Could not train a json data dictionary for '{process_model_identifier}': {exception}"
+                )
+                return None
+        else:
+            # zlib has no trainer. it looks for matches in the raw dictionary so recent samples make a good one.
+            dictionary_bytes = b"".join(samples)[-JSON_DATA_DICTIONARY_SIZE:]
+
+        dictionary = JsonDataDictionaryModel(
+            process_model_identifier=process_model_identifier, codec=codec, dictionary=dictionary_bytes
+        )
+        db.session.add(dictionary)
+        return dictionary
+
+    @classmethod
+    def train_missing_dictionaries(cls, limit: int = 10) -> list[JsonDataDictionaryModel]:
+        """Trains dictionaries for up to limit process models that do not have one for the configured codec.
+
+        Process models without enough data yet are skipped and tried again the next time.
+        """
+        codec = current_app.config["SPIFFWORKFLOW_BACKEND_JSON_DATA_CODEC"]
+        process_model_identifiers_with_dictionaries = JsonDataDictionaryModel.query.with_entities(
+            JsonDataDictionaryModel.process_model_identifier
+        ).filter(JsonDataDictionaryModel.codec == codec)
+        process_model_identifiers = [
+            row.process_model_identifier
+            for row in ProcessInstanceModel.query.with_entities(ProcessInstanceModel.process_model_identifier)
+            .filter(ProcessInstanceModel.process_model_identifier.not_in(process_model_identifiers_with_dictionaries))  # type: ignore
+            .distinct()
+            .all()
+        ]
+        dictionaries: list[JsonDataDictionaryModel] = []
+        for process_model_identifier in process_model_identifiers:
+            if len(dictionaries) >= limit:
+                break
+            dictionary = cls.train_dictionary(process_model_identifier, codec)
+            if dictionary is not None:
+                dictionaries.append(dictionary)
+        db.session.commit()
+        return dictionaries
@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import copy
+import threading
+from collections.abc import Callable
+from collections.abc import Iterator
+from collections.abc import MutableMapping
+from typing import Any
+
+from SpiffWorkflow.bpmn.workflow import BpmnWorkflow  # type: ignore
+from SpiffWorkflow.task import Task as SpiffTask  # type: ignore
+
+from spiffworkflow_backend.models.json_data import JsonDataModel
+
+# the states of the tasks that get LazyTaskData. spiff does not run these again.
+LAZY_TASK_DATA_STATES = ["COMPLETED", "ERROR", "CANCELLED"]
+
+
+def is_unloaded_task_data(data: Any) -> bool:
+    return isinstance(data, LazyTaskData) and not data.is_loaded()
+
+
+class LazyTaskDataLoader:
+    """Fetches the json_data records behind LazyTaskData objects the first time one of them is used.
+
+    Each fetch also pulls in up to batch_size - 1 other pending records so touching many tasks in a row
+    does not turn into a query per task. Fetched records are dropped once every task using them has loaded.
+    """
+
+    def __init__(self, restore: Callable[[Any], Any], batch_size: int = 25) -> None:
+        self.restore = restore
+        self.batch_size = max(batch_size, 1)
+        self.fetch_count = 0
+        self.lock = threading.RLock()
+        self._pending_counts: dict[str, int] = {}
+        self._fetched: dict[str, dict] = {}
+
+    def register(self, json_data_hash: str) -> None:
+        with self.lock:
+            self._pending_counts[json_data_hash] = self._pending_counts.get(json_data_hash, 0) + 1
+
+    def data_for(self, json_data_hash: str) -> dict:
+        with self.lock:
+            if json_data_hash not in self._fetched:
+                hashes_to_fetch = {json_data_hash}
+                for pending_hash in self._pending_counts:
+                    if len(hashes_to_fetch) >= self.batch_size:
+                        break
+                    if pending_hash not in self._fetched:
+                        hashes_to_fetch.add(pending_hash)
+                self._fetched.update(JsonDataModel.json_data_dicts_by_hash(hashes_to_fetch))
+                self.fetch_count += 1
+
+            data = self._fetched[json_data_hash]
+            self._pending_counts[json_data_hash] -= 1
+            if self._pending_counts[json_data_hash] < 1:
+                del self._pending_counts[json_data_hash]
+                del self._fetched[json_data_hash]
+
+        # several tasks can share a record so give each its own copy, just as a full deserialization would
+        restored_data: dict = self.restore(copy.deepcopy(data))
+        return restored_data
+
+
+class LazyTaskData(MutableMapping):
+    """Stands in for the data of a finished spiff task until something actually uses it.
+
+    It is deliberately not a dict. Code written in C, like json.dumps or exec, reads the storage of a dict
+    directly, so a dict subclass would look empty to it until loaded. This fails loudly there instead, and is
+    only put on finished tasks, which spiff does not run again and only reads through the mapping methods.
+
+    The first time it is used, the data is loaded and set as the data of its task, so from then on everything
+    works with a plain dict. Until it is loaded it cannot have changed, which lets the TaskService skip rehashing it.
+    """
+
+    def __init__(self, json_data_hash: str, loader: LazyTaskDataLoader, spiff_task: SpiffTask) -> None:
+        self.json_data_hash = json_data_hash
+        self._loader = loader
+        self._spiff_task = spiff_task
+        self._data: dict | None = None
+        loader.register(json_data_hash)
+
+    def is_loaded(self) -> bool:
+        return self._data is not None
+
+    def loaded_data(self) -> dict:
+        if self._data is None:
+            with self._loader.lock:
+                if self._data is None:
+                    self._data = self._loader.data_for(self.json_data_hash)
+                    if self._spiff_task.data is self:
+                        self._spiff_task.data = self._data
+        return self._data
+
+    def __getitem__(self, key: Any) -> Any:
+        return self.loaded_data()[key]
+
+    def __setitem__(self, key: Any, value: Any) -> None:
+        self.loaded_data()[key] = value
+
+    def __delitem__(self, key: Any) -> None:
+        del self.loaded_data()[key]
+
+    def __iter__(self) -> Iterator:
+        return iter(self.loaded_data())
+
+    def __len__(self) -> int:
+        return len(self.loaded_data())
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, LazyTaskData):
+            other = other.loaded_data()
+        return self.loaded_data() == other
+
+    def __repr__(self) -> str:
+        return repr(self.loaded_data())
+
+    def copy(self) -> dict:
+        return dict(self.loaded_data())
+
+    def __copy__(self) -> dict:
+        return self.copy()
+
+    def __deepcopy__(self, memo: dict) -> dict:
+        return copy.deepcopy(self.loaded_data(), memo)
+
+    def __reduce_ex__(self, protocol: Any) -> Any:
+        return (dict, (self.copy(),))
+
+
+def loaded_task_data(data: dict | LazyTaskData) -> dict:
+    """Returns the data as a plain dict, loading it if it is lazy, for code that needs a real dict like serializers."""
+    if isinstance(data, LazyTaskData):
+        return data.loaded_data()
+    return data
+
+
+def load_lazy_task_data(bpmn_process_instance: BpmnWorkflow) -> None:
+    """Loads the task data of the workflow that is still lazy so whatever reads it next, like a serializer, gets plain dicts."""
+    for workflow in [bpmn_process_instance, *bpmn_process_instance.subprocesses.values()]:
+        for spiff_task in workflow.tasks.values():
+            if isinstance(spiff_task.data, LazyTaskData):
+                spiff_task.data.loaded_data()
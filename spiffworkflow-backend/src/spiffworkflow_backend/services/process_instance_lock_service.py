@@ -1,20 +1,60 @@
+import os
 import threading
 import time
 from typing import Any
 
+import flask
 from billiard import current_process  # type: ignore
 from flask import current_app
+from prometheus_client import Counter
+from prometheus_client import Histogram
 from sqlalchemy import and_
 from sqlalchemy import or_
 
 from spiffworkflow_backend.models.db import db
 from spiffworkflow_backend.models.process_instance_queue import ProcessInstanceQueueModel
 
+PROCESS_INSTANCE_LOCK_WAIT_SECONDS = Histogram(
+    "spiffworkflow_process_instance_lock_wait_seconds",
+    "Time spent trying to lock a process instance, by locking domain and whether the lock was acquired",
+    ["domain", "acquired"],
+)
+PROCESS_INSTANCE_LOCK_HOLD_SECONDS = Histogram(
+    "spiffworkflow_process_instance_lock_hold_seconds",
+    "Time process instances were kept locked, by locking domain",
+    ["domain"],
+    buckets=(0.1, 0.5, 1, 5, 10, 30, 60, 120, 300, 600, 1800, 3600),
+)
+PROCESS_INSTANCE_LOCKS_RECLAIMED = Counter(
+    "spiffworkflow_process_instance_locks_reclaimed", "Process instance locks released because their lease expired"
+)
+PROCESS_INSTANCE_LOCK_LEASES_LOST = Counter(
+    "spiffworkflow_process_instance_lock_leases_lost",
+    "Process instance locks that could not be renewed because something else had taken them",
+)
+
 
 class ExpectedLockNotFoundError(Exception):
     pass
 
 
+class ProcessInstanceLockLostError(Exception):
+    pass
+
+
+class HeldLease:
+    def __init__(self, locked_by: str, domain: str, lock_expires_at_in_seconds: int) -> None:
+        self.locked_by = locked_by
+        self.domain = domain
+        self.locked_at = time.monotonic()
+        self.lock_expires_at_in_seconds = lock_expires_at_in_seconds
+        self.taken_by_something_else = False
+
+    def is_lost(self) -> bool:
+        # once a lease runs out without being renewed, like during a database outage, something else can take the lock
+        return self.taken_by_something_else or time.time() >= self.lock_expires_at_in_seconds
+
+
 class ProcessInstanceLockService:
     # when we lock process instances, we need to make sure we do not use the same locking identifier
     # as anything else, or else we will use their lock and be unintentionally stomping on the same
@@ -25,6 +65,11 @@ class ProcessInstanceLockService:
     # if we are not in celery, get_current_process_index will return None, and that is also fine, since
     # if we are not in celery, there is no concern about multiple things happening at once in a process (other than.
     # theading, which is accounted for by the thread_id).
+    # leases held by all threads of this process, by queue entry id, so the heartbeat can renew them
+    _held_leases: dict[int, HeldLease] = {}
+    _held_leases_lock = threading.Lock()
+    _heartbeat_pid: int | None = None
+
     @classmethod
     def get_current_process_index(cls) -> Any:
         process = current_process()
@@ -36,6 +81,12 @@ class ProcessInstanceLockService:
         tld = current_app.config["THREAD_LOCAL_DATA"]
         if not hasattr(tld, "lock_service_context"):
             tld.lock_service_context = {}
+        previous_context = tld.lock_service_context.get(cls.get_current_process_index())
+        if previous_context is not None:
+            # stop renewing locks that the thread forgot about so they can expire
+            with cls._held_leases_lock:
+                for queue_entry_id in previous_context["locks"].values():
+                    cls._held_leases.pop(queue_entry_id, None)
         tld.lock_service_context[cls.get_current_process_index()] = {
             "domain": domain,
             "uuid": current_app.config["PROCESS_UUID"],
@@ -55,10 +106,18 @@ class ProcessInstanceLockService:
         ctx = cls.get_thread_local_locking_context()
         return f"{ctx['domain']}:{ctx['uuid']}:{ctx['thread_id']}:{cls.get_current_process_index()}"
 
+    @classmethod
+    def lease_expires_at_in_seconds(cls, current_time: int) -> int:
+        return current_time + int(current_app.config["SPIFFWORKFLOW_BACKEND_INSTANCE_LOCK_LEASE_DURATION_IN_SECONDS"])
+
     @classmethod
     def lock(cls, process_instance_id: int, queue_entry: ProcessInstanceQueueModel) -> None:
         ctx = cls.get_thread_local_locking_context()
         ctx["locks"][process_instance_id] = queue_entry.id
+        lock_expires_at_in_seconds = queue_entry.lock_expires_at_in_seconds or cls.lease_expires_at_in_seconds(round(time.time()))
+        with cls._held_leases_lock:
+            cls._held_leases[queue_entry.id] = HeldLease(cls.locked_by(), ctx["domain"], lock_expires_at_in_seconds)
+        cls._start_heartbeat_if_needed()
 
     @classmethod
     def unlock(cls, process_instance_id: int) -> int:
@@ -70,40 +129,157 @@ class ProcessInstanceLockService:
     @classmethod
     def try_unlock(cls, process_instance_id: int) -> int | None:
         ctx = cls.get_thread_local_locking_context()
-        return ctx["locks"].pop(process_instance_id, None)  # type: ignore
+        queue_entry_id: int | None = ctx["locks"].pop(process_instance_id, None)
+        if queue_entry_id is not None:
+            with cls._held_leases_lock:
+                held_lease = cls._held_leases.pop(queue_entry_id, None)
+            if held_lease is not None:
+                PROCESS_INSTANCE_LOCK_HOLD_SECONDS.labels(held_lease.domain).observe(time.monotonic() - held_lease.locked_at)
+        return queue_entry_id
 
     @classmethod
     def has_lock(cls, process_instance_id: int) -> bool:
         ctx = cls.get_thread_local_locking_context()
         return process_instance_id in ctx["locks"]
 
+    @classmethod
+    def raise_if_lease_lost(cls, process_instance_id: int) -> None:
+        """Stops a run whose lock may belong to something else now because its lease was not renewed in time.
+
+        Does nothing if the current thread does not hold a lock for the process instance.
+        """
+        ctx = cls.get_thread_local_locking_context()
+        queue_entry_id = ctx["locks"].get(process_instance_id)
+        if queue_entry_id is None:
+            return
+        with cls._held_leases_lock:
+            held_lease = cls._held_leases.get(queue_entry_id)
+        if held_lease is not None and held_lease.is_lost():
+            raise ProcessInstanceLockLostError(
+                f"{held_lease.locked_by} lost its lock on process instance {process_instance_id} because its lease"
+                " was not renewed in time."
+            )
+
+    @classmethod
+    def renew_leases(cls) -> None:
+        """Extends the leases of all locks held by this process with one update for each thread holding locks.
+
+        Leases that something else took after they expired are marked as lost so the runs holding them stop.
+        """
+        with cls._held_leases_lock:
+            queue_entry_ids_by_locked_by: dict[str, list[int]] = {}
+            for queue_entry_id, held_lease in cls._held_leases.items():
+                if not held_lease.taken_by_something_else:
+                    queue_entry_ids_by_locked_by.setdefault(held_lease.locked_by, []).append(queue_entry_id)
+        if len(queue_entry_ids_by_locked_by) == 0:
+            return
+
+        lock_expires_at_in_seconds = cls.lease_expires_at_in_seconds(round(time.time()))
+        lost_queue_entry_ids: set[int] = set()
+        for locked_by, queue_entry_ids in queue_entry_ids_by_locked_by.items():
+            renewed_count = (
+                db.session.query(ProcessInstanceQueueModel)
+                .filter(
+                    ProcessInstanceQueueModel.id.in_(queue_entry_ids),  # type: ignore
+                    ProcessInstanceQueueModel.locked_by == locked_by,
+                )
+                .update({"lock_expires_at_in_seconds": lock_expires_at_in_seconds}, synchronize_session=False)
+            )
+            if renewed_count < len(queue_entry_ids):
+                still_held_queue_entry_ids = {
+                    row.id
+                    for row in db.session.query(ProcessInstanceQueueModel.id)  # type: ignore
+                    .filter(
+                        ProcessInstanceQueueModel.id.in_(queue_entry_ids),  # type: ignore
+                        ProcessInstanceQueueModel.locked_by == locked_by,
+                    )
+                    .all()
+                }
+                lost_queue_entry_ids.update(set(queue_entry_ids) - still_held_queue_entry_ids)
+                PROCESS_INSTANCE_LOCK_LEASES_LOST.inc(len(queue_entry_ids) - renewed_count)
+                current_app.logger.warning(
+                    f"{locked_by} lost {len(queue_entry_ids) - renewed_count} of its process instance locks"
+                    " to something else after they expired."
+                )
+        db.session.commit()
+
+        with cls._held_leases_lock:
+            for queue_entry_ids in queue_entry_ids_by_locked_by.values():
+                for queue_entry_id in queue_entry_ids:
+                    renewed_lease = cls._held_leases.get(queue_entry_id)
+                    if renewed_lease is None:
+                        continue
+                    if queue_entry_id in lost_queue_entry_ids:
+                        renewed_lease.taken_by_something_else = True
+                    else:
+                        renewed_lease.lock_expires_at_in_seconds = lock_expires_at_in_seconds
+
+    @classmethod
+    def _start_heartbeat_if_needed(cls) -> None:
+        heartbeat_interval_in_seconds = int(
+            current_app.config["SPIFFWORKFLOW_BACKEND_INSTANCE_LOCK_HEARTBEAT_INTERVAL_IN_SECONDS"]
+        )
+        if heartbeat_interval_in_seconds <= 0:
+            return
+        with cls._held_leases_lock:
+            # a forked worker, like a celery one, does not get the threads of its parent
+            if cls._heartbeat_pid == os.getpid():
+                return
+            cls._heartbeat_pid = os.getpid()
+        threading.Thread(
+            target=cls._renew_leases_forever,
+            args=(current_app._get_current_object(), heartbeat_interval_in_seconds),
+            name="process_instance_lock_heartbeat",
+            daemon=True,
+        ).start()
+
+    @classmethod
+    def _renew_leases_forever(cls, app: flask.app.Flask, heartbeat_interval_in_seconds: int) -> None:
+        with app.app_context():
+            while True:
+                time.sleep(heartbeat_interval_in_seconds)
+                try:
+                    cls.renew_leases()
+                except Exception as exception:
+                    db.session.rollback()
+                    current_app.logger.exception(f"Could not renew process instance locks: {exception}")
+
     @classmethod
     def remove_stale_locks(cls) -> None:
-        max_duration = current_app.config["MAX_INSTANCE_LOCK_DURATION_IN_SECONDS"]
+        """Releases every expired lock in one statement.
+
+        Locks taken before leases were added have no expiry, so those are released after MAX_INSTANCE_LOCK_DURATION_IN_SECONDS.
+        """
         current_time = round(time.time())
-        five_min_ago = current_time - max_duration
+        max_duration_ago = current_time - current_app.config["MAX_INSTANCE_LOCK_DURATION_IN_SECONDS"]
 
         # TODO: remove check for NULL locked_at_in_seconds and fallback to updated_at_in_seconds
         #   once we can confirm that old entries have been taken care of on current envs.
         # New code should not allow rows where locked_by has a value but locked_at_in_seconds is null.
-        entries_with_stale_locks = ProcessInstanceQueueModel.query.filter(
-            ProcessInstanceQueueModel.locked_by != None,  # noqa: E711
-            or_(
-                ProcessInstanceQueueModel.locked_at_in_seconds <= five_min_ago,
-                and_(
-                    ProcessInstanceQueueModel.updated_at_in_seconds <= five_min_ago,
-                    ProcessInstanceQueueModel.locked_at_in_seconds == None,  # noqa: E711
+        reclaimed_count = (
+            db.session.query(ProcessInstanceQueueModel)
+            .filter(
+                ProcessInstanceQueueModel.locked_by != None,  # noqa: E711
+                or_(
+                    ProcessInstanceQueueModel.lock_expires_at_in_seconds < current_time,  # type: ignore
+                    and_(
+                        ProcessInstanceQueueModel.lock_expires_at_in_seconds == None,  # noqa: E711
+                        or_(
+                            ProcessInstanceQueueModel.locked_at_in_seconds <= max_duration_ago,
+                            and_(
+                                ProcessInstanceQueueModel.updated_at_in_seconds <= max_duration_ago,
+                                ProcessInstanceQueueModel.locked_at_in_seconds == None,  # noqa: E711
+                            ),
+                        ),
+                    ),
                 ),
-            ),
-        ).all()
-
-        for entry in entries_with_stale_locks:
-            locked_duration = current_time - (entry.locked_at_in_seconds or entry.updated_at_in_seconds)
-            current_app.logger.info(
-                f"Removing stale lock for process instance: {entry.process_instance_id} with locked_by:"
-                f" '{entry.locked_by}' because it has been locked for seconds: {locked_duration}"
             )
-            entry.locked_by = None
-            entry.locked_at_in_seconds = None
-            db.session.add(entry)
-            db.session.commit()
+            .update(
+                {"locked_by": None, "locked_at_in_seconds": None, "lock_expires_at_in_seconds": None},
+                synchronize_session=False,
+            )
+        )
+        db.session.commit()
+        if reclaimed_count > 0:
+            PROCESS_INSTANCE_LOCKS_RECLAIMED.inc(reclaimed_count)
+            current_app.logger.info(f"Removed {reclaimed_count} process instance locks whose lease expired.")
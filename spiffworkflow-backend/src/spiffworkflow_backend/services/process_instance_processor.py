@@ -3,18 +3,22 @@
 import _strptime  # type: ignore
 import copy
 import decimal
+import glob
 import json
 import logging
 import os
 import random
 import re
+import threading
 import time
 import uuid
+import weakref
 from collections.abc import Callable
 from contextlib import suppress
 from datetime import datetime
 from datetime import timedelta
 from hashlib import sha256
+from types import CodeType
 from typing import Any
 from typing import NewType
 from typing import TypedDict
@@ -52,6 +56,8 @@ from SpiffWorkflow.util.deep_merge import DeepMerge  # type: ignore
 from SpiffWorkflow.util.task import TaskIterator  # type: ignore
 from SpiffWorkflow.util.task import TaskState
 from sqlalchemy import and_
+from sqlalchemy.orm import make_transient_to_detached
+from sqlalchemy.orm import selectinload
 
 from spiffworkflow_backend.constants import SPIFFWORKFLOW_BACKEND_SERIALIZER_VERSION
 from spiffworkflow_backend.data_stores.json import JSONDataStore
@@ -64,6 +70,9 @@ from spiffworkflow_backend.data_stores.typeahead import TypeaheadDataStore
 from spiffworkflow_backend.data_stores.typeahead import TypeaheadDataStoreConverter
 from spiffworkflow_backend.exceptions.api_error import ApiError
 from spiffworkflow_backend.exceptions.error import TaskMismatchError
+from spiffworkflow_backend.helpers.bulk_writer import BulkWriter
+from spiffworkflow_backend.helpers.lru_cache import LruCache
+from spiffworkflow_backend.helpers.query_counter import count_queries
 from spiffworkflow_backend.models.bpmn_process import BpmnProcessModel
 from spiffworkflow_backend.models.bpmn_process_definition import BpmnProcessDefinitionModel
 from spiffworkflow_backend.models.bpmn_process_definition_relationship import BpmnProcessDefinitionRelationshipModel
@@ -92,13 +101,22 @@ from spiffworkflow_backend.scripts.script import Script
 from spiffworkflow_backend.services.custom_parser import MyCustomParser
 from spiffworkflow_backend.services.file_system_service import FileSystemService
 from spiffworkflow_backend.services.jinja_service import JinjaHelpers
+from spiffworkflow_backend.services.lazy_task_data import LAZY_TASK_DATA_STATES
+from spiffworkflow_backend.services.lazy_task_data import LazyTaskData
+from spiffworkflow_backend.services.lazy_task_data import LazyTaskDataLoader
+from spiffworkflow_backend.services.lazy_task_data import is_unloaded_task_data
+from spiffworkflow_backend.services.lazy_task_data import load_lazy_task_data
+from spiffworkflow_backend.services.lazy_task_data import loaded_task_data
 from spiffworkflow_backend.services.process_instance_queue_service import ProcessInstanceQueueService
 from spiffworkflow_backend.services.process_instance_tmp_service import ProcessInstanceTmpService
 from spiffworkflow_backend.services.process_model_service import ProcessModelService
+from spiffworkflow_backend.services.process_model_spec_cache_service import ProcessModelSpecCacheService
+from spiffworkflow_backend.services.script_process_pool_service import ScriptProcessPoolService
 from spiffworkflow_backend.services.service_task_service import CustomServiceTask
 from spiffworkflow_backend.services.service_task_service import ServiceTaskDelegate
 from spiffworkflow_backend.services.spec_file_service import SpecFileService
 from spiffworkflow_backend.services.task_service import StartAndEndTimes
+from spiffworkflow_backend.services.task_service import TaskDataFingerprint
 from spiffworkflow_backend.services.task_service import TaskService
 from spiffworkflow_backend.services.user_service import UserService
 from spiffworkflow_backend.services.workflow_execution_service import ExecutionStrategy
@@ -146,6 +164,15 @@ class PotentialOwnerIdList(TypedDict):
     lane_assignment_id: int | None
 
 
+# everything needed to rebuild a workflow from a stored bpmn process definition other than the instance state.
+# definition rows are kept as column values rather than model objects since they outlive the db session that loaded them.
+class BpmnDefinitionSpecCacheEntry(TypedDict):
+    spec: BpmnProcessSpec
+    subprocess_specs: dict[str, BpmnProcessSpec]
+    bpmn_process_definitions: dict[str, dict[str, Any]]
+    task_definitions: dict[str, list[dict[str, Any]]]
+
+
 class ProcessInstanceProcessorError(Exception):
     pass
 
@@ -163,6 +190,30 @@ class MissingProcessInfoError(Exception):
 
 
 class BaseCustomScriptEngineEnvironment(BasePythonScriptEngineEnvironment):  # type: ignore
+    # compiled expressions and scripts keyed by (mode, source), shared by every environment in the worker process.
+    # the restricted script engine only changes the globals code runs with, not how it is compiled.
+    _code_cache: LruCache[tuple[str, str], CodeType] | None = None
+
+    @classmethod
+    def compiled_code(cls, source: str, mode: str) -> CodeType:
+        """Compiles source like eval or exec would, with mode "eval" or "exec", reusing code compiled before."""
+        cache = cls.code_cache()
+        cache_key = (mode, source)
+        code = cache.get(cache_key)
+        if code is None:
+            # eval ignores leading spaces and tabs when given a string. the filename is what error line numbers look for.
+            code = compile(source.lstrip(" \t") if mode == "eval" else source, "<string>", mode, dont_inherit=True)
+            cache.set(cache_key, code)
+        return code
+
+    @classmethod
+    def code_cache(cls) -> LruCache[tuple[str, str], CodeType]:
+        if BaseCustomScriptEngineEnvironment._code_cache is None:
+            BaseCustomScriptEngineEnvironment._code_cache = LruCache(
+                current_app.config["SPIFFWORKFLOW_BACKEND_SCRIPT_CODE_CACHE_SIZE"]
+            )
+        return BaseCustomScriptEngineEnvironment._code_cache
+
     def user_defined_state(self, external_context: dict[str, Any] | None = None) -> dict[str, Any]:
         return {}
 
@@ -194,13 +245,21 @@ class TaskDataBasedScriptEngineEnvironment(BaseCustomScriptEngineEnvironment, Ta
         self._non_user_defined_keys = {"__annotations__"}
         super().__init__(environment_globals)
 
+    def evaluate(
+        self,
+        expression: str,
+        context: dict[str, Any],
+        external_context: dict[str, Any] | None = None,
+    ) -> Any:
+        return super().evaluate(self.compiled_code(expression, "eval"), context, external_context)
+
     def execute(
         self,
         script: str,
         context: dict[str, Any],
         external_context: dict[str, Any] | None = None,
     ) -> bool:
-        super().execute(script, context, external_context)
+        super().execute(self.compiled_code(script, "exec"), context, external_context)
         for key in self._non_user_defined_keys:
             if key in context:
                 context.pop(key)
@@ -227,7 +286,7 @@ class NonTaskDataBasedScriptEngineEnvironment(BaseCustomScriptEngineEnvironment)
         state.update(external_context or {})
         state.update(self.state)
         state.update(context)
-        return eval(expression, state)  # noqa
+        return eval(self.compiled_code(expression, "eval"), state)  # noqa
 
     def execute(
         self,
@@ -239,7 +298,7 @@ class NonTaskDataBasedScriptEngineEnvironment(BaseCustomScriptEngineEnvironment)
         self.state.update(external_context or {})
         self.state.update(context)
         try:
-            exec(script, self.state)  # noqa
+            exec(self.compiled_code(script, "exec"), self.state)  # noqa
             return True
         finally:
             # since the task data is not directly mutated when the script executes, need to determine which keys
@@ -350,6 +409,8 @@ class CustomBpmnScriptEngine(PythonScriptEngine):  # type: ignore
 
         environment = CustomScriptEngineEnvironment.create(default_globals)
         super().__init__(environment=environment)
+        # the augmented methods last built on each thread, which are reused while the same task evaluates expressions
+        self._augment_methods_data = threading.local()
 
     def __get_augment_methods(self, task: SpiffTask | None) -> dict[str, Callable]:
         tld = current_app.config.get("THREAD_LOCAL_DATA")
@@ -360,13 +421,28 @@ class CustomBpmnScriptEngine(PythonScriptEngine):  # type: ignore
                 process_model_identifier = tld.process_model_identifier
             if hasattr(tld, "process_instance_id"):
                 process_instance_id = tld.process_instance_id
+        environment_identifier = current_app.config["ENV_IDENTIFIER"]
+
+        # the task is held weakly so the cached methods do not keep a finished workflow around
+        context_key = (process_instance_id, process_model_identifier, environment_identifier)
+        cached_methods = getattr(self._augment_methods_data, "methods", None)
+        if cached_methods is not None and self._augment_methods_data.context_key == context_key:
+            task_ref = self._augment_methods_data.task_ref
+            if (task_ref() if task_ref is not None else None) is task:
+                # callers add their own methods to what is returned
+                return dict(cached_methods)
+
         script_attributes_context = ScriptAttributesContext(
             task=task,
-            environment_identifier=current_app.config["ENV_IDENTIFIER"],
+            environment_identifier=environment_identifier,
             process_instance_id=process_instance_id,
             process_model_identifier=process_model_identifier,
         )
-        return Script.generate_augmented_list(script_attributes_context)
+        methods = Script.generate_augmented_list(script_attributes_context)
+        self._augment_methods_data.context_key = context_key
+        self._augment_methods_data.task_ref = weakref.ref(task) if task is not None else None
+        self._augment_methods_data.methods = methods
+        return dict(methods)
 
     def evaluate(self, task: SpiffTask, expression: str, external_context: dict[str, Any] | None = None) -> Any:
         """Evaluate the given expression, within the context of the given task and return the result."""
@@ -397,7 +473,12 @@ class CustomBpmnScriptEngine(PythonScriptEngine):  # type: ignore
 
             # do not run script if it is blank
             if script:
-                super().execute(task, script, methods)
+                if isinstance(self.environment, TaskDataBasedScriptEngineEnvironment) and (
+                    ScriptProcessPoolService.should_run_in_process_pool(task, script)
+                ):
+                    ScriptProcessPoolService.execute(task, script)
+                else:
+                    super().execute(task, script, methods)
             return True
         except WorkflowException as e:
             raise e
@@ -424,6 +505,10 @@ class ProcessInstanceProcessor:
 
     PROCESS_INSTANCE_ID_KEY = "process_instance_id"
 
+    # deserialized specs for stored bpmn process definitions keyed by (bpmn_process_definition id, full_process_model_hash).
+    # definitions never change once hashed, so these can be shared by every instance this worker loads.
+    _bpmn_definition_spec_cache: LruCache[tuple[int, str | None], BpmnDefinitionSpecCacheEntry] | None = None
+
     # __init__ calls these helpers:
     #   * get_spec, which returns a spec and any subprocesses (as IdToBpmnProcessSpecMapping dict)
     #   * __get_bpmn_process_instance, which takes spec and subprocesses and instantiates and returns a BpmnWorkflow
@@ -435,8 +520,13 @@ class ProcessInstanceProcessor:
         process_id_to_run: str | None = None,
         include_task_data_for_completed_tasks: bool = False,
         include_completed_subprocesses: bool = False,
+        lazy_load_task_data: bool | None = None,
     ) -> None:
-        """Create a Workflow Processor based on the serialized information available in the process_instance model."""
+        """Create a Workflow Processor based on the serialized information available in the process_instance model.
+
+        With lazy_load_task_data, task data is only read from the database when it is first used.
+        It defaults to SPIFFWORKFLOW_BACKEND_LAZY_LOAD_TASK_DATA.
+        """
         self._script_engine = script_engine or self.__class__._default_script_engine
         self._workflow_completed_handler = workflow_completed_handler
         self.setup_processor_with_process_instance(
@@ -444,6 +534,7 @@ class ProcessInstanceProcessor:
             process_id_to_run=process_id_to_run,
             include_task_data_for_completed_tasks=include_task_data_for_completed_tasks,
             include_completed_subprocesses=include_completed_subprocesses,
+            lazy_load_task_data=lazy_load_task_data,
         )
 
     def setup_processor_with_process_instance(
@@ -452,6 +543,7 @@ class ProcessInstanceProcessor:
         process_id_to_run: str | None = None,
         include_task_data_for_completed_tasks: bool = False,
         include_completed_subprocesses: bool = False,
+        lazy_load_task_data: bool | None = None,
     ) -> None:
         tld = current_app.config["THREAD_LOCAL_DATA"]
         tld.process_instance_id = process_instance_model.id
@@ -479,6 +571,20 @@ class ProcessInstanceProcessor:
         # To use from a spiff_task:
         #   [spiff_task.workflow.spec.name][spiff_task.task_spec.name]
         self.bpmn_definition_to_task_definitions_mappings: dict = {}
+        self.hydration_query_count = 0
+
+        # what the data of each task looked like when it was last loaded or saved.
+        # this lets the TaskService skip saving tasks that have not changed.
+        self.task_data_fingerprints: dict[str, TaskDataFingerprint] = {}
+
+        if lazy_load_task_data is None:
+            lazy_load_task_data = current_app.config["SPIFFWORKFLOW_BACKEND_LAZY_LOAD_TASK_DATA"]
+        self.lazy_task_data_loader: LazyTaskDataLoader | None = None
+        if lazy_load_task_data:
+            self.lazy_task_data_loader = LazyTaskDataLoader(
+                self._serializer.registry.restore,
+                batch_size=current_app.config["SPIFFWORKFLOW_BACKEND_LAZY_LOAD_TASK_DATA_BATCH_SIZE"],
+            )
 
         subprocesses: IdToBpmnProcessSpecMapping | None = None
         if not process_instance_model.spiffworkflow_fully_initialized():
@@ -493,18 +599,26 @@ class ProcessInstanceProcessor:
         self.process_model_display_name = process_instance_model.process_model_display_name
 
         try:
-            (
-                self.bpmn_process_instance,
-                self.full_bpmn_process_dict,
-                self.bpmn_definition_to_task_definitions_mappings,
-            ) = self.__class__.__get_bpmn_process_instance(
-                process_instance_model,
-                spec=bpmn_process_spec,
-                subprocesses=subprocesses,
-                include_task_data_for_completed_tasks=include_task_data_for_completed_tasks,
-                include_completed_subprocesses=include_completed_subprocesses,
-                task_model_mapping=self.task_model_mapping,
-                bpmn_subprocess_mapping=self.bpmn_subprocess_mapping,
+            with count_queries() as query_counter:
+                (
+                    self.bpmn_process_instance,
+                    self.full_bpmn_process_dict,
+                    self.bpmn_definition_to_task_definitions_mappings,
+                ) = self.__class__.__get_bpmn_process_instance(
+                    process_instance_model,
+                    spec=bpmn_process_spec,
+                    subprocesses=subprocesses,
+                    include_task_data_for_completed_tasks=include_task_data_for_completed_tasks,
+                    include_completed_subprocesses=include_completed_subprocesses,
+                    task_model_mapping=self.task_model_mapping,
+                    bpmn_subprocess_mapping=self.bpmn_subprocess_mapping,
+                    lazy_task_data_loader=self.lazy_task_data_loader,
+                    task_data_fingerprints=self.task_data_fingerprints,
+                )
+            # number of queries it took to load the workflow from the database. useful for catching n+1 regressions.
+            self.hydration_query_count = query_counter.count
+            current_app.logger.debug(
+                f"Loaded process instance {process_instance_model.id} in {self.hydration_query_count} queries"
             )
             self.set_script_engine(self.bpmn_process_instance, self._script_engine)
 
@@ -517,6 +631,29 @@ class ProcessInstanceProcessor:
                 ),
             ) from ke
 
+    def reattach_to_process_instance(self, process_instance_model: ProcessInstanceModel) -> None:
+        """Points a processor that has outlived its database session at a freshly loaded copy of its process instance.
+
+        The workflow is kept as it is and only the database records the processor saves through are loaded again,
+        so this is only correct if nothing has changed the process instance since this processor last saved it.
+        """
+        tld = current_app.config["THREAD_LOCAL_DATA"]
+        tld.process_instance_id = process_instance_model.id
+        tld.process_model_identifier = f"{process_instance_model.process_model_identifier}"
+
+        self.process_instance_model = process_instance_model
+        self.task_model_mapping = {}
+        self.bpmn_subprocess_mapping = {}
+        self.bpmn_definition_to_task_definitions_mappings = {}
+        self._get_full_bpmn_process_dict(
+            process_instance_model,
+            self.bpmn_definition_to_task_definitions_mappings,
+            task_model_mapping=self.task_model_mapping,
+            bpmn_subprocess_mapping=self.bpmn_subprocess_mapping,
+            include_completed_subprocesses=True,
+            lazy_task_data_hashes={},
+        )
+
     @classmethod
     def persist_bpmn_process_dict(
         cls,
@@ -702,37 +839,131 @@ class ProcessInstanceProcessor:
                 task_definition.bpmn_identifier
             ] = task_definition.properties_json
 
+    @classmethod
+    def bpmn_definition_spec_cache(cls) -> LruCache[tuple[int, str | None], BpmnDefinitionSpecCacheEntry]:
+        if cls._bpmn_definition_spec_cache is None:
+            cls._bpmn_definition_spec_cache = LruCache(
+                current_app.config["SPIFFWORKFLOW_BACKEND_PROCESS_DEFINITION_SPEC_CACHE_SIZE"]
+            )
+        return cls._bpmn_definition_spec_cache
+
+    @classmethod
+    def _set_specs_for_bpmn_process_definition(
+        cls,
+        bpmn_process_definition: BpmnProcessDefinitionModel,
+        spiff_bpmn_process_dict: dict,
+        bpmn_definition_to_task_definitions_mappings: dict,
+    ) -> None:
+        """Sets the restored spec and subprocess_specs on the given dict and fills in the definition mappings.
+
+        Only the first load of a definition in this worker hits the task_definition tables and the spiff serializer.
+        Subsequent loads reuse the same BpmnProcessSpec objects, which spiff never mutates once they are built.
+        """
+        cache = cls.bpmn_definition_spec_cache()
+        cache_key = (bpmn_process_definition.id, bpmn_process_definition.full_process_model_hash)
+        cache_entry = cache.get(cache_key)
+        if cache_entry is None:
+            spiff_bpmn_process_dict["spec"] = cls._get_definition_dict_for_bpmn_process_definition(
+                bpmn_process_definition,
+                bpmn_definition_to_task_definitions_mappings,
+            )
+            cls._set_definition_dict_for_bpmn_subprocess_definitions(
+                bpmn_process_definition,
+                spiff_bpmn_process_dict,
+                bpmn_definition_to_task_definitions_mappings,
+            )
+            cache_entry = cls._bpmn_definition_spec_cache_entry(
+                spiff_bpmn_process_dict, bpmn_definition_to_task_definitions_mappings
+            )
+            cache.set(cache_key, cache_entry)
+        else:
+            cls._set_bpmn_definition_mappings_from_cache_entry(
+                cache_entry, bpmn_process_definition, bpmn_definition_to_task_definitions_mappings
+            )
+
+        spiff_bpmn_process_dict["spec"] = cache_entry["spec"]
+        spiff_bpmn_process_dict["subprocess_specs"] = dict(cache_entry["subprocess_specs"])
+
+    @classmethod
+    def _bpmn_definition_spec_cache_entry(
+        cls, spiff_bpmn_process_dict: dict, bpmn_definition_to_task_definitions_mappings: dict
+    ) -> BpmnDefinitionSpecCacheEntry:
+        # restoring consumes the dicts, and they are still referenced by the model objects, so restore from copies
+        spec = cls._serializer.from_dict(copy.deepcopy(spiff_bpmn_process_dict["spec"]))
+        subprocess_specs = {
+            bpmn_identifier: cls._serializer.from_dict(copy.deepcopy(subprocess_spec_dict))
+            for bpmn_identifier, subprocess_spec_dict in spiff_bpmn_process_dict["subprocess_specs"].items()
+        }
+        bpmn_process_definitions: dict[str, dict[str, Any]] = {}
+        task_definitions: dict[str, list[dict[str, Any]]] = {}
+        for bpmn_identifier, definition_mappings in bpmn_definition_to_task_definitions_mappings.items():
+            task_definitions[bpmn_identifier] = []
+            for key, definition in definition_mappings.items():
+                if key == "bpmn_process_definition":
+                    bpmn_process_definitions[bpmn_identifier] = cls._definition_column_values(definition)
+                else:
+                    task_definitions[bpmn_identifier].append(cls._definition_column_values(definition))
+        return {
+            "spec": spec,
+            "subprocess_specs": subprocess_specs,
+            "bpmn_process_definitions": bpmn_process_definitions,
+            "task_definitions": task_definitions,
+        }
+
+    @classmethod
+    def _definition_column_values(cls, definition: BpmnProcessDefinitionModel | TaskDefinitionModel) -> dict[str, Any]:
+        # properties_json is left out so it is never shared across sessions. it is lazy loaded if anything asks for it.
+        return {
+            column.key: getattr(definition, column.key)
+            for column in definition.__table__.columns
+            if column.key != "properties_json"
+        }
+
+    @classmethod
+    def _set_bpmn_definition_mappings_from_cache_entry(
+        cls,
+        cache_entry: BpmnDefinitionSpecCacheEntry,
+        bpmn_process_definition: BpmnProcessDefinitionModel,
+        bpmn_definition_to_task_definitions_mappings: dict,
+    ) -> None:
+        # merging without load attaches the definitions to the current session without querying for them
+        def attach(model_class: type[BpmnProcessDefinitionModel] | type[TaskDefinitionModel], column_values: dict) -> Any:
+            definition = model_class(**column_values)
+            make_transient_to_detached(definition)
+            return db.session.merge(definition, load=False)
+
+        for bpmn_identifier, column_values in cache_entry["bpmn_process_definitions"].items():
+            definition = bpmn_process_definition
+            if column_values["id"] != bpmn_process_definition.id:
+                definition = attach(BpmnProcessDefinitionModel, column_values)
+            cls._update_bpmn_definition_mappings(
+                bpmn_definition_to_task_definitions_mappings,
+                bpmn_identifier,
+                bpmn_process_definition=definition,
+            )
+            for task_definition_column_values in cache_entry["task_definitions"].get(bpmn_identifier, []):
+                cls._update_bpmn_definition_mappings(
+                    bpmn_definition_to_task_definitions_mappings,
+                    bpmn_identifier,
+                    task_definition=attach(TaskDefinitionModel, task_definition_column_values),
+                )
+
     @classmethod
     def _get_bpmn_process_dict(
         cls,
         bpmn_process: BpmnProcessModel,
-        task_model_mapping: dict[str, TaskModel],
-        get_tasks: bool = False,
-        include_task_data_for_completed_tasks: bool = False,
+        json_data_mappings: dict[str, dict],
     ) -> dict:
-        json_data = JsonDataModel.query.filter_by(hash=bpmn_process.json_data_hash).first()
-        bpmn_process_dict = {"data": json_data.data, "tasks": {}}
+        bpmn_process_dict = {"data": json_data_mappings[bpmn_process.json_data_hash], "tasks": {}}
         bpmn_process_dict.update(bpmn_process.properties_json)
-        if get_tasks:
-            tasks = TaskModel.query.filter_by(bpmn_process_id=bpmn_process.id).all()
-            cls._get_tasks_dict(
-                tasks,
-                bpmn_process_dict,
-                include_task_data_for_completed_tasks=include_task_data_for_completed_tasks,
-                task_model_mapping=task_model_mapping,
-            )
         return bpmn_process_dict
 
     @classmethod
-    def _get_tasks_dict(
+    def _get_task_guids_to_load_data_for(
         cls,
         tasks: list[TaskModel],
-        spiff_bpmn_process_dict: dict,
-        task_model_mapping: dict[str, TaskModel],
-        bpmn_subprocess_id_to_guid_mappings: dict | None = None,
         include_task_data_for_completed_tasks: bool = False,
-    ) -> None:
-        json_data_hashes = set()
+    ) -> set[str]:
         states_to_exclude_from_rehydration: list[str] = []
         if not include_task_data_for_completed_tasks:
             # load CANCELLED task data for Gateways since they are marked as CANCELLED
@@ -744,7 +975,6 @@ class ProcessInstanceProcessor:
         for task in tasks:
             parent_guid = task.parent_guid()
             if task.state not in states_to_exclude_from_rehydration:
-                json_data_hashes.add(task.json_data_hash)
                 task_guids_to_add.add(task.guid)
 
                 # load parent task data to avoid certain issues that can arise from parallel branches
@@ -752,7 +982,6 @@ class ProcessInstanceProcessor:
                     parent_guid in task_list_by_hash
                     and task_list_by_hash[parent_guid].state in states_to_exclude_from_rehydration
                 ):
-                    json_data_hashes.add(task_list_by_hash[parent_guid].json_data_hash)
                     task_guids_to_add.add(parent_guid)
             elif (
                 parent_guid in task_list_by_hash
@@ -760,18 +989,20 @@ class ProcessInstanceProcessor:
                 and task_list_by_hash[parent_guid] not in states_to_exclude_from_rehydration
             ):
                 # make sure we add task data for multi-instance tasks as well
-                json_data_hashes.add(task.json_data_hash)
                 task_guids_to_add.add(task.guid)
+        return task_guids_to_add
 
-        json_data_records = JsonDataModel.query.filter(JsonDataModel.hash.in_(json_data_hashes)).all()  # type: ignore
-        json_data_mappings = {}
-        for json_data_record in json_data_records:
-            json_data_mappings[json_data_record.hash] = json_data_record.data
+    @classmethod
+    def _get_tasks_dict(
+        cls,
+        tasks: list[TaskModel],
+        tasks_dicts_by_bpmn_process_id: dict[int, dict],
+        task_model_mapping: dict[str, TaskModel],
+        task_guids_to_add: set[str],
+        json_data_mappings: dict[str, dict],
+    ) -> None:
         for task in tasks:
-            tasks_dict = spiff_bpmn_process_dict["tasks"]
-            if bpmn_subprocess_id_to_guid_mappings:
-                bpmn_subprocess_guid = bpmn_subprocess_id_to_guid_mappings[task.bpmn_process_id]
-                tasks_dict = spiff_bpmn_process_dict["subprocesses"][bpmn_subprocess_guid]["tasks"]
+            tasks_dict = tasks_dicts_by_bpmn_process_id[task.bpmn_process_id]
             tasks_dict[task.guid] = task.properties_json
             task_data = {}
             if task.guid in task_guids_to_add:
@@ -788,7 +1019,20 @@ class ProcessInstanceProcessor:
         bpmn_subprocess_mapping: dict[str, BpmnProcessModel],
         include_task_data_for_completed_tasks: bool = False,
         include_completed_subprocesses: bool = False,
+        lazy_task_data_hashes: dict[str, str] | None = None,
+        loaded_task_data_guids: set[str] | None = None,
+        json_data_delta_depths: dict[str, int] | None = None,
     ) -> dict:
+        """Builds the serialized workflow for the given process instance from the database.
+
+        Instance state is loaded in a fixed number of queries no matter how many subprocesses there are:
+        the subprocess rows, the task rows for every process, and the json_data rows for all of them.
+
+        If lazy_task_data_hashes is given, the data of finished tasks is not loaded. Instead it is filled in with the
+        json_data hash of each finished task whose data would have been loaded, keyed by task guid.
+        If loaded_task_data_guids is given, it is filled in with the guids of the tasks whose data was loaded, lazily or not.
+        If json_data_delta_depths is given, it is filled in with how deep each loaded json_data record was in a chain of deltas.
+        """
         if process_instance_model.bpmn_process_definition_id is None:
             return {}
 
@@ -800,11 +1044,7 @@ class ProcessInstanceProcessor:
         }
         bpmn_process_definition = process_instance_model.bpmn_process_definition
         if bpmn_process_definition is not None:
-            spiff_bpmn_process_dict["spec"] = cls._get_definition_dict_for_bpmn_process_definition(
-                bpmn_process_definition,
-                bpmn_definition_to_task_definitions_mappings,
-            )
-            cls._set_definition_dict_for_bpmn_subprocess_definitions(
+            cls._set_specs_for_bpmn_process_definition(
                 bpmn_process_definition,
                 spiff_bpmn_process_dict,
                 bpmn_definition_to_task_definitions_mappings,
@@ -812,42 +1052,61 @@ class ProcessInstanceProcessor:
 
             bpmn_process = process_instance_model.bpmn_process
             if bpmn_process is not None:
-                single_bpmn_process_dict = cls._get_bpmn_process_dict(
-                    bpmn_process,
-                    get_tasks=True,
-                    include_task_data_for_completed_tasks=include_task_data_for_completed_tasks,
-                    task_model_mapping=task_model_mapping,
+                # select the definition identifier along with each subprocess so checking for deferred specs
+                # does not lazy load a definition per subprocess
+                bpmn_subprocesses_query = (
+                    BpmnProcessModel.query.add_columns(BpmnProcessDefinitionModel.bpmn_identifier)
+                    .join(
+                        BpmnProcessDefinitionModel,
+                        BpmnProcessDefinitionModel.id == BpmnProcessModel.bpmn_process_definition_id,
+                    )
+                    .filter(BpmnProcessModel.top_level_process_id == bpmn_process.id)
                 )
-                spiff_bpmn_process_dict.update(single_bpmn_process_dict)
-
-                bpmn_subprocesses_query = BpmnProcessModel.query.filter_by(top_level_process_id=bpmn_process.id)
                 if not include_completed_subprocesses:
                     bpmn_subprocesses_query = bpmn_subprocesses_query.join(
                         TaskModel, TaskModel.guid == BpmnProcessModel.guid
                     ).filter(
                         TaskModel.state.not_in(["COMPLETED", "ERROR", "CANCELLED"])  # type: ignore
                     )
-                bpmn_subprocesses = bpmn_subprocesses_query.all()
-                bpmn_subprocess_id_to_guid_mappings = {}
-                for bpmn_subprocess in bpmn_subprocesses:
-                    subprocess_identifier = bpmn_subprocess.bpmn_process_definition.bpmn_identifier
+
+                bpmn_processes_to_load = [bpmn_process]
+                for bpmn_subprocess, subprocess_identifier in bpmn_subprocesses_query.all():
                     if subprocess_identifier not in spiff_bpmn_process_dict["subprocess_specs"]:
                         current_app.logger.info(f"Deferring subprocess spec: '{subprocess_identifier}'")
                         continue
-                    bpmn_subprocess_id_to_guid_mappings[bpmn_subprocess.id] = bpmn_subprocess.guid
-                    single_bpmn_process_dict = cls._get_bpmn_process_dict(bpmn_subprocess, task_model_mapping=task_model_mapping)
-                    spiff_bpmn_process_dict["subprocesses"][bpmn_subprocess.guid] = single_bpmn_process_dict
+                    bpmn_processes_to_load.append(bpmn_subprocess)
                     bpmn_subprocess_mapping[bpmn_subprocess.guid] = bpmn_subprocess
 
-                tasks = TaskModel.query.filter(
-                    TaskModel.bpmn_process_id.in_(bpmn_subprocess_id_to_guid_mappings.keys())  # type: ignore
-                ).all()
+                bpmn_process_ids = [b.id for b in bpmn_processes_to_load]
+                tasks = TaskModel.query.filter(TaskModel.bpmn_process_id.in_(bpmn_process_ids)).all()  # type: ignore
+                task_guids_to_add = cls._get_task_guids_to_load_data_for(
+                    tasks, include_task_data_for_completed_tasks=include_task_data_for_completed_tasks
+                )
+                if loaded_task_data_guids is not None:
+                    loaded_task_data_guids.update(task_guids_to_add)
+                if lazy_task_data_hashes is not None:
+                    # only finished tasks get lazy data since spiff does not run them again. see LazyTaskData.
+                    lazy_tasks = [t for t in tasks if t.guid in task_guids_to_add and t.state in LAZY_TASK_DATA_STATES]
+                    lazy_task_data_hashes.update({t.guid: t.json_data_hash for t in lazy_tasks})
+                    task_guids_to_add -= {t.guid for t in lazy_tasks}
+
+                json_data_hashes = {b.json_data_hash for b in bpmn_processes_to_load}
+                json_data_hashes.update(t.json_data_hash for t in tasks if t.guid in task_guids_to_add)
+                json_data_mappings = JsonDataModel.json_data_dicts_by_hash(json_data_hashes, delta_depths=json_data_delta_depths)
+
+                spiff_bpmn_process_dict.update(cls._get_bpmn_process_dict(bpmn_process, json_data_mappings))
+                tasks_dicts_by_bpmn_process_id = {bpmn_process.id: spiff_bpmn_process_dict["tasks"]}
+                for bpmn_subprocess in bpmn_processes_to_load[1:]:
+                    single_bpmn_process_dict = cls._get_bpmn_process_dict(bpmn_subprocess, json_data_mappings)
+                    spiff_bpmn_process_dict["subprocesses"][bpmn_subprocess.guid] = single_bpmn_process_dict
+                    tasks_dicts_by_bpmn_process_id[bpmn_subprocess.id] = single_bpmn_process_dict["tasks"]
+
                 cls._get_tasks_dict(
                     tasks,
-                    spiff_bpmn_process_dict,
-                    bpmn_subprocess_id_to_guid_mappings=bpmn_subprocess_id_to_guid_mappings,
-                    include_task_data_for_completed_tasks=include_task_data_for_completed_tasks,
+                    tasks_dicts_by_bpmn_process_id,
                     task_model_mapping=task_model_mapping,
+                    task_guids_to_add=task_guids_to_add,
+                    json_data_mappings=json_data_mappings,
                 )
 
         return spiff_bpmn_process_dict
@@ -885,6 +1144,8 @@ class ProcessInstanceProcessor:
         subprocesses: IdToBpmnProcessSpecMapping | None = None,
         include_task_data_for_completed_tasks: bool = False,
         include_completed_subprocesses: bool = False,
+        lazy_task_data_loader: LazyTaskDataLoader | None = None,
+        task_data_fingerprints: dict[str, TaskDataFingerprint] | None = None,
     ) -> tuple[BpmnWorkflow, dict, dict]:
         full_bpmn_process_dict = {}
         bpmn_definition_to_task_definitions_mappings: dict = {}
@@ -895,6 +1156,9 @@ class ProcessInstanceProcessor:
             spiff_logger.setLevel(logging.WARNING)
 
             try:
+                lazy_task_data_hashes: dict[str, str] | None = {} if lazy_task_data_loader is not None else None
+                loaded_task_data_guids: set[str] = set()
+                json_data_delta_depths: dict[str, int] = {}
                 full_bpmn_process_dict = ProcessInstanceProcessor._get_full_bpmn_process_dict(
                     process_instance_model,
                     bpmn_definition_to_task_definitions_mappings,
@@ -902,10 +1166,30 @@ class ProcessInstanceProcessor:
                     include_task_data_for_completed_tasks=include_task_data_for_completed_tasks,
                     task_model_mapping=task_model_mapping,
                     bpmn_subprocess_mapping=bpmn_subprocess_mapping,
+                    lazy_task_data_hashes=lazy_task_data_hashes,
+                    loaded_task_data_guids=loaded_task_data_guids,
+                    json_data_delta_depths=json_data_delta_depths,
                 )
                 # FIXME: the from_dict entrypoint in spiff will one day do this copy instead
-                process_copy = copy.deepcopy(full_bpmn_process_dict)
+                # the specs are already restored and shared between instances, so only copy the instance state
+                spec_keys = ("spec", "subprocess_specs")
+                process_copy = copy.deepcopy({k: v for k, v in full_bpmn_process_dict.items() if k not in spec_keys})
+                process_copy.update({k: v for k, v in full_bpmn_process_dict.items() if k in spec_keys})
                 bpmn_process_instance = ProcessInstanceProcessor._serializer.from_dict(process_copy)
+                if lazy_task_data_loader is not None and lazy_task_data_hashes:
+                    for workflow in [bpmn_process_instance, *bpmn_process_instance.subprocesses.values()]:
+                        for spiff_task in workflow.tasks.values():
+                            json_data_hash = lazy_task_data_hashes.get(str(spiff_task.id))
+                            if json_data_hash is not None:
+                                spiff_task.data = LazyTaskData(json_data_hash, lazy_task_data_loader, spiff_task)
+                if task_data_fingerprints is not None and loaded_task_data_guids:
+                    for workflow in [bpmn_process_instance, *bpmn_process_instance.subprocesses.values()]:
+                        for spiff_task in workflow.tasks.values():
+                            if str(spiff_task.id) in loaded_task_data_guids:
+                                json_data_hash = task_model_mapping[str(spiff_task.id)].json_data_hash
+                                task_data_fingerprints[str(spiff_task.id)] = TaskDataFingerprint(
+                                    spiff_task.data, delta_depth=json_data_delta_depths.get(json_data_hash)
+                                )
                 bpmn_process_instance.get_tasks()
             except Exception as err:
                 raise err
@@ -929,75 +1213,112 @@ class ProcessInstanceProcessor:
             raise NoPotentialOwnersForTaskError(message)
 
     def get_potential_owner_ids_from_task(self, task: SpiffTask) -> PotentialOwnerIdList:
-        task_spec = task.task_spec
-        task_lane = "process_initiator"
-        if task_spec.lane is not None and task_spec.lane != "":
-            task_lane = task_spec.lane
-
-        potential_owner_ids = []
-        lane_assignment_id = None
-
-        if "allowGuest" in task.task_spec.extensions and task.task_spec.extensions["allowGuest"] == "true":
-            guest_user = UserService.find_or_create_guest_user()
-            potential_owner_ids = [guest_user.id]
-        elif re.match(r"(process.?)initiator", task_lane, re.IGNORECASE):
-            potential_owner_ids = [self.process_instance_model.process_initiator_id]
-        else:
-            group_model = GroupModel.query.filter_by(identifier=task_lane).first()
-            if group_model is not None:
-                lane_assignment_id = group_model.id
-            if "lane_owners" in task.data and task_lane in task.data["lane_owners"]:
-                for username in task.data["lane_owners"][task_lane]:
-                    lane_owner_user = UserModel.query.filter_by(username=username).first()
-                    if lane_owner_user is not None:
-                        potential_owner_ids.append(lane_owner_user.id)
-                self.raise_if_no_potential_owners(
-                    potential_owner_ids,
-                    (
-                        "No users found in task data lane owner list for lane:"
-                        f" {task_lane}. The user list used:"
-                        f" {task.data['lane_owners'][task_lane]}"
-                    ),
-                )
+        return self.get_potential_owner_ids_from_tasks([task])[str(task.id)]
+
+    def get_potential_owner_ids_from_tasks(self, tasks: list[SpiffTask]) -> dict[str, PotentialOwnerIdList]:
+        """Returns the potential owners of each task keyed by task id.
+
+        The groups and lane owner users of all of the tasks are looked up together so this takes the same
+        number of queries no matter how many tasks there are.
+        """
+        task_lanes: dict[str, str] = {}
+        group_identifiers: set[str] = set()
+        lane_owner_usernames: set[str] = set()
+        guest_user_id: int | None = None
+        for task in tasks:
+            task_lane = "process_initiator"
+            if task.task_spec.lane is not None and task.task_spec.lane != "":
+                task_lane = task.task_spec.lane
+            task_lanes[str(task.id)] = task_lane
+            if self._task_allows_guest(task):
+                if guest_user_id is None:
+                    guest_user_id = UserService.find_or_create_guest_user().id
+            elif not re.match(r"(process.?)initiator", task_lane, re.IGNORECASE):
+                group_identifiers.add(task_lane)
+                if "lane_owners" in task.data and task_lane in task.data["lane_owners"]:
+                    lane_owner_usernames.update(task.data["lane_owners"][task_lane])
+
+        group_models_by_identifier: dict[str, GroupModel] = {}
+        if group_identifiers:
+            group_models = (
+                GroupModel.query.filter(GroupModel.identifier.in_(group_identifiers))  # type: ignore
+                .options(selectinload(GroupModel.user_group_assignments))
+                .order_by(GroupModel.id)
+                .all()
+            )
+            for group_model in group_models:
+                group_models_by_identifier.setdefault(group_model.identifier, group_model)
+        user_ids_by_username: dict[str, int] = {}
+        if lane_owner_usernames:
+            user_ids_by_username = {
+                row.username: row.id
+                for row in UserModel.query.with_entities(UserModel.username, UserModel.id)
+                .filter(UserModel.username.in_(lane_owner_usernames))  # type: ignore
+                .all()
+            }
+
+        potential_owners_by_task_id: dict[str, PotentialOwnerIdList] = {}
+        for task in tasks:
+            task_lane = task_lanes[str(task.id)]
+            potential_owner_ids: list[int] = []
+            lane_assignment_id = None
+
+            if self._task_allows_guest(task):
+                if guest_user_id is not None:
+                    potential_owner_ids = [guest_user_id]
+            elif re.match(r"(process.?)initiator", task_lane, re.IGNORECASE):
+                potential_owner_ids = [self.process_instance_model.process_initiator_id]
             else:
-                if group_model is None:
-                    raise (NoPotentialOwnersForTaskError(f"Could not find a group with name matching lane: {task_lane}"))
-                potential_owner_ids = [i.user_id for i in group_model.user_group_assignments]
-                self.raise_if_no_potential_owners(
-                    potential_owner_ids,
-                    f"Could not find any users in group to assign to lane: {task_lane}",
-                )
+                group_model = group_models_by_identifier.get(task_lane)
+                if group_model is not None:
+                    lane_assignment_id = group_model.id
+                if "lane_owners" in task.data and task_lane in task.data["lane_owners"]:
+                    for username in task.data["lane_owners"][task_lane]:
+                        if username in user_ids_by_username:
+                            potential_owner_ids.append(user_ids_by_username[username])
+                    self.raise_if_no_potential_owners(
+                        potential_owner_ids,
+                        (
+                            "No users found in task data lane owner list for lane:"
+                            f" {task_lane}. The user list used:"
+                            f" {task.data['lane_owners'][task_lane]}"
+                        ),
+                    )
+                else:
+                    if group_model is None:
+                        raise (NoPotentialOwnersForTaskError(f"Could not find a group with name matching lane: {task_lane}"))
+                    potential_owner_ids = [i.user_id for i in group_model.user_group_assignments]
+                    self.raise_if_no_potential_owners(
+                        potential_owner_ids,
+                        f"Could not find any users in group to assign to lane: {task_lane}",
+                    )
 
-        return {
-            "potential_owner_ids": potential_owner_ids,
-            "lane_assignment_id": lane_assignment_id,
-        }
+            potential_owners_by_task_id[str(task.id)] = {
+                "potential_owner_ids": potential_owner_ids,
+                "lane_assignment_id": lane_assignment_id,
+            }
+        return potential_owners_by_task_id
 
-    def extract_metadata(self) -> None:
+    @classmethod
+    def _task_allows_guest(cls, task: SpiffTask) -> bool:
+        return "allowGuest" in task.task_spec.extensions and task.task_spec.extensions["allowGuest"] == "true"
+
+    def extract_metadata(self, current_data: dict[str, Any] | None = None) -> None:
         # we are currently not getting the metadata extraction paths based on the version in git from the process instance.
         # it would make sense to do that if the shell-out-to-git performance cost was not too high.
-        # we also discussed caching this information in new database tables. something like:
-        #   process_model_version
-        #     id
-        #     process_model_identifier
-        #     git_hash
-        #     display_name
-        #     notification_type
-        #   metadata_extraction
-        #     id
-        #     extraction_key
-        #     extraction_path
-        #   metadata_extraction_process_model_version
-        #     process_model_version_id
-        #     metadata_extraction_id
-        process_model_info = ProcessModelService.get_process_model(self.process_instance_model.process_model_identifier)
-        metadata_extraction_paths = process_model_info.metadata_extraction_paths
+        # the paths are instead cached against the version of the process_model.json file on disk.
+        metadata_extraction_paths = ProcessModelService.get_metadata_extraction_paths(
+            self.process_instance_model.process_model_identifier
+        )
         if metadata_extraction_paths is None:
             return
         if len(metadata_extraction_paths) <= 0:
             return
 
-        current_data = self.get_current_data()
+        if current_data is None:
+            current_data = self.get_current_data()
+        now_in_seconds = round(time.time())
+        metadata_rows_by_key: dict[str, dict[str, Any]] = {}
         for metadata_extraction_path in metadata_extraction_paths:
             key = metadata_extraction_path["key"]
             path = metadata_extraction_path["path"]
@@ -1011,20 +1332,26 @@ class ProcessInstanceProcessor:
                     break
 
             if data_for_key is not None:
-                pim = ProcessInstanceMetadataModel.query.filter_by(
-                    process_instance_id=self.process_instance_model.id,
-                    key=key,
-                ).first()
-                if pim is None:
-                    pim = ProcessInstanceMetadataModel(
-                        process_instance_id=self.process_instance_model.id,
-                        key=key,
-                    )
-                pim.value = str(data_for_key)[0:255]
-                db.session.add(pim)
+                # a key listed more than once gets the value from its last path like it did when these were saved one by one
+                metadata_rows_by_key[key] = {
+                    "process_instance_id": self.process_instance_model.id,
+                    "key": key,
+                    "value": str(data_for_key)[0:255],
+                    "created_at_in_seconds": now_in_seconds,
+                    "updated_at_in_seconds": now_in_seconds,
+                }
 
-    def update_summary(self) -> None:
-        current_data = self.get_current_data()
+        # rows that exist already keep their created_at_in_seconds
+        BulkWriter.upsert(
+            ProcessInstanceMetadataModel.__table__,
+            list(metadata_rows_by_key.values()),
+            conflict_column_names=["process_instance_id", "key"],
+            update_column_names=["value", "updated_at_in_seconds"],
+        )
+
+    def update_summary(self, current_data: dict[str, Any] | None = None) -> None:
+        if current_data is None:
+            current_data = self.get_current_data()
         if "spiff_process_instance_summary" in current_data:
             summary = current_data["spiff_process_instance_summary"]
             self.process_instance_model.summary = summary[:255]
@@ -1173,66 +1500,111 @@ class ProcessInstanceProcessor:
         human_tasks = HumanTaskModel.query.filter_by(process_instance_id=self.process_instance_model.id, completed=False).all()
         ready_or_waiting_tasks = self.get_all_ready_or_waiting_tasks()
 
-        self.extract_metadata()
-        self.update_summary()
+        current_data = self.get_current_data()
+        self.extract_metadata(current_data)
+        self.update_summary(current_data)
+
+        self.update_human_tasks(human_tasks, ready_or_waiting_tasks)
+        db.session.commit()
+
+    def update_human_tasks(self, human_tasks: list[HumanTaskModel], ready_or_waiting_tasks: list[SpiffTask]) -> None:
+        """Adds human tasks for the manual tasks that do not have one and completes the ones whose tasks are not ready anymore.
+
+        This is done a set at a time rather than a task at a time since multi-instance tasks can have hundreds of instances.
+        """
+        human_tasks_by_task_id: dict[str, list[HumanTaskModel]] = {}
+        for human_task in human_tasks:
+            human_tasks_by_task_id.setdefault(human_task.task_id, []).append(human_task)
 
+        spiff_tasks_without_human_tasks = []
         for ready_or_waiting_task in ready_or_waiting_tasks:
             # filter out non-usertasks
-            task_spec = ready_or_waiting_task.task_spec
-            if task_spec.manual:
-                potential_owner_hash = self.get_potential_owner_ids_from_task(ready_or_waiting_task)
-                extensions = task_spec.extensions
-
-                # in the xml, it's the id attribute. this identifies the process where the activity lives.
-                # if it's in a subprocess, it's the inner process.
-                bpmn_process_identifier = ready_or_waiting_task.workflow.spec.name
-
-                form_file_name = None
-                ui_form_file_name = None
-                if "properties" in extensions:
-                    properties = extensions["properties"]
-                    if "formJsonSchemaFilename" in properties:
-                        form_file_name = properties["formJsonSchemaFilename"]
-                    if "formUiSchemaFilename" in properties:
-                        ui_form_file_name = properties["formUiSchemaFilename"]
-
-                human_task = None
-                for at in human_tasks:
-                    if at.task_id == str(ready_or_waiting_task.id):
-                        human_task = at
-                        human_tasks.remove(at)
-
-                if human_task is None:
-                    task_guid = str(ready_or_waiting_task.id)
-                    task_model = TaskModel.query.filter_by(guid=task_guid).first()
-                    if task_model is None:
-                        raise TaskNotFoundError(f"Could not find task for human task with guid: {task_guid}")
-
-                    human_task = HumanTaskModel(
-                        process_instance_id=self.process_instance_model.id,
-                        process_model_display_name=self.process_instance_model.process_model_display_name,
-                        bpmn_process_identifier=bpmn_process_identifier,
-                        form_file_name=form_file_name,
-                        ui_form_file_name=ui_form_file_name,
-                        task_guid=task_model.guid,
-                        task_id=task_guid,
-                        task_name=ready_or_waiting_task.task_spec.bpmn_id,
-                        task_title=ready_or_waiting_task.task_spec.bpmn_name,
-                        task_type=ready_or_waiting_task.task_spec.__class__.__name__,
-                        task_status=TaskState.get_name(ready_or_waiting_task.state),
-                        lane_assignment_id=potential_owner_hash["lane_assignment_id"],
-                    )
-                    db.session.add(human_task)
-
-                    for potential_owner_id in potential_owner_hash["potential_owner_ids"]:
-                        human_task_user = HumanTaskUserModel(user_id=potential_owner_id, human_task=human_task)
-                        db.session.add(human_task_user)
+            if ready_or_waiting_task.task_spec.manual:
+                if human_tasks_by_task_id.pop(str(ready_or_waiting_task.id), None) is None:
+                    spiff_tasks_without_human_tasks.append(ready_or_waiting_task)
+        if len(spiff_tasks_without_human_tasks) > 0:
+            self.add_human_tasks(spiff_tasks_without_human_tasks)
+
+        # whatever is left is for tasks that are not ready or waiting anymore
+        human_task_ids_to_complete = [
+            human_task.id for human_tasks_for_task in human_tasks_by_task_id.values() for human_task in human_tasks_for_task
+        ]
+        if len(human_task_ids_to_complete) > 0:
+            HumanTaskModel.query.filter(HumanTaskModel.id.in_(human_task_ids_to_complete)).update(  # type: ignore
+                {"completed": True, "updated_at_in_seconds": round(time.time())}
+            )
 
-        if len(human_tasks) > 0:
-            for at in human_tasks:
-                at.completed = True
-                db.session.add(at)
-        db.session.commit()
+    def add_human_tasks(self, spiff_tasks: list[SpiffTask]) -> None:
+        task_guids = [str(spiff_task.id) for spiff_task in spiff_tasks]
+        saved_task_guids = {
+            row.guid
+            for row in TaskModel.query.with_entities(TaskModel.guid).filter(TaskModel.guid.in_(task_guids)).all()  # type: ignore
+        }
+        for task_guid in task_guids:
+            if task_guid not in saved_task_guids:
+                raise TaskNotFoundError(f"Could not find task for human task with guid: {task_guid}")
+
+        potential_owners_by_task_id = self.get_potential_owner_ids_from_tasks(spiff_tasks)
+        now_in_seconds = round(time.time())
+        human_tasks = []
+        for spiff_task in spiff_tasks:
+            task_spec = spiff_task.task_spec
+            extensions = task_spec.extensions
+
+            # in the xml, it's the id attribute. this identifies the process where the activity lives.
+            # if it's in a subprocess, it's the inner process.
+            bpmn_process_identifier = spiff_task.workflow.spec.name
+
+            form_file_name = None
+            ui_form_file_name = None
+            if "properties" in extensions:
+                properties = extensions["properties"]
+                if "formJsonSchemaFilename" in properties:
+                    form_file_name = properties["formJsonSchemaFilename"]
+                if "formUiSchemaFilename" in properties:
+                    ui_form_file_name = properties["formUiSchemaFilename"]
+
+            human_tasks.append(
+                HumanTaskModel(
+                    process_instance_id=self.process_instance_model.id,
+                    process_model_display_name=self.process_instance_model.process_model_display_name,
+                    bpmn_process_identifier=bpmn_process_identifier,
+                    form_file_name=form_file_name,
+                    ui_form_file_name=ui_form_file_name,
+                    task_guid=str(spiff_task.id),
+                    task_id=str(spiff_task.id),
+                    task_name=task_spec.bpmn_id,
+                    task_title=task_spec.bpmn_name,
+                    task_type=task_spec.__class__.__name__,
+                    task_status=TaskState.get_name(spiff_task.state),
+                    lane_assignment_id=potential_owners_by_task_id[str(spiff_task.id)]["lane_assignment_id"],
+                    completed=False,
+                    # the bulk writer skips the listeners that normally set these
+                    created_at_in_seconds=now_in_seconds,
+                    updated_at_in_seconds=now_in_seconds,
+                )
+            )
+        BulkWriter.insert_models(human_tasks)
+
+        # the bulk writer does not fill in ids so look them up to add the users
+        human_task_ids_by_task_id = {
+            row.task_id: row.id
+            for row in HumanTaskModel.query.with_entities(HumanTaskModel.task_id, HumanTaskModel.id)
+            .filter(
+                HumanTaskModel.process_instance_id == self.process_instance_model.id,
+                HumanTaskModel.completed == False,  # noqa: E712
+                HumanTaskModel.task_id.in_(task_guids),  # type: ignore
+            )
+            .all()
+        }
+        human_task_user_rows = []
+        for task_guid in task_guids:
+            # a user listed more than once in the lane owners is still only added once
+            for potential_owner_id in dict.fromkeys(potential_owners_by_task_id[task_guid]["potential_owner_ids"]):
+                human_task_user_rows.append(
+                    {"human_task_id": human_task_ids_by_task_id[task_guid], "user_id": potential_owner_id}
+                )
+        BulkWriter.insert(HumanTaskUserModel.__table__, human_task_user_rows)
 
     def serialize_task_spec(self, task_spec: SpiffTask) -> dict:
         """Get a serialized version of a task spec."""
@@ -1296,6 +1668,7 @@ class ProcessInstanceProcessor:
             bpmn_definition_to_task_definitions_mappings=self.bpmn_definition_to_task_definitions_mappings,
             bpmn_subprocess_mapping=self.bpmn_subprocess_mapping,
             task_model_mapping=self.task_model_mapping,
+            task_data_fingerprints=self.task_data_fingerprints,
         )
         task_service.update_all_tasks_from_spiff_tasks(spiff_tasks, [], start_time)
         ProcessInstanceTmpService.add_event_to_process_instance(self.process_instance_model, event_type, task_guid=task_id)
@@ -1331,6 +1704,7 @@ class ProcessInstanceProcessor:
             bpmn_definition_to_task_definitions_mappings=processor.bpmn_definition_to_task_definitions_mappings,
             task_model_mapping=processor.task_model_mapping,
             bpmn_subprocess_mapping=processor.bpmn_subprocess_mapping,
+            task_data_fingerprints=processor.task_data_fingerprints,
         )
         task_service.update_all_tasks_from_spiff_tasks(spiff_tasks, deleted_tasks, start_time, to_task_guid=to_task_guid)
 
@@ -1388,7 +1762,12 @@ class ProcessInstanceProcessor:
     def update_spiff_parser_with_all_process_dependency_files(
         parser: SpiffBpmnParser,
         processed_identifiers: set[str] | None = None,
+        loaded_file_paths: set[str] | None = None,
     ) -> None:
+        """Adds the files for any called processes the parser does not know about yet.
+
+        Paths of the bpmn and dmn files that get added are recorded in loaded_file_paths if it is given.
+        """
         if processed_identifiers is None:
             processed_identifiers = set()
         processor_dependencies = parser.get_process_dependencies()
@@ -1411,11 +1790,17 @@ class ProcessInstanceProcessor:
             new_bpmn_files.add(new_bpmn_file_full_path)
             dmn_file_glob = os.path.join(os.path.dirname(new_bpmn_file_full_path), "*.dmn")
             parser.add_dmn_files_by_glob(dmn_file_glob)
+            if loaded_file_paths is not None:
+                loaded_file_paths.update(glob.glob(dmn_file_glob))
             processed_identifiers.add(bpmn_process_identifier)
 
         if new_bpmn_files:
             parser.add_bpmn_files(new_bpmn_files)
-            ProcessInstanceProcessor.update_spiff_parser_with_all_process_dependency_files(parser, processed_identifiers)
+            if loaded_file_paths is not None:
+                loaded_file_paths.update(new_bpmn_files)
+            ProcessInstanceProcessor.update_spiff_parser_with_all_process_dependency_files(
+                parser, processed_identifiers, loaded_file_paths=loaded_file_paths
+            )
 
     @staticmethod
     def get_spec(
@@ -1423,13 +1808,24 @@ class ProcessInstanceProcessor:
         process_model_info: ProcessModelInfo,
         process_id_to_run: str | None = None,
     ) -> tuple[BpmnProcessSpec, IdToBpmnProcessSpecMapping]:
-        """Returns a SpiffWorkflow specification for the given process_instance spec, using the files provided."""
+        """Returns a SpiffWorkflow specification for the given process_instance spec, using the files provided.
+
+        Parsed specs are cached per worker and reused as long as none of the files that went into them have changed.
+        """
         parser = ProcessInstanceProcessor.get_parser()
 
         process_id = process_id_to_run or process_model_info.primary_process_id
+        cache_key = (process_model_info.id, process_id or "", tuple(sorted(file.name for file in files)))
+        cached_specs = ProcessModelSpecCacheService.get(cache_key)
+        if cached_specs is not None:
+            (cached_spec, cached_subprocesses) = cached_specs
+            return (cached_spec, IdToBpmnProcessSpecMapping(cached_subprocesses))
 
+        file_hashes: dict[str, str | None] = {}
         for file in files:
             data = SpecFileService.get_data(process_model_info, file.name)
+            full_file_path = SpecFileService.full_file_path(process_model_info, file.name)
+            file_hashes[full_file_path] = ProcessModelSpecCacheService.hash_bytes(data)
             try:
                 if file.type == FileType.bpmn.value:
                     bpmn: etree.Element = SpecFileService.get_etree_from_xml_bytes(data)
@@ -1449,7 +1845,10 @@ class ProcessInstanceProcessor:
                     message=f"There is no primary BPMN process id defined for process_model {process_model_info.id}",
                 )
             )
-        ProcessInstanceProcessor.update_spiff_parser_with_all_process_dependency_files(parser)
+        dependency_file_paths: set[str] = set()
+        ProcessInstanceProcessor.update_spiff_parser_with_all_process_dependency_files(
+            parser, loaded_file_paths=dependency_file_paths
+        )
 
         try:
             bpmn_process_spec = parser.get_spec(process_id)
@@ -1465,6 +1864,9 @@ class ProcessInstanceProcessor:
                 task_id=ve.id,
                 tag=ve.tag,
             ) from ve
+
+        file_hashes.update(ProcessModelSpecCacheService.file_hashes(dependency_file_paths))
+        ProcessModelSpecCacheService.set(cache_key, bpmn_process_spec, subprocesses, file_hashes)
         return (bpmn_process_spec, subprocesses)
 
     @staticmethod
@@ -1547,6 +1949,7 @@ class ProcessInstanceProcessor:
             bpmn_definition_to_task_definitions_mappings=self.bpmn_definition_to_task_definitions_mappings,
             bpmn_subprocess_mapping=self.bpmn_subprocess_mapping,
             task_model_mapping=self.task_model_mapping,
+            task_data_fingerprints=self.task_data_fingerprints,
         )
 
         if execution_strategy is None:
@@ -1577,7 +1980,12 @@ class ProcessInstanceProcessor:
 
     @classmethod
     def get_tasks_with_data(cls, bpmn_process_instance: BpmnWorkflow) -> list[SpiffTask]:
-        return [task for task in bpmn_process_instance.get_tasks(state=TaskState.FINISHED_MASK) if len(task.data) > 0]
+        # lazily loaded data that was never used has not changed, so there is no reason to pull it in here
+        return [
+            task
+            for task in bpmn_process_instance.get_tasks(state=TaskState.FINISHED_MASK)
+            if not is_unloaded_task_data(task.data) and len(task.data) > 0
+        ]
 
     @classmethod
     def get_task_data_size(cls, bpmn_process_instance: BpmnWorkflow) -> int:
@@ -1619,6 +2027,7 @@ class ProcessInstanceProcessor:
         if serialize_script_engine_state:
             self._script_engine.environment.preserve_state(self.bpmn_process_instance)
 
+        load_lazy_task_data(self.bpmn_process_instance)
         result = self._serializer.to_dict(self.bpmn_process_instance)
 
         if not serialize_script_engine_state and "data" in result:
@@ -1706,7 +2115,7 @@ class ProcessInstanceProcessor:
 
     def get_task_dict_from_spiff_task(self, spiff_task: SpiffTask) -> dict[str, Any]:
         default_registry = DefaultRegistry()
-        task_data = default_registry.convert(spiff_task.data)
+        task_data = default_registry.convert(loaded_task_data(spiff_task.data))
         python_env = default_registry.convert(self._script_engine.environment.last_result())
         task_json: dict[str, Any] = {
             "task_data": task_data,
@@ -1750,9 +2159,12 @@ class ProcessInstanceProcessor:
             run_started_at=run_started_at,
             bpmn_subprocess_mapping=self.bpmn_subprocess_mapping,
             task_model_mapping=self.task_model_mapping,
+            task_data_fingerprints=self.task_data_fingerprints,
         )
         task_service.update_task_model(task_model, spiff_task)
-        JsonDataModel.insert_or_update_json_data_records(task_service.json_data_dicts)
+        JsonDataModel.insert_or_update_json_data_records(
+            task_service.json_data_dicts, process_model_identifier=self.process_instance_model.process_model_identifier
+        )
 
         ProcessInstanceTmpService.add_event_to_process_instance(
             self.process_instance_model,
@@ -1867,6 +2279,7 @@ class ProcessInstanceProcessor:
             bpmn_definition_to_task_definitions_mappings=self.bpmn_definition_to_task_definitions_mappings,
             bpmn_subprocess_mapping=self.bpmn_subprocess_mapping,
             task_model_mapping=self.task_model_mapping,
+            task_data_fingerprints=self.task_data_fingerprints,
         )
         task_service.update_all_tasks_from_spiff_tasks(spiff_tasks, deleted_tasks, start_time)
 
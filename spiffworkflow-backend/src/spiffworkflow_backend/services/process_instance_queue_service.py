@@ -1,13 +1,25 @@
 import contextlib
 import time
 from collections.abc import Generator
+from typing import Any
+
+from flask import current_app
+from sqlalchemy import func
+from sqlalchemy import or_
 
 from spiffworkflow_backend.models.db import db
+from spiffworkflow_backend.models.db import supports_skip_locked
 from spiffworkflow_backend.models.process_instance import ProcessInstanceModel
 from spiffworkflow_backend.models.process_instance_event import ProcessInstanceEventType
+from spiffworkflow_backend.models.process_instance_queue import PROCESS_INSTANCE_QUEUE_PRIORITY_DEFAULT
+from spiffworkflow_backend.models.process_instance_queue import PROCESS_INSTANCE_QUEUE_PRIORITY_HIGHEST
+from spiffworkflow_backend.models.process_instance_queue import PROCESS_INSTANCE_QUEUE_PRIORITY_LOWEST
 from spiffworkflow_backend.models.process_instance_queue import ProcessInstanceQueueModel
+from spiffworkflow_backend.services.background_wakeup_service import BackgroundWakeupService
 from spiffworkflow_backend.services.error_handling_service import ErrorHandlingService
+from spiffworkflow_backend.services.process_instance_lock_service import PROCESS_INSTANCE_LOCK_WAIT_SECONDS
 from spiffworkflow_backend.services.process_instance_lock_service import ExpectedLockNotFoundError
+from spiffworkflow_backend.services.process_instance_lock_service import ProcessInstanceLockLostError
 from spiffworkflow_backend.services.process_instance_lock_service import ProcessInstanceLockService
 from spiffworkflow_backend.services.process_instance_tmp_service import ProcessInstanceTmpService
 from spiffworkflow_backend.services.workflow_execution_service import WorkflowExecutionServiceError
@@ -26,29 +38,111 @@ class ProcessInstanceQueueService:
     def _configure_and_save_queue_entry(
         cls, process_instance: ProcessInstanceModel, queue_entry: ProcessInstanceQueueModel
     ) -> None:
-        queue_entry.priority = 2
         queue_entry.status = process_instance.status
         queue_entry.locked_by = None
         queue_entry.locked_at_in_seconds = None
+        queue_entry.lock_expires_at_in_seconds = None
 
         db.session.add(queue_entry)
+        BackgroundWakeupService.notify(queue_entry.status, queue_entry.run_at_in_seconds)
         db.session.commit()
 
     @classmethod
-    def enqueue_new_process_instance(cls, process_instance: ProcessInstanceModel, run_at_in_seconds: int) -> None:
-        queue_entry = ProcessInstanceQueueModel(process_instance_id=process_instance.id, run_at_in_seconds=run_at_in_seconds)
+    def enqueue_new_process_instance(
+        cls, process_instance: ProcessInstanceModel, run_at_in_seconds: int, priority: int | None = None
+    ) -> None:
+        queue_entry = ProcessInstanceQueueModel(
+            process_instance_id=process_instance.id,
+            run_at_in_seconds=run_at_in_seconds,
+            priority=cls.normalized_priority(priority),
+        )
         cls._configure_and_save_queue_entry(process_instance, queue_entry)
 
+    @classmethod
+    def normalized_priority(cls, priority: int | None) -> int:
+        if priority is None:
+            return PROCESS_INSTANCE_QUEUE_PRIORITY_DEFAULT
+        return min(max(priority, PROCESS_INSTANCE_QUEUE_PRIORITY_HIGHEST), PROCESS_INSTANCE_QUEUE_PRIORITY_LOWEST)
+
+    @classmethod
+    def set_priority(cls, process_instance: ProcessInstanceModel, priority: int) -> None:
+        """Overrides the priority the process instance got from its process model.
+
+        This does not need the process instance lock. The new priority is used the next time the instance is claimed or queued.
+        """
+        updated_count = (
+            db.session.query(ProcessInstanceQueueModel)
+            .filter(ProcessInstanceQueueModel.process_instance_id == process_instance.id)
+            .update({"priority": cls.normalized_priority(priority)})
+        )
+        if updated_count == 0:
+            raise ProcessInstanceIsNotEnqueuedError(
+                f"Cannot set the priority of process instance {process_instance.id}. It has not been enqueued."
+            )
+        db.session.commit()
+
+    @classmethod
+    def _priority_order_by(cls) -> list[Any]:
+        """Orders queue entries with the lowest priority number first, and aged entries ahead of newer ones.
+
+        With aging, every aging interval an entry has waited since its run_at_in_seconds counts as one priority level,
+        so sorting by priority * interval + run_at_in_seconds is the same as sorting by priority minus the levels it aged.
+        """
+        priority: Any = func.coalesce(ProcessInstanceQueueModel.priority, PROCESS_INSTANCE_QUEUE_PRIORITY_DEFAULT)
+        aging_interval_in_seconds = current_app.config["SPIFFWORKFLOW_BACKEND_QUEUE_PRIORITY_AGING_INTERVAL_IN_SECONDS"]
+        if aging_interval_in_seconds > 0:
+            return [
+                priority * aging_interval_in_seconds + ProcessInstanceQueueModel.run_at_in_seconds,
+                ProcessInstanceQueueModel.id,
+            ]
+        return [priority, ProcessInstanceQueueModel.run_at_in_seconds, ProcessInstanceQueueModel.id]
+
     @classmethod
     def _enqueue(cls, process_instance: ProcessInstanceModel) -> None:
+        locked_by = ProcessInstanceLockService.locked_by()
         queue_entry_id = ProcessInstanceLockService.unlock(process_instance.id)
         queue_entry = ProcessInstanceQueueModel.query.filter_by(id=queue_entry_id).first()
         if queue_entry is None:
             raise ExpectedLockNotFoundError(f"Could not find a lock for process instance: {process_instance.id}")
         current_time = round(time.time())
-        if current_time > queue_entry.run_at_in_seconds:
-            queue_entry.run_at_in_seconds = current_time
-        cls._configure_and_save_queue_entry(process_instance, queue_entry)
+        run_at_in_seconds = max(current_time, queue_entry.run_at_in_seconds)
+
+        # if our lease expired and something else took the lock, the process instance is theirs now
+        released_count = (
+            db.session.query(ProcessInstanceQueueModel)
+            .filter(
+                ProcessInstanceQueueModel.id == queue_entry_id,
+                ProcessInstanceQueueModel.locked_by == locked_by,
+            )
+            .update(
+                {
+                    "status": process_instance.status,
+                    "run_at_in_seconds": run_at_in_seconds,
+                    "locked_by": None,
+                    "locked_at_in_seconds": None,
+                    "lock_expires_at_in_seconds": None,
+                    # a bulk update does not go through the listener that sets this
+                    "updated_at_in_seconds": current_time,
+                }
+            )
+        )
+        if released_count == 0:
+            db.session.rollback()
+            current_app.logger.warning(
+                f"{locked_by} did not release its lock on process instance {process_instance.id}"
+                f" because it is held by {queue_entry.locked_by} now."
+            )
+            return
+        BackgroundWakeupService.notify(process_instance.status, run_at_in_seconds)
+        db.session.commit()
+
+    @classmethod
+    def _is_unlocked(cls, current_time: int) -> Any:
+        """Locks whose lease expired, like those of a worker that crashed, can be taken without waiting for them to be removed."""
+        return or_(
+            ProcessInstanceQueueModel.locked_by.is_(None),  # type: ignore
+            ProcessInstanceQueueModel.lock_expires_at_in_seconds < current_time,  # type: ignore
+        )
 
     @classmethod
     def _dequeue(cls, process_instance: ProcessInstanceModel) -> None:
@@ -57,11 +151,12 @@ class ProcessInstanceQueueService:
 
         db.session.query(ProcessInstanceQueueModel).filter(
             ProcessInstanceQueueModel.process_instance_id == process_instance.id,
-            ProcessInstanceQueueModel.locked_by.is_(None),  # type: ignore
+            cls._is_unlocked(current_time),
         ).update(
             {
                 "locked_by": locked_by,
                 "locked_at_in_seconds": current_time,
+                "lock_expires_at_in_seconds": ProcessInstanceLockService.lease_expires_at_in_seconds(current_time),
             }
         )
         db.session.commit()
@@ -97,11 +192,16 @@ class ProcessInstanceQueueService:
     ) -> None:
         attempt = 1
         backoff_factor = 2
+        domain = ProcessInstanceLockService.get_thread_local_locking_context()["domain"]
+        start = time.monotonic()
         while True:
             try:
-                return cls._dequeue(process_instance)
+                cls._dequeue(process_instance)
+                PROCESS_INSTANCE_LOCK_WAIT_SECONDS.labels(domain, "true").observe(time.monotonic() - start)
+                return
             except ProcessInstanceIsAlreadyLockedError as exception:
                 if attempt >= max_attempts:
+                    PROCESS_INSTANCE_LOCK_WAIT_SECONDS.labels(domain, "false").observe(time.monotonic() - start)
                     raise exception
                 time.sleep(backoff_factor**attempt)
                 attempt += 1
@@ -121,6 +221,10 @@ class ProcessInstanceQueueService:
             cls._dequeue_with_retries(process_instance, max_attempts=max_attempts)
         try:
             yield
+        except ProcessInstanceLockLostError:
+            # the process instance may belong to something else now so none of this run can be saved
+            db.session.rollback()
+            raise
         except Exception as ex:
             # these events are handled in the WorkflowExecutionService.
             # that is, we don't need to add error_detail records here, etc.
@@ -134,6 +238,106 @@ class ProcessInstanceQueueService:
             if not reentering_lock:
                 cls._enqueue(process_instance)
 
+    @classmethod
+    def claim_many(
+        cls,
+        status_value: str,
+        run_at_in_seconds_threshold: int,
+        min_age_in_seconds: int = 0,
+        limit: int | None = None,
+    ) -> list[int]:
+        """Locks up to limit runnable queue entries for the current thread in one transaction.
+
+        Rows other pollers are claiming are skipped rather than waited on or fought over, using
+        SELECT ... FOR UPDATE SKIP LOCKED where the database has it and an update that only takes unlocked rows elsewhere.
+        Returns the ids of the process instances that were claimed, in priority order. Each one must be run with claimed,
+        or given back with release_claim, so its lock is released.
+        """
+        locked_by = ProcessInstanceLockService.locked_by()
+        current_time = round(time.time())
+        query = (
+            db.session.query(ProcessInstanceQueueModel.id)  # type: ignore
+            .filter(
+                ProcessInstanceQueueModel.status == status_value,
+                ProcessInstanceQueueModel.updated_at_in_seconds <= current_time - min_age_in_seconds,
+                cls._is_unlocked(current_time),
+                ProcessInstanceQueueModel.run_at_in_seconds <= run_at_in_seconds_threshold,
+            )
+            .order_by(*cls._priority_order_by())
+        )
+        if limit is not None:
+            query = query.limit(limit)
+        if supports_skip_locked():
+            query = query.with_for_update(skip_locked=True)
+        queue_entry_ids = [row.id for row in query.all()]
+        if len(queue_entry_ids) == 0:
+            db.session.commit()
+            return []
+
+        db.session.query(ProcessInstanceQueueModel).filter(
+            ProcessInstanceQueueModel.id.in_(queue_entry_ids),  # type: ignore
+            cls._is_unlocked(current_time),
+        ).update(
+            {
+                "locked_by": locked_by,
+                "locked_at_in_seconds": current_time,
+                "lock_expires_at_in_seconds": ProcessInstanceLockService.lease_expires_at_in_seconds(current_time),
+            },
+            synchronize_session=False,
+        )
+        db.session.commit()
+
+        # without skip locked, another poller can have taken some of the rows between the select and the update
+        queue_entries = (
+            db.session.query(ProcessInstanceQueueModel)
+            .filter(
+                ProcessInstanceQueueModel.id.in_(queue_entry_ids),  # type: ignore
+                ProcessInstanceQueueModel.locked_by == locked_by,
+            )
+            .order_by(*cls._priority_order_by())
+            .all()
+        )
+        for queue_entry in queue_entries:
+            ProcessInstanceLockService.lock(queue_entry.process_instance_id, queue_entry)
+        return [queue_entry.process_instance_id for queue_entry in queue_entries]
+
+    @classmethod
+    @contextlib.contextmanager
+    def claimed(cls, process_instance: ProcessInstanceModel) -> Generator[None, None, None]:
+        """Runs the block for a process instance claimed with claim_many and releases the claim after it."""
+        try:
+            yield
+        except ProcessInstanceLockLostError:
+            db.session.rollback()
+            raise
+        finally:
+            cls.release_claim(process_instance)
+
+    @classmethod
+    def release_claim(cls, process_instance: ProcessInstanceModel) -> None:
+        cls._enqueue(process_instance)
+
+    @classmethod
+    def release_claim_by_process_instance_id(cls, process_instance_id: int) -> None:
+        """Gives back a claim from claim_many without touching anything else on the queue entry.
+
+        For when the process instance itself could not be loaded, such as when it was deleted after being claimed.
+        """
+        locked_by = ProcessInstanceLockService.locked_by()
+        queue_entry_id = ProcessInstanceLockService.unlock(process_instance_id)
+        db.session.query(ProcessInstanceQueueModel).filter(
+            ProcessInstanceQueueModel.id == queue_entry_id,
+            ProcessInstanceQueueModel.locked_by == locked_by,
+        ).update(
+            {
+                "locked_by": None,
+                "locked_at_in_seconds": None,
+                "lock_expires_at_in_seconds": None,
+                "updated_at_in_seconds": round(time.time()),
+            }
+        )
+        db.session.commit()
+
     @classmethod
     def entries_with_status(
         cls,
@@ -151,6 +355,7 @@ class ProcessInstanceQueueService:
                 ProcessInstanceQueueModel.locked_by == locked_by,
                 ProcessInstanceQueueModel.run_at_in_seconds <= run_at_in_seconds_threshold,
             )
+            .order_by(*cls._priority_order_by())
             .all()
         )
 
@@ -47,6 +47,7 @@ from spiffworkflow_backend.services.error_handling_service import ErrorHandlingS
 from spiffworkflow_backend.services.git_service import GitCommandError
 from spiffworkflow_backend.services.git_service import GitService
 from spiffworkflow_backend.services.jinja_service import JinjaService
+from spiffworkflow_backend.services.process_instance_lock_service import ProcessInstanceLockLostError
 from spiffworkflow_backend.services.process_instance_processor import CustomBpmnScriptEngine
 from spiffworkflow_backend.services.process_instance_processor import ProcessInstanceProcessor
 from spiffworkflow_backend.services.process_instance_queue_service import ProcessInstanceIsAlreadyLockedError
@@ -65,6 +66,8 @@ FileDataGenerator = Generator[tuple[dict | list, str | int, str], None, None]
 class ProcessInstanceService:
     FILE_DATA_DIGEST_PREFIX = "spifffiledatadigest+"
     TASK_STATE_LOCKED = "locked"
+    # to avoid conflicts with the interstitial page, we wait 60 seconds before processing in the background
+    BACKGROUND_MIN_AGE_IN_SECONDS = 60
 
     @staticmethod
     def user_has_started_instance(process_model_identifier: str) -> bool:
@@ -131,7 +134,9 @@ class ProcessInstanceService:
             start_configuration = cls.next_start_event_configuration(process_instance_model)
         _, delay_in_seconds, _ = start_configuration
         run_at_in_seconds = round(time.time()) + delay_in_seconds
-        ProcessInstanceQueueService.enqueue_new_process_instance(process_instance_model, run_at_in_seconds)
+        ProcessInstanceQueueService.enqueue_new_process_instance(
+            process_instance_model, run_at_in_seconds, priority=process_model.default_priority
+        )
         return (process_instance_model, start_configuration)
 
     @classmethod
@@ -245,37 +250,53 @@ class ProcessInstanceService:
     # this is only used from background processor
     @classmethod
     def do_waiting(cls, status_value: str) -> None:
-        run_at_in_seconds_threshold = round(time.time())
-        min_age_in_seconds = 60  # to avoid conflicts with the interstitial page, we wait 60 seconds before processing
-        process_instance_ids_to_check = ProcessInstanceQueueService.peek_many(
-            status_value, run_at_in_seconds_threshold, min_age_in_seconds
-        )
-        if len(process_instance_ids_to_check) == 0:
-            return
+        """Runs up to a batch of runnable process instances with the given status.
 
-        records = (
-            db.session.query(ProcessInstanceModel)
-            .filter(ProcessInstanceModel.id.in_(process_instance_ids_to_check))  # type: ignore
-            .all()
-        )
+        Each one is claimed right before it runs rather than claiming the batch up front, since this runs them one after
+        another and everything claimed behind a slow process instance would be kept from the other pollers until it finished.
+        """
+        run_at_in_seconds_threshold = round(time.time())
         execution_strategy_name = current_app.config["SPIFFWORKFLOW_BACKEND_ENGINE_STEP_DEFAULT_STRATEGY_BACKGROUND"]
-        for process_instance in records:
-            current_app.logger.info(f"Processor {status_value}: Processing process_instance {process_instance.id}")
-            try:
-                if not queue_process_instance_if_appropriate(process_instance):
+        for _ in range(current_app.config["SPIFFWORKFLOW_BACKEND_BACKGROUND_SCHEDULER_CLAIM_BATCH_SIZE"]):
+            process_instance_ids = ProcessInstanceQueueService.claim_many(
+                status_value,
+                run_at_in_seconds_threshold,
+                cls.BACKGROUND_MIN_AGE_IN_SECONDS,
+                limit=1,
+            )
+            if len(process_instance_ids) == 0:
+                return
+            process_instance = db.session.query(ProcessInstanceModel).filter_by(id=process_instance_ids[0]).first()
+            if process_instance is None:
+                ProcessInstanceQueueService.release_claim_by_process_instance_id(process_instance_ids[0])
+                continue
+            cls._run_claimed_process_instance(process_instance, status_value, execution_strategy_name)
+
+    @classmethod
+    def _run_claimed_process_instance(
+        cls, process_instance: ProcessInstanceModel, status_value: str, execution_strategy_name: str | None
+    ) -> None:
+        current_app.logger.info(f"Processor {status_value}: Processing process_instance {process_instance.id}")
+        try:
+            if should_queue_process_instance(process_instance):
+                # a celery worker runs it, so let go of it before it can be picked up
+                ProcessInstanceQueueService.release_claim(process_instance)
+                queue_process_instance_if_appropriate(process_instance)
+            else:
+                with ProcessInstanceQueueService.claimed(process_instance):
                     cls.run_process_instance_with_processor(
                         process_instance, status_value=status_value, execution_strategy_name=execution_strategy_name
                     )
-            except ProcessInstanceIsAlreadyLockedError:
-                # we will try again later
-                continue
-            except Exception as exception:
-                db.session.rollback()  # in case the above left the database with a bad transaction
-                new_exception = Exception(
-                    f"Error running {status_value} task for process_instance {process_instance.id}"
-                    + f"({process_instance.process_model_identifier}). {exception.__class__.__name__}: {str(exception)}"
-                )
-                current_app.logger.exception(new_exception, stack_info=True)
+        except (ProcessInstanceIsAlreadyLockedError, ProcessInstanceLockLostError):
+            # we will try again later
+            pass
+        except Exception as exception:
+            db.session.rollback()  # in case the above left the database with a bad transaction
+            new_exception = Exception(
+                f"Error running {status_value} task for process_instance {process_instance.id}"
+                + f"({process_instance.process_model_identifier}). {exception.__class__.__name__}: {str(exception)}"
+            )
+            current_app.logger.exception(new_exception, stack_info=True)
 
     @classmethod
     def run_process_instance_with_processor(
@@ -311,6 +332,45 @@ class ProcessInstanceService:
 
         return (processor, task_runnability)
 
+    @classmethod
+    def run_process_instance_with_execution_strategies(
+        cls,
+        process_instance: ProcessInstanceModel,
+        execution_strategy_names: list[str],
+        processor: ProcessInstanceProcessor | None = None,
+    ) -> tuple[ProcessInstanceProcessor, TaskRunnability]:
+        """Runs each execution strategy in turn against a single processor, saving only after the last one.
+
+        This avoids loading and saving the process instance once per strategy.
+        A processor that is already loaded for the process instance can be passed in to skip loading it at all.
+        """
+        task_runnability = TaskRunnability.unknown_if_ready_tasks
+        with ProcessInstanceQueueService.dequeued(process_instance):
+            if processor is None:
+                ProcessInstanceMigrator.run(process_instance)
+                processor = ProcessInstanceProcessor(
+                    process_instance,
+                    workflow_completed_handler=cls.schedule_next_process_model_cycle,
+                )
+
+            for index, execution_strategy_name in enumerate(execution_strategy_names):
+                is_last_strategy = index == len(execution_strategy_names) - 1
+                try:
+                    task_runnability = processor.do_engine_steps(
+                        save=is_last_strategy,
+                        execution_strategy_name=execution_strategy_name,
+                        should_schedule_waiting_timer_events=is_last_strategy,
+                    )
+                except ProcessInstanceLockLostError:
+                    raise
+                except Exception:
+                    # save whatever state the failed run left behind like it would have been if every strategy saved
+                    if not is_last_strategy:
+                        processor.save()
+                    raise
+
+        return (processor, task_runnability)
+
     @staticmethod
     def processor_to_process_instance_api(process_instance: ProcessInstanceModel) -> ProcessInstanceApi:
         """Returns an API model representing the state of the current process_instance."""
@@ -10,6 +10,7 @@ from flask import current_app
 
 from spiffworkflow_backend.exceptions.api_error import ApiError
 from spiffworkflow_backend.exceptions.process_entity_not_found_error import ProcessEntityNotFoundError
+from spiffworkflow_backend.helpers.lru_cache import LruCache
 from spiffworkflow_backend.interfaces import ProcessGroupLite
 from spiffworkflow_backend.interfaces import ProcessGroupLitesWithCache
 from spiffworkflow_backend.models.permission_assignment import PermitDeny
@@ -30,6 +31,9 @@ from spiffworkflow_backend.services.user_service import UserService
 
 T = TypeVar("T")
 
+# the modification time and size of a process_model.json file, which change whenever it is written or pulled with git
+ProcessModelJsonFileVersion = tuple[int, int]
+
 
 class ProcessModelWithInstancesNotDeletableError(Exception):
     pass
@@ -45,6 +49,8 @@ class ProcessModelService(FileSystemService):
     GROUP_SCHEMA = ProcessGroupSchema()
     PROCESS_MODEL_SCHEMA = ProcessModelInfoSchema()
 
+    _process_model_json_cache: LruCache[str, tuple[ProcessModelJsonFileVersion, ProcessModelInfo]] | None = None
+
     @classmethod
     def path_to_id(cls, path: str) -> str:
         """Replace the os path separator for the standard id separator."""
@@ -135,6 +141,7 @@ class ProcessModelService(FileSystemService):
             if key not in PROCESS_MODEL_SUPPORTED_KEYS_FOR_DISK_SERIALIZATION:
                 del json_data[key]
         cls.write_json_file(json_path, json_data)
+        cls.process_model_json_cache().delete(process_model.id)
 
     @classmethod
     def process_model_delete(cls, process_model_id: str) -> None:
@@ -182,6 +189,43 @@ class ProcessModelService(FileSystemService):
             return cls.get_process_model_from_relative_path(process_model_id)
         raise ProcessEntityNotFoundError("process_model_not_found")
 
+    @classmethod
+    def get_metadata_extraction_paths(cls, process_model_id: str) -> list[dict[str, str]] | None:
+        return cls._get_process_model_with_cache(process_model_id).metadata_extraction_paths
+
+    @classmethod
+    def get_connector_response_cache_config(cls, process_model_id: str) -> dict[str, dict[str, Any]] | None:
+        return cls._get_process_model_with_cache(process_model_id).connector_response_cache
+
+    @classmethod
+    def process_model_json_cache(cls) -> LruCache[str, tuple[ProcessModelJsonFileVersion, ProcessModelInfo]]:
+        if cls._process_model_json_cache is None:
+            cls._process_model_json_cache = LruCache(current_app.config["SPIFFWORKFLOW_BACKEND_PROCESS_MODEL_JSON_CACHE_SIZE"])
+        return cls._process_model_json_cache
+
+    @classmethod
+    def _get_process_model_with_cache(cls, process_model_id: str) -> ProcessModelInfo:
+        """Returns a process model without reading its json file every time, for settings that are read while running tasks.
+
+        The process model is cached with the version of the process_model.json file it was read from
+        and is read again when the file changes, like after a git pull. It is shared, so it must not be modified.
+        """
+        json_file_path = os.path.join(FileSystemService.root_path(), process_model_id, cls.PROCESS_MODEL_JSON_FILE)
+        try:
+            json_file_stat = os.stat(json_file_path)
+        except OSError:
+            # let get_process_model raise the usual errors
+            return cls.get_process_model(process_model_id)
+        json_file_version = (json_file_stat.st_mtime_ns, json_file_stat.st_size)
+
+        cache = cls.process_model_json_cache()
+        cache_entry = cache.get(process_model_id)
+        if cache_entry is not None and cache_entry[0] == json_file_version:
+            return cache_entry[1]
+        process_model = cls.get_process_model(process_model_id)
+        cache.set(process_model_id, (json_file_version, process_model))
+        return process_model
+
     @classmethod
     def get_process_models(
         cls,
@@ -0,0 +1,77 @@
+from collections.abc import Iterable
+from hashlib import sha256
+from typing import TypedDict
+
+from flask import current_app
+from SpiffWorkflow.bpmn.specs.bpmn_process_spec import BpmnProcessSpec  # type: ignore
+
+from spiffworkflow_backend.helpers.lru_cache import LruCache
+
+ProcessModelSpecCacheKey = tuple[str, str, tuple[str, ...]]
+
+
+class ProcessModelSpecCacheEntry(TypedDict):
+    spec: BpmnProcessSpec
+    subprocesses: dict[str, BpmnProcessSpec]
+
+    # sha256 of every bpmn and dmn file the parser read, including those pulled in for call activities
+    file_hashes: dict[str, str | None]
+
+
+class ProcessModelSpecCacheService:
+    """Keeps the parsed specs for process models so creating instances does not re-parse the same xml.
+
+    Entries are keyed by process model id, the process id to run, and the names of the files in the model.
+    An entry is only used if the contents of every file that went into it still hash the same, so a git pull
+    or a change made by another worker is picked up. Local edits also clear the cache outright.
+    """
+
+    _cache: LruCache[ProcessModelSpecCacheKey, ProcessModelSpecCacheEntry] | None = None
+
+    @classmethod
+    def cache(cls) -> LruCache[ProcessModelSpecCacheKey, ProcessModelSpecCacheEntry]:
+        if cls._cache is None:
+            cls._cache = LruCache(current_app.config["SPIFFWORKFLOW_BACKEND_PROCESS_MODEL_SPEC_CACHE_SIZE"])
+        return cls._cache
+
+    @classmethod
+    def get(cls, key: ProcessModelSpecCacheKey) -> tuple[BpmnProcessSpec, dict[str, BpmnProcessSpec]] | None:
+        cache = cls.cache()
+        entry = cache.get(key)
+        if entry is None:
+            return None
+        if cls.file_hashes(entry["file_hashes"].keys()) != entry["file_hashes"]:
+            cache.delete(key)
+            return None
+        return (entry["spec"], dict(entry["subprocesses"]))
+
+    @classmethod
+    def set(
+        cls,
+        key: ProcessModelSpecCacheKey,
+        spec: BpmnProcessSpec,
+        subprocesses: dict[str, BpmnProcessSpec],
+        file_hashes: dict[str, str | None],
+    ) -> None:
+        cls.cache().set(key, {"spec": spec, "subprocesses": dict(subprocesses), "file_hashes": file_hashes})
+
+    @classmethod
+    def clear(cls) -> None:
+        if cls._cache is not None:
+            cls._cache.clear()
+
+    @classmethod
+    def file_hashes(cls, file_paths: Iterable[str]) -> dict[str, str | None]:
+        return {file_path: cls.file_hash(file_path) for file_path in file_paths}
+
+    @classmethod
+    def file_hash(cls, file_path: str) -> str | None:
+        try:
+            with open(file_path, "rb") as f_handle:
+                return cls.hash_bytes(f_handle.read())
+        except OSError:
+            return None
+
+    @classmethod
+    def hash_bytes(cls, data: bytes) -> str:
+        return sha256(data).hexdigest()
@@ -0,0 +1,182 @@
+import multiprocessing
+import multiprocessing.pool
+import os
+import signal
+import sys
+import traceback
+from threading import Lock
+from types import FrameType
+from typing import Any
+
+from flask import current_app
+from SpiffWorkflow.bpmn.exceptions import WorkflowTaskException  # type: ignore
+from SpiffWorkflow.task import Task as SpiffTask  # type: ignore
+
+try:
+    import resource
+except ImportError:  # pragma: no cover
+    resource = None  # type: ignore
+
+# gives a worker time to start and to report its own timeout before the pool is torn down from the outside
+TIMEOUT_GRACE_PERIOD_IN_SECONDS = 30
+
+
+class ScriptProcessPoolTimeoutError(Exception):
+    pass
+
+
+# holds the script engine a pool worker runs scripts with. it is built once per worker.
+_worker_state: dict[str, Any] = {}
+
+
+def _initialize_worker(code_cache_size: int) -> None:
+    from spiffworkflow_backend.helpers.lru_cache import LruCache
+    from spiffworkflow_backend.services.process_instance_processor import BaseCustomScriptEngineEnvironment
+    from spiffworkflow_backend.services.process_instance_processor import CustomBpmnScriptEngine
+
+    # there is no flask app in the worker to read the cache size from
+    BaseCustomScriptEngineEnvironment._code_cache = LruCache(code_cache_size)
+    _worker_state["script_engine"] = CustomBpmnScriptEngine()
+
+
+def _timeout_message(timeout_in_seconds: int) -> str:
+    return f"Script took longer than {timeout_in_seconds} seconds to run."
+
+
+def _address_space_in_bytes() -> int | None:
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[0]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+def _execute_in_worker(
+    script: str, context: dict[str, Any], timeout_in_seconds: int, memory_limit_in_bytes: int
+) -> dict[str, Any]:
+    """Runs the script against the task data in a pool worker and returns the resulting task data.
+
+    Errors are returned rather than raised along with the line of the script they happened on,
+    since the traceback does not survive the trip back to the web or background process.
+    """
+    previous_memory_limit = None
+    address_space_in_bytes = _address_space_in_bytes()
+    if resource is not None and memory_limit_in_bytes > 0 and address_space_in_bytes is not None:
+        previous_memory_limit = resource.getrlimit(resource.RLIMIT_AS)
+        resource.setrlimit(resource.RLIMIT_AS, (address_space_in_bytes + memory_limit_in_bytes, previous_memory_limit[1]))
+
+    def raise_timeout(signum: int, frame: FrameType | None) -> None:
+        raise ScriptProcessPoolTimeoutError(_timeout_message(timeout_in_seconds))
+
+    signal.signal(signal.SIGALRM, raise_timeout)
+    signal.setitimer(signal.ITIMER_REAL, timeout_in_seconds)
+    try:
+        _worker_state["script_engine"].environment.execute(script, context)
+        return {"context": context}
+    except Exception as exception:
+        line_number = 0
+        if isinstance(exception, SyntaxError):
+            line_number = exception.lineno or 0
+        else:
+            for frame_summary in traceback.extract_tb(sys.exc_info()[2]):
+                if frame_summary.filename == "<string>":
+                    line_number = frame_summary.lineno or 0
+        return {"exception": exception, "line_number": line_number}
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        if previous_memory_limit is not None:
+            resource.setrlimit(resource.RLIMIT_AS, previous_memory_limit)
+
+
+class ScriptProcessPoolService:
+    """Runs cpu heavy script tasks in a pool of worker processes so they do not hold the GIL of the process running
+    the process instance, which lets them use more than one core and keeps other threads, like web requests, responsive.
+
+    A script task opts in with the runScriptInProcessPool property set to true. The processTimeoutInSeconds and
+    processMemoryLimitInMb properties override the configured limits for that task.
+
+    The task data is copied to a worker, the script runs there with the same globals as any other script,
+    and the resulting task data replaces the data of the task. Script functions, like get_current_user, need the
+    database and the process instance, so they are not available to scripts in the pool.
+    """
+
+    _pool: multiprocessing.pool.Pool | None = None
+    _pool_lock = Lock()
+
+    @classmethod
+    def should_run_in_process_pool(cls, spiff_task: SpiffTask, script: str) -> bool:
+        if current_app.config["SPIFFWORKFLOW_BACKEND_SCRIPT_PROCESS_POOL_SIZE"] < 1:
+            return False
+        # only the script of a script task, not the pre and post scripts that any task can have
+        if getattr(spiff_task.task_spec, "script", None) != script:
+            return False
+        properties = getattr(spiff_task.task_spec, "extensions", {}).get("properties", {})
+        return str(properties.get("runScriptInProcessPool", "")).lower() == "true"
+
+    @classmethod
+    def execute(cls, spiff_task: SpiffTask, script: str) -> None:
+        properties = getattr(spiff_task.task_spec, "extensions", {}).get("properties", {})
+        timeout_in_seconds = int(
+            properties.get(
+                "processTimeoutInSeconds", current_app.config["SPIFFWORKFLOW_BACKEND_SCRIPT_PROCESS_POOL_TIMEOUT_IN_SECONDS"]
+            )
+        )
+        memory_limit_in_mb = int(
+            properties.get(
+                "processMemoryLimitInMb", current_app.config["SPIFFWORKFLOW_BACKEND_SCRIPT_PROCESS_POOL_MEMORY_LIMIT_IN_MB"]
+            )
+        )
+
+        # functions, like data store getters, cannot be sent to another process and running a script drops them anyway
+        context = {key: value for key, value in spiff_task.data.items() if not callable(value)}
+        async_result = cls.pool().apply_async(
+            _execute_in_worker, (script, context, timeout_in_seconds, memory_limit_in_mb * 1024 * 1024)
+        )
+        try:
+            result = async_result.get(timeout_in_seconds + TIMEOUT_GRACE_PERIOD_IN_SECONDS)
+        except multiprocessing.TimeoutError as exception:
+            # the worker is stuck somewhere it cannot be interrupted, like a long running call into C,
+            # so the only way to get it back is to replace the pool.
+            current_app.logger.warning(f"Replacing the script process pool after a script in task {spiff_task.id} hung.")
+            cls.reset()
+            raise WorkflowTaskException(
+                f"ScriptProcessPoolTimeoutError:{_timeout_message(timeout_in_seconds)}",
+                task=spiff_task,
+                exception=exception,
+            ) from exception
+
+        if "exception" in result:
+            script_exception = result["exception"]
+            line_number = result["line_number"]
+            error_line = script.splitlines()[line_number - 1] if line_number > 0 else ""
+            detail = script_exception.__class__.__name__
+            if len(script_exception.args) > 0:
+                detail += f":{script_exception.args[0]}"
+            raise WorkflowTaskException(
+                detail, task=spiff_task, exception=script_exception, line_number=line_number, error_line=error_line
+            ) from script_exception
+
+        spiff_task.data.clear()
+        spiff_task.data.update(result["context"])
+
+    @classmethod
+    def pool(cls) -> multiprocessing.pool.Pool:
+        with cls._pool_lock:
+            if cls._pool is None:
+                # forkserver starts workers from a clean process rather than a copy of this one, which can have
+                # threads and database connections. the server imports the script engine once for all of its workers.
+                context = multiprocessing.get_context("forkserver")
+                context.set_forkserver_preload(["spiffworkflow_backend.services.process_instance_processor"])
+                cls._pool = context.Pool(
+                    processes=current_app.config["SPIFFWORKFLOW_BACKEND_SCRIPT_PROCESS_POOL_SIZE"],
+                    initializer=_initialize_worker,
+                    initargs=(current_app.config["SPIFFWORKFLOW_BACKEND_SCRIPT_CODE_CACHE_SIZE"],),
+                )
+            return cls._pool
+
+    @classmethod
+    def reset(cls) -> None:
+        with cls._pool_lock:
+            if cls._pool is not None:
+                cls._pool.terminate()
+                cls._pool = None
@@ -1,9 +1,12 @@
 import copy
+import hashlib
 import json
 from json import JSONDecodeError
+from threading import Lock
 from typing import Any
+from typing import TypedDict
+from uuid import UUID
 
-import requests
 import sentry_sdk
 from flask import current_app
 from flask import g
@@ -17,8 +20,9 @@ from SpiffWorkflow.task import Task as SpiffTask  # type: ignore
 from SpiffWorkflow.util.task import TaskState  # type: ignore
 from spiffworkflow_connector_command.command_interface import CommandErrorDict
 
-from spiffworkflow_backend.config import CONNECTOR_PROXY_COMMAND_TIMEOUT
 from spiffworkflow_backend.config import HTTP_REQUEST_TIMEOUT_SECONDS
+from spiffworkflow_backend.services.connector_proxy_service import ConnectorProxyService
+from spiffworkflow_backend.services.connector_response_cache_service import ConnectorResponseCacheService
 from spiffworkflow_backend.services.file_system_service import FileSystemService
 from spiffworkflow_backend.services.secret_service import SecretService
 from spiffworkflow_backend.services.user_service import UserService
@@ -44,13 +48,19 @@ def connector_proxy_url() -> Any:
 
 
 class CustomServiceTask(ServiceTask):  # type: ignore
-    def _execute(self, spiff_task: SpiffTask) -> bool:
+    def evaluated_params(self, spiff_task: SpiffTask) -> dict:
         def evaluate(param: dict) -> dict:
             param["value"] = spiff_task.workflow.script_engine.evaluate(spiff_task, param["value"])
             return param
 
         operation_params_copy = copy.deepcopy(self.operation_params)
-        evaluated_params = {k: evaluate(v) for k, v in operation_params_copy.items()}
+        return {k: evaluate(v) for k, v in operation_params_copy.items()}
+
+    def _execute(self, spiff_task: SpiffTask) -> bool:
+        # params that were already evaluated to prefetch the response of the task are not evaluated again
+        evaluated_params = ServiceTaskDelegate.prefetched_bpmn_params(spiff_task)
+        if evaluated_params is None:
+            evaluated_params = self.evaluated_params(spiff_task)
 
         try:
             result = spiff_task.workflow.script_engine.call_service(self.operation_name, evaluated_params, spiff_task)
@@ -63,7 +73,19 @@ class CustomServiceTask(ServiceTask):  # type: ignore
         return True
 
 
+class PrefetchedConnectorResponse(TypedDict):
+    operator_identifier: str
+    bpmn_params: Any
+    task_data_hash: str
+    status_code: int
+    response_text: str
+
+
 class ServiceTaskDelegate:
+    # responses for ready service tasks that were fetched together in one batch, keyed by task id
+    _prefetched_responses: dict[UUID, PrefetchedConnectorResponse] = {}
+    _prefetched_responses_lock = Lock()
+
     @classmethod
     def handle_template_substitutions(cls, value: Any) -> Any:
         if isinstance(value, str):
@@ -183,35 +205,169 @@ class ServiceTaskDelegate:
             }
             cls.catch_error_codes(spiff_task, error_dict)
 
+    @classmethod
+    def _is_error_response(cls, parsed_response: dict, status_code: int) -> bool:
+        """Returns whether check_for_errors treats the response as an error."""
+        if "error" in parsed_response and isinstance(parsed_response["error"], dict) and "error_code" in parsed_response["error"]:
+            return True
+        return status_code >= 300
+
+    @classmethod
+    def connector_params(cls, bpmn_params: Any, spiff_task: SpiffTask) -> dict:
+        params = {k: cls.value_with_secrets_replaced(v["value"]) for k, v in bpmn_params.items()}
+        params["spiff__task_data"] = spiff_task.data
+        return params
+
+    @classmethod
+    def batch_operator_identifiers(cls) -> set[str]:
+        """Returns the operators that are safe to call again, like lookups, which are the only ones sent in batches.
+
+        A prefetched response is thrown away if its task does not run, like when an earlier engine step fails,
+        and the connector is called again when the task is retried.
+        """
+        return {
+            operator_identifier.strip()
+            for operator_identifier in str(current_app.config["SPIFFWORKFLOW_BACKEND_CONNECTOR_PROXY_BATCH_OPERATORS"]).split(",")
+            if operator_identifier.strip()
+        }
+
+    @classmethod
+    def prefetch_connector_responses(cls, spiff_tasks: list[SpiffTask]) -> None:
+        """Calls the connectors of the ready service tasks with one batch request to the connector proxy.
+
+        Only operators listed in SPIFFWORKFLOW_BACKEND_CONNECTOR_PROXY_BATCH_OPERATORS are prefetched.
+        When the task runs, it reuses the evaluated params as long as its data has the same content as when they
+        were evaluated, and call_connector then uses the response for it, as long as the task still has the same params.
+        Nothing is prefetched if there are fewer than two service tasks or the batch request fails,
+        and the tasks call their connectors one at a time as usual.
+        """
+        batch_operator_identifiers = cls.batch_operator_identifiers()
+        commands: list[tuple[SpiffTask, str, dict, dict]] = []
+        for spiff_task in spiff_tasks:
+            if (
+                not isinstance(spiff_task.task_spec, CustomServiceTask)
+                or spiff_task.task_spec.operation_name not in batch_operator_identifiers
+            ):
+                continue
+            try:
+                bpmn_params = spiff_task.task_spec.evaluated_params(spiff_task)
+                operator_identifier = spiff_task.task_spec.operation_name
+                cache_config = ConnectorResponseCacheService.config_for_task(operator_identifier, spiff_task)
+                if cache_config is not None:
+                    cache_key = ConnectorResponseCacheService.cache_key(
+                        operator_identifier, bpmn_params, spiff_task, cache_config
+                    )
+                    # the task gets its response from the cache when it runs
+                    if ConnectorResponseCacheService.peek_response(cache_key) is not None:
+                        continue
+                # replacing secrets changes nested params in place and these are compared with the unreplaced ones later
+                params = cls.connector_params(copy.deepcopy(bpmn_params), spiff_task)
+            except Exception as exception:
+                # the task raises this again when it runs, where the error is handled like any other
+                current_app.logger.debug(f"Not prefetching the response for task {spiff_task.id}: {exception}")
+                continue
+            commands.append((spiff_task, operator_identifier, bpmn_params, params))
+        if len(commands) < 2:
+            return
+
+        with sentry_sdk.start_span(op="call-connector-batch", description=f"{len(commands)} commands"):
+            responses = ConnectorProxyService.post_batch(
+                f"{connector_proxy_url()}/v1/do-batch",
+                [
+                    {"operator_identifier": operator_identifier, "params": params}
+                    for _, operator_identifier, _, params in commands
+                ],
+            )
+        if responses is None:
+            return
+        with cls._prefetched_responses_lock:
+            for (spiff_task, operator_identifier, bpmn_params, _), (status_code, response_text) in zip(
+                commands, responses, strict=True
+            ):
+                cls._prefetched_responses[spiff_task.id] = {
+                    "operator_identifier": operator_identifier,
+                    "bpmn_params": bpmn_params,
+                    "task_data_hash": cls._task_data_hash(spiff_task),
+                    "status_code": status_code,
+                    "response_text": response_text,
+                }
+
+    @classmethod
+    def discard_prefetched_connector_responses(cls, spiff_tasks: list[SpiffTask]) -> None:
+        with cls._prefetched_responses_lock:
+            for spiff_task in spiff_tasks:
+                cls._prefetched_responses.pop(spiff_task.id, None)
+
+    @classmethod
+    def prefetched_bpmn_params(cls, spiff_task: SpiffTask) -> Any | None:
+        """Returns the params evaluated for the prefetched response of the spiff task if its data has not changed since.
+
+        The data is compared by content, so changes made in place to values the params were evaluated from are noticed.
+        """
+        with cls._prefetched_responses_lock:
+            prefetched_response = cls._prefetched_responses.get(spiff_task.id)
+        if prefetched_response is None or prefetched_response["task_data_hash"] != cls._task_data_hash(spiff_task):
+            return None
+        return prefetched_response["bpmn_params"]
+
+    @classmethod
+    def _task_data_hash(cls, spiff_task: SpiffTask) -> str:
+        task_data_json = json.dumps(spiff_task.data, sort_keys=True, default=str)
+        return hashlib.sha256(task_data_json.encode("utf8")).hexdigest()
+
+    @classmethod
+    def _pop_prefetched_response(
+        cls, operator_identifier: str, bpmn_params: Any, spiff_task: SpiffTask
+    ) -> PrefetchedConnectorResponse | None:
+        with cls._prefetched_responses_lock:
+            prefetched_response = cls._prefetched_responses.pop(spiff_task.id, None)
+        if prefetched_response is None:
+            return None
+        if prefetched_response["operator_identifier"] != operator_identifier or prefetched_response["bpmn_params"] != bpmn_params:
+            return None
+        return prefetched_response
+
     @classmethod
     def call_connector(cls, operator_identifier: str, bpmn_params: Any, spiff_task: SpiffTask) -> str:
-        """Calls a connector via the configured proxy."""
+        """Calls a connector via the configured proxy, or returns its cached response if the operator opted in to caching."""
+        cache_config = ConnectorResponseCacheService.config_for_task(operator_identifier, spiff_task)
+        cache_key = None
+        if cache_config is not None:
+            # the key is made before secrets are filled in, which changes bpmn_params in place
+            cache_key = ConnectorResponseCacheService.cache_key(operator_identifier, bpmn_params, spiff_task, cache_config)
+            cached_response_text = ConnectorResponseCacheService.get_response(operator_identifier, cache_key)
+            if cached_response_text is not None:
+                return cached_response_text
+
         call_url = f"{connector_proxy_url()}/v1/do/{operator_identifier}"
-        current_app.logger.info(f"Calling connector proxy using connector: {operator_identifier}")
-        task_data = spiff_task.data
+        prefetched_response = cls._pop_prefetched_response(operator_identifier, bpmn_params, spiff_task)
+        if prefetched_response is None:
+            current_app.logger.info(f"Calling connector proxy using connector: {operator_identifier}")
         with sentry_sdk.start_span(op="connector_by_name", description=operator_identifier):
             with sentry_sdk.start_span(op="call-connector", description=call_url):
-                params = {k: cls.value_with_secrets_replaced(v["value"]) for k, v in bpmn_params.items()}
-                params["spiff__task_data"] = task_data
-
                 response_text = ""
                 status_code = 0
                 parsed_response: dict = {}
-                try:
-                    # this will raise on ConnectionError - like a bad url, and maybe limited other scenarios
-                    proxied_response = requests.post(call_url, json=params, timeout=CONNECTOR_PROXY_COMMAND_TIMEOUT)
-
-                    status_code = proxied_response.status_code
-                    response_text = proxied_response.text
-                except Exception as exception:
-                    # in case proxied_response.text fails we do not want to lose the original status code
-                    status_code = status_code or 500
-                    parsed_response = {
-                        "error": {
-                            "error_code": exception.__class__.__name__,
-                            "message": str(exception),
+                if prefetched_response is not None:
+                    status_code = prefetched_response["status_code"]
+                    response_text = prefetched_response["response_text"]
+                else:
+                    params = cls.connector_params(bpmn_params, spiff_task)
+                    try:
+                        # this will raise on ConnectionError - like a bad url, and maybe limited other scenarios
+                        proxied_response = ConnectorProxyService.post(operator_identifier, call_url, params)
+
+                        status_code = proxied_response.status_code
+                        response_text = proxied_response.text
+                    except Exception as exception:
+                        # in case proxied_response.text fails we do not want to lose the original status code
+                        status_code = status_code or 500
+                        parsed_response = {
+                            "error": {
+                                "error_code": exception.__class__.__name__,
+                                "message": str(exception),
+                            }
                         }
-                    }
 
                 if "error" not in parsed_response:
                     try:
@@ -242,6 +398,13 @@ class ServiceTaskDelegate:
                 cls.check_for_errors(spiff_task, parsed_response, status_code, response_text, operator_identifier)
 
                 if "refreshed_token_set" not in parsed_response:
+                    # errors that were caught by the process are not cached so the next task calls the connector again
+                    if (
+                        cache_key is not None
+                        and cache_config is not None
+                        and not cls._is_error_response(parsed_response, status_code)
+                    ):
+                        ConnectorResponseCacheService.set_response(cache_key, cache_config, response_text or "{}")
                     return response_text or "{}"
 
                 secret_key = parsed_response["auth"]
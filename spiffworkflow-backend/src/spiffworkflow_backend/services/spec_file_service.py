@@ -20,6 +20,7 @@ from spiffworkflow_backend.services.custom_parser import MyCustomParser
 from spiffworkflow_backend.services.file_system_service import FileSystemService
 from spiffworkflow_backend.services.process_caller_service import ProcessCallerService
 from spiffworkflow_backend.services.process_model_service import ProcessModelService
+from spiffworkflow_backend.services.process_model_spec_cache_service import ProcessModelSpecCacheService
 
 if TYPE_CHECKING:
     from spiffworkflow_backend.models.process_model import ProcessModelInfo
@@ -219,6 +220,7 @@ class SpecFileService(FileSystemService):
         # make sure we save the file as the last thing we do to ensure validations have run
         full_file_path = cls.full_file_path(process_model_info, file_name)
         cls.write_file_data_to_system(full_file_path, binary_data)
+        ProcessModelSpecCacheService.clear()
         return (cls.to_file_object(file_name, full_file_path), references)
 
     @classmethod
@@ -236,6 +238,7 @@ class SpecFileService(FileSystemService):
         cls.clear_caches_for_item(file_name=file_name, process_model_info=process_model)
         full_file_path = cls.full_file_path(process_model, file_name)
         os.remove(full_file_path)
+        ProcessModelSpecCacheService.clear()
 
     @staticmethod
     def delete_all_files(process_model: ProcessModelInfo) -> None:
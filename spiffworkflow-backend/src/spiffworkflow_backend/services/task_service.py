@@ -5,6 +5,7 @@ from hashlib import sha256
 from typing import TypedDict
 from uuid import UUID
 
+from flask import current_app
 from SpiffWorkflow.bpmn.serializer.workflow import BpmnWorkflowSerializer  # type: ignore
 from SpiffWorkflow.bpmn.workflow import BpmnWorkflow  # type: ignore
 from SpiffWorkflow.exceptions import WorkflowException  # type: ignore
@@ -14,6 +15,7 @@ from sqlalchemy import and_
 from sqlalchemy import asc
 
 from spiffworkflow_backend.exceptions.error import TaskMismatchError
+from spiffworkflow_backend.helpers.bulk_writer import BulkWriter
 from spiffworkflow_backend.models.bpmn_process import BpmnProcessModel
 from spiffworkflow_backend.models.bpmn_process import BpmnProcessNotFoundError
 from spiffworkflow_backend.models.bpmn_process_definition import BpmnProcessDefinitionModel
@@ -21,6 +23,7 @@ from spiffworkflow_backend.models.db import SpiffworkflowBaseDBModel
 from spiffworkflow_backend.models.db import db
 from spiffworkflow_backend.models.human_task import HumanTaskModel
 from spiffworkflow_backend.models.human_task_user import HumanTaskUserModel
+from spiffworkflow_backend.models.json_data import JsonDataDelta
 from spiffworkflow_backend.models.json_data import JsonDataDict
 from spiffworkflow_backend.models.json_data import JsonDataModel
 from spiffworkflow_backend.models.process_instance import ProcessInstanceModel
@@ -32,6 +35,8 @@ from spiffworkflow_backend.models.task import TaskModel  # noqa: F401
 from spiffworkflow_backend.models.task import TaskNotFoundError
 from spiffworkflow_backend.models.task_definition import TaskDefinitionModel
 from spiffworkflow_backend.models.task_draft_data import TaskDraftDataModel
+from spiffworkflow_backend.services.lazy_task_data import is_unloaded_task_data
+from spiffworkflow_backend.services.lazy_task_data import loaded_task_data
 from spiffworkflow_backend.services.process_instance_tmp_service import ProcessInstanceTmpService
 
 
@@ -40,6 +45,34 @@ class StartAndEndTimes(TypedDict):
     end_in_seconds: float | None
 
 
+class TaskDataFingerprint:
+    """Tells whether task data has changed since it was saved without serializing and hashing it again.
+
+    It holds on to the data dict and its values and compares them by identity, so replacing the data
+    or adding, removing, or reassigning any key counts as a change. Values changed in place are not
+    noticed, but spiff only does that to the data of a task while running it, which changes its state.
+
+    It also remembers how deep the saved record of the data is in a chain of deltas, if that is known.
+    """
+
+    def __init__(self, data: dict, delta_depth: int | None = None) -> None:
+        self.data = data
+        self.delta_depth = delta_depth
+        self.items: list[tuple] | None = None
+        if not is_unloaded_task_data(data):
+            self.items = list(data.items())
+
+    def matches(self, data: dict) -> bool:
+        if data is not self.data:
+            return False
+        if self.items is None:
+            return is_unloaded_task_data(data)
+        if len(data) != len(self.items):
+            return False
+        missing = object()
+        return all(data.get(key, missing) is value for key, value in self.items)
+
+
 class TaskModelError(Exception):
     """Copied from SpiffWorkflow.exceptions.WorkflowTaskException.
 
@@ -113,12 +146,16 @@ class TaskService:
         force_update_definitions: bool = False,
         task_model_mapping: dict[str, TaskModel] | None = None,
         bpmn_subprocess_mapping: dict[str, BpmnProcessModel] | None = None,
+        task_data_fingerprints: dict[str, TaskDataFingerprint] | None = None,
     ) -> None:
         self.process_instance = process_instance
         self.bpmn_definition_to_task_definitions_mappings = bpmn_definition_to_task_definitions_mappings
         self.serializer = serializer
-        self.task_model_mapping = task_model_mapping or {}
-        self.bpmn_subprocess_mapping = bpmn_subprocess_mapping or {}
+        self.task_model_mapping = task_model_mapping if task_model_mapping is not None else {}
+        self.bpmn_subprocess_mapping = bpmn_subprocess_mapping if bpmn_subprocess_mapping is not None else {}
+
+        # what the data of each task looked like when it was last loaded or saved. used to skip saving unchanged tasks.
+        self.task_data_fingerprints = task_data_fingerprints if task_data_fingerprints is not None else {}
 
         self.bpmn_subprocess_id_mapping: dict[int, BpmnProcessModel] = {}
         for _, bs in self.bpmn_subprocess_mapping.items():
@@ -132,18 +169,30 @@ class TaskService:
         self.force_update_definitions = force_update_definitions
 
         self.bpmn_processes: dict[str, BpmnProcessModel] = {}
+
+        # bpmn processes whose properties and data still need to be updated from their workflows before saving.
+        # their data can keep changing until then so it is only serialized and hashed once, when saving.
+        self.bpmn_processes_to_update: dict[str, tuple[BpmnWorkflow, BpmnProcessModel]] = {}
+
         self.task_models: dict[str, TaskModel] = {}
         self.json_data_dicts: dict[str, JsonDataDict] = {}
+        # the full, serialized data of each task updated in this save by task guid. deltas are only based on these.
+        self.task_json_data_dicts: dict[str, JsonDataDict] = {}
+        # the delta depth of the task data records in json_data_dicts
+        self.json_data_delta_depths: dict[str, int] = {}
         self.process_instance_events: dict[str, ProcessInstanceEventModel] = {}
 
         self.run_started_at: float | None = run_started_at
 
     def save_objects_to_database(self, save_process_instance_events: bool = True) -> None:
-        db.session.bulk_save_objects(self.bpmn_processes.values())
-        db.session.bulk_save_objects(self.task_models.values())
+        self.update_bpmn_processes_from_workflows()
+        BulkWriter.upsert_models(self.bpmn_processes.values(), conflict_column_names=["id"])
+        BulkWriter.upsert_models(self.task_models.values(), conflict_column_names=["guid"])
         if save_process_instance_events:
-            db.session.bulk_save_objects(self.process_instance_events.values())
-        JsonDataModel.insert_or_update_json_data_records(self.json_data_dicts)
+            BulkWriter.insert_models(self.process_instance_events.values())
+        JsonDataModel.insert_or_update_json_data_records(
+            self.json_data_dicts, process_model_identifier=self.process_instance.process_model_identifier
+        )
 
     def process_parents_and_children_and_save_to_database(
         self,
@@ -192,6 +241,59 @@ class TaskService:
                     spiff_task=spiff_task_of_parent_subprocess,
                 )
 
+    def update_changed_task_models_with_spiff_tasks(self, spiff_tasks: list[SpiffTask]) -> None:
+        """Updates the task models of the given spiff tasks, skipping any that have not changed since they were saved.
+
+        The bpmn processes of the skipped tasks are still updated once each.
+        """
+        python_env_data_hash: str | None = None
+        unchanged_workflows: dict[int, tuple[BpmnWorkflow, BpmnProcessModel]] = {}
+        for spiff_task in spiff_tasks:
+            if python_env_data_hash is None:
+                python_env_data_hash = JsonDataModel.json_data_dict_from_dict(
+                    self.__class__._get_python_env_data_dict_from_spiff_task(spiff_task, self.serializer)
+                )["hash"]
+            if self.spiff_task_has_changed(spiff_task, python_env_data_hash):
+                self.update_task_model_with_spiff_task(spiff_task)
+            else:
+                task_model = self.task_model_mapping[str(spiff_task.id)]
+                bpmn_process = self.bpmn_subprocess_id_mapping[task_model.bpmn_process_id]
+                unchanged_workflows[id(spiff_task.workflow)] = (spiff_task.workflow, bpmn_process)
+
+        for spiff_workflow, bpmn_process in unchanged_workflows.values():
+            self.update_bpmn_process(spiff_workflow, bpmn_process)
+
+    def spiff_task_has_changed(self, spiff_task: SpiffTask, python_env_data_hash: str) -> bool:
+        """Checks whether the spiff task differs from its task model without serializing its data.
+
+        Anything this cannot be sure about counts as changed.
+        """
+        task_guid = str(spiff_task.id)
+        task_model = self.task_model_mapping.get(task_guid)
+        task_data_fingerprint = self.task_data_fingerprints.get(task_guid)
+        if (
+            task_model is None
+            or task_data_fingerprint is None
+            or task_guid in self.task_models
+            or task_model.bpmn_process_id not in self.bpmn_subprocess_id_mapping
+        ):
+            return True
+        if self.run_started_at is not None and spiff_task.last_state_change >= self.run_started_at:
+            return True
+
+        properties_json = task_model.properties_json
+        if (
+            properties_json.get("state") != spiff_task.state
+            or properties_json.get("last_state_change") != spiff_task.last_state_change
+            or properties_json.get("triggered") != spiff_task.triggered
+            or properties_json.get("children") != [str(child) for child in spiff_task._children]
+            or task_model.python_env_data_hash != python_env_data_hash
+            or task_model.runtime_info != spiff_task.task_spec.task_info(spiff_task)
+            or properties_json.get("internal_data") != self.serializer.registry.convert(spiff_task.internal_data)
+        ):
+            return True
+        return not task_data_fingerprint.matches(spiff_task.data)
+
     def update_task_model_with_spiff_task(
         self,
         spiff_task: SpiffTask,
@@ -213,10 +315,8 @@ class TaskService:
         bpmn_process = new_bpmn_process or task_model.bpmn_process or self.bpmn_subprocess_id_mapping[task_model.bpmn_process_id]
 
         self.update_task_model(task_model, spiff_task)
-        bpmn_process_json_data = self.update_task_data_on_bpmn_process(bpmn_process, bpmn_process_instance=spiff_task.workflow)
-        if bpmn_process_json_data is not None:
-            self.json_data_dicts[bpmn_process_json_data["hash"]] = bpmn_process_json_data
         self.task_models[task_model.guid] = task_model
+        self.task_model_mapping[task_model.guid] = task_model
 
         if start_and_end_times:
             task_model.start_in_seconds = start_and_end_times["start_in_seconds"]
@@ -260,18 +360,13 @@ class TaskService:
         spiff_workflow: BpmnWorkflow,
         bpmn_process: BpmnProcessModel,
     ) -> None:
-        new_properties_json = copy.copy(bpmn_process.properties_json)
-        new_properties_json["last_task"] = str(spiff_workflow.last_task.id) if spiff_workflow.last_task else None
-        new_properties_json["success"] = spiff_workflow.success
-        bpmn_process.properties_json = new_properties_json
-
-        bpmn_process_json_data = self.update_task_data_on_bpmn_process(bpmn_process, bpmn_process_instance=spiff_workflow)
-        if bpmn_process_json_data is not None:
-            self.json_data_dicts[bpmn_process_json_data["hash"]] = bpmn_process_json_data
-
-        self.bpmn_processes[bpmn_process.guid or "top_level"] = bpmn_process
+        """Marks the bpmn process and its ancestors to be updated from their workflows by update_bpmn_processes_from_workflows."""
+        bpmn_process_key = bpmn_process.guid or "top_level"
+        ancestors_are_marked = bpmn_process_key in self.bpmn_processes_to_update
+        self.bpmn_processes_to_update[bpmn_process_key] = (spiff_workflow, bpmn_process)
+        self.bpmn_processes[bpmn_process_key] = bpmn_process
 
-        if spiff_workflow.parent_task_id and bpmn_process.direct_parent_process_id:
+        if not ancestors_are_marked and spiff_workflow.parent_task_id and bpmn_process.direct_parent_process_id:
             direct_parent_bpmn_process = self.bpmn_subprocess_id_mapping[bpmn_process.direct_parent_process_id]
             self.update_bpmn_process(spiff_workflow.parent_workflow, direct_parent_bpmn_process)
 
@@ -281,6 +376,22 @@ class TaskService:
             ]
             bpmn_process.bpmn_process_definition_id = bpmn_process_definition.id
 
+    def update_bpmn_processes_from_workflows(self) -> None:
+        """Updates the properties and data of every bpmn process marked by update_bpmn_process.
+
+        Each process is handled once no matter how many of its tasks were updated.
+        """
+        for spiff_workflow, bpmn_process in self.bpmn_processes_to_update.values():
+            new_properties_json = copy.copy(bpmn_process.properties_json)
+            new_properties_json["last_task"] = str(spiff_workflow.last_task.id) if spiff_workflow.last_task else None
+            new_properties_json["success"] = spiff_workflow.success
+            bpmn_process.properties_json = new_properties_json
+
+            bpmn_process_json_data = self.update_task_data_on_bpmn_process(bpmn_process, bpmn_process_instance=spiff_workflow)
+            if bpmn_process_json_data is not None:
+                self.json_data_dicts[bpmn_process_json_data["hash"]] = bpmn_process_json_data
+        self.bpmn_processes_to_update = {}
+
     def update_task_model(
         self,
         task_model: TaskModel,
@@ -296,7 +407,19 @@ class TaskService:
                 f"Given spiff task ({spiff_task.task_spec.bpmn_id} - {spiff_task.id}) and task ({task_model.guid}) must match"
             )
 
-        new_properties_json = self.serializer.to_dict(spiff_task)
+        # task data that was lazily loaded but never used is exactly what is already stored so leave it alone
+        unloaded_task_data = None
+        if is_unloaded_task_data(spiff_task.data) and spiff_task.data.json_data_hash == task_model.json_data_hash:
+            unloaded_task_data = spiff_task.data
+        if unloaded_task_data is not None:
+            spiff_task.data = {}
+        else:
+            spiff_task.data = loaded_task_data(spiff_task.data)
+        try:
+            new_properties_json = self.serializer.to_dict(spiff_task)
+        finally:
+            if unloaded_task_data is not None:
+                spiff_task.data = unloaded_task_data
 
         if new_properties_json["task_spec"] == "Start":
             new_properties_json["parent"] = None
@@ -304,17 +427,82 @@ class TaskService:
         python_env_data_dict = self.__class__._get_python_env_data_dict_from_spiff_task(spiff_task, self.serializer)
         task_model.properties_json = new_properties_json
         task_model.state = TaskState.get_name(new_properties_json["state"])
-        json_data_dict = self.__class__.update_json_data_on_db_model_and_return_dict_if_updated(
-            task_model, spiff_task_data, "json_data_hash"
-        )
+        json_data_dict = None
+        if unloaded_task_data is None:
+            json_data_dict = self.__class__.update_json_data_on_db_model_and_return_dict_if_updated(
+                task_model, spiff_task_data, "json_data_hash"
+            )
         python_env_dict = self.__class__.update_json_data_on_db_model_and_return_dict_if_updated(
             task_model, python_env_data_dict, "python_env_data_hash"
         )
+        if unloaded_task_data is None:
+            self.task_json_data_dicts[task_model.guid] = json_data_dict or {
+                "hash": task_model.json_data_hash,
+                "data": spiff_task_data,
+            }
+        delta_depth = None
+        previous_task_data_fingerprint = self.task_data_fingerprints.get(task_model.guid)
         if json_data_dict is not None:
-            self.json_data_dicts[json_data_dict["hash"]] = json_data_dict
+            delta_depth = self.add_task_json_data_dict(spiff_task, json_data_dict)
+        elif previous_task_data_fingerprint is not None:
+            delta_depth = previous_task_data_fingerprint.delta_depth
         if python_env_dict is not None:
             self.json_data_dicts[python_env_dict["hash"]] = python_env_dict
         task_model.runtime_info = spiff_task.task_spec.task_info(spiff_task)
+        self.task_data_fingerprints[task_model.guid] = TaskDataFingerprint(spiff_task.data, delta_depth=delta_depth)
+
+    def add_task_json_data_dict(self, spiff_task: SpiffTask, json_data_dict: JsonDataDict) -> int | None:
+        """Adds the record of the data of the spiff task to the ones to save and returns its delta depth if it is known.
+
+        With delta encoding turned on, the data is stored as a delta against the data of the parent task when possible.
+        """
+        json_data_hash = json_data_dict["hash"]
+        if json_data_hash in self.json_data_dicts:
+            # keep the record that was added first since later deltas may be based on it.
+            # replacing it with a delta could make two records that are based on each other.
+            return self.json_data_delta_depths.get(json_data_hash)
+
+        delta_depth = 0
+        if current_app.config["SPIFFWORKFLOW_BACKEND_TASK_DATA_DELTA_ENCODING"]:
+            delta_json_data_dict = self.delta_json_data_dict_from_parent_task(spiff_task, json_data_dict)
+            if delta_json_data_dict is not None:
+                json_data_dict, delta_depth = delta_json_data_dict
+        self.json_data_dicts[json_data_hash] = json_data_dict
+        self.json_data_delta_depths[json_data_hash] = delta_depth
+        return delta_depth
+
+    def delta_json_data_dict_from_parent_task(
+        self, spiff_task: SpiffTask, json_data_dict: JsonDataDict
+    ) -> tuple[JsonDataDict, int] | None:
+        """Returns the data of the spiff task as a delta against the saved data of its parent task along with its depth.
+
+        The parent data is only used as a base if the parent task was updated in this save, so it is never
+        serialized and hashed again here. Returns None if the data should be stored in full, either as a
+        checkpoint or because there is nothing suitable to base it on.
+        """
+        parent_spiff_task = spiff_task.parent
+        if parent_spiff_task is None:
+            return None
+        parent_guid = str(parent_spiff_task.id)
+        parent_json_data_dict = self.task_json_data_dicts.get(parent_guid)
+        parent_task_data_fingerprint = self.task_data_fingerprints.get(parent_guid)
+        if (
+            parent_json_data_dict is None
+            or parent_task_data_fingerprint is None
+            or parent_task_data_fingerprint.delta_depth is None
+        ):
+            return None
+        delta_depth = parent_task_data_fingerprint.delta_depth + 1
+        if (
+            delta_depth >= current_app.config["SPIFFWORKFLOW_BACKEND_TASK_DATA_DELTA_CHECKPOINT_INTERVAL"]
+            or parent_json_data_dict["hash"] == json_data_dict["hash"]
+        ):
+            return None
+
+        delta = JsonDataDelta.create(parent_json_data_dict["data"], json_data_dict["data"])
+        if delta is None:
+            return None
+        return ({"hash": json_data_dict["hash"], "data": delta, "delta_base_hash": parent_json_data_dict["hash"]}, delta_depth)
 
     def find_or_create_task_model_from_spiff_task(
         self,
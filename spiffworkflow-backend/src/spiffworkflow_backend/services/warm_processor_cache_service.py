@@ -0,0 +1,80 @@
+from typing import TypedDict
+
+from flask import current_app
+from sqlalchemy import func
+
+from spiffworkflow_backend.helpers.lru_cache import LruCache
+from spiffworkflow_backend.models.db import db
+from spiffworkflow_backend.models.process_instance import ProcessInstanceModel
+from spiffworkflow_backend.models.process_instance_event import ProcessInstanceEventModel
+from spiffworkflow_backend.services.process_instance_processor import ProcessInstanceProcessor
+
+# status, updated_at_in_seconds, task_updated_at_in_seconds, and the id of the latest process instance event
+ProcessInstanceVersion = tuple[str, int | None, int | None, int | None]
+
+
+class WarmProcessorCacheEntry(TypedDict):
+    processor: ProcessInstanceProcessor
+    version: ProcessInstanceVersion
+
+
+class WarmProcessorCacheService:
+    """Keeps processors in memory for process instances a worker requeues so the next run can use them as they are.
+
+    A kept processor is only handed back if the process instance looks exactly like it did when the processor
+    saved it. Everything that changes an instance records a process instance event, so the id of the latest
+    event works as a version number alongside the instance timestamps.
+    """
+
+    _cache: LruCache[int, WarmProcessorCacheEntry] | None = None
+
+    @classmethod
+    def cache(cls) -> LruCache[int, WarmProcessorCacheEntry]:
+        if cls._cache is None:
+            cls._cache = LruCache(current_app.config["SPIFFWORKFLOW_BACKEND_CELERY_WARM_PROCESSOR_CACHE_SIZE"])
+        return cls._cache
+
+    @classmethod
+    def keep(cls, processor: ProcessInstanceProcessor) -> None:
+        cache = cls.cache()
+        if cache.max_size < 1:
+            return
+        process_instance = processor.process_instance_model
+        cache.set(process_instance.id, {"processor": processor, "version": cls.process_instance_version(process_instance)})
+
+    @classmethod
+    def checkout(cls, process_instance: ProcessInstanceModel) -> ProcessInstanceProcessor | None:
+        """Returns the kept processor for the process instance if it is still current and forgets about it.
+
+        This must be called while holding the lock on the process instance.
+        """
+        cache = cls.cache()
+        entry = cache.get(process_instance.id)
+        if entry is None:
+            return None
+        cache.delete(process_instance.id)
+
+        db.session.refresh(process_instance)
+        if cls.process_instance_version(process_instance) != entry["version"]:
+            return None
+
+        processor = entry["processor"]
+        processor.reattach_to_process_instance(process_instance)
+        return processor
+
+    @classmethod
+    def clear(cls) -> None:
+        if cls._cache is not None:
+            cls._cache.clear()
+
+    @classmethod
+    def process_instance_version(cls, process_instance: ProcessInstanceModel) -> ProcessInstanceVersion:
+        latest_event_id = (
+            db.session.query(func.max(ProcessInstanceEventModel.id)).filter_by(process_instance_id=process_instance.id).scalar()
+        )
+        return (
+            process_instance.status,
+            process_instance.updated_at_in_seconds,
+            process_instance.task_updated_at_in_seconds,
+            latest_event_id,
+        )
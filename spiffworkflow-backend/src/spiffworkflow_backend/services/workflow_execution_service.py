@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-import concurrent.futures
+import functools
 import time
 from abc import abstractmethod
 from collections.abc import Callable
@@ -40,10 +40,16 @@ from spiffworkflow_backend.models.process_instance_event import ProcessInstanceE
 from spiffworkflow_backend.models.task import TaskModel  # noqa: F401
 from spiffworkflow_backend.models.user import UserModel
 from spiffworkflow_backend.services.assertion_service import safe_assertion
+from spiffworkflow_backend.services.background_wakeup_service import BACKGROUND_WAKEUP_TOPIC_FUTURE_TASK
+from spiffworkflow_backend.services.background_wakeup_service import BACKGROUND_WAKEUP_TOPIC_MESSAGE
+from spiffworkflow_backend.services.background_wakeup_service import BackgroundWakeupService
+from spiffworkflow_backend.services.engine_step_executor_service import EngineStepExecutorService
 from spiffworkflow_backend.services.jinja_service import JinjaService
 from spiffworkflow_backend.services.process_instance_lock_service import ProcessInstanceLockService
 from spiffworkflow_backend.services.process_instance_tmp_service import ProcessInstanceTmpService
+from spiffworkflow_backend.services.service_task_service import ServiceTaskDelegate
 from spiffworkflow_backend.services.task_service import StartAndEndTimes
+from spiffworkflow_backend.services.task_service import TaskDataFingerprint
 from spiffworkflow_backend.services.task_service import TaskService
 
 
@@ -128,27 +134,34 @@ class ExecutionStrategy:
         process_instance_id: int,
     ) -> SpiffTask:
         with app.app_context():
-            tld = current_app.config.get("THREAD_LOCAL_DATA")
-            if tld:
-                tld.process_model_identifier = process_model_identifier
-                tld.process_instance_id = process_instance_id
+            self._set_up_context_for_task(user, process_model_identifier, process_instance_id)
+            return self._run_spiff_task(spiff_task)
 
-            g.user = user
+    def _set_up_context_for_task(self, user: Any | None, process_model_identifier: str, process_instance_id: int) -> None:
+        tld = current_app.config.get("THREAD_LOCAL_DATA")
+        if tld:
+            tld.process_model_identifier = process_model_identifier
+            tld.process_instance_id = process_instance_id
 
-            should_lock = any(isinstance(child.task_spec, SubWorkflowTaskMixin) for child in spiff_task.children)
+        g.user = user
 
-            if should_lock:
-                with self._mutex:
-                    spiff_task.run()
-            else:
+    def _run_spiff_task(self, spiff_task: SpiffTask) -> SpiffTask:
+        should_lock = any(isinstance(child.task_spec, SubWorkflowTaskMixin) for child in spiff_task.children)
+
+        if should_lock:
+            with self._mutex:
                 spiff_task.run()
+        else:
+            spiff_task.run()
 
-            return spiff_task
+        return spiff_task
 
     def spiff_run(
         self, bpmn_process_instance: BpmnWorkflow, process_instance_model: ProcessInstanceModel, exit_at: None = None
     ) -> TaskRunnability:
         while True:
+            # stop between engine steps rather than keep running an instance that something else may have locked
+            ProcessInstanceLockService.raise_if_lease_lost(process_instance_model.id)
             bpmn_process_instance.refresh_waiting_tasks()
             self.should_do_before(bpmn_process_instance, process_instance_model)
             engine_steps = self.get_ready_engine_steps(bpmn_process_instance)
@@ -180,10 +193,16 @@ class ExecutionStrategy:
                         if isinstance(child_task.task_spec, UnstructuredJoin):
                             has_gateway_children = True
 
-                if current_app.config["SPIFFWORKFLOW_BACKEND_USE_THREADS_FOR_TASK_EXECUTION"] and not has_gateway_children:
-                    self._run_engine_steps_with_threads(engine_steps, process_instance_model, user)
-                else:
-                    self._run_engine_steps_without_threads(engine_steps, process_instance_model, user)
+                if current_app.config["SPIFFWORKFLOW_BACKEND_CONNECTOR_PROXY_USE_BATCH"]:
+                    ServiceTaskDelegate.prefetch_connector_responses(engine_steps)
+                try:
+                    if current_app.config["SPIFFWORKFLOW_BACKEND_USE_THREADS_FOR_TASK_EXECUTION"] and not has_gateway_children:
+                        self._run_engine_steps_with_threads(engine_steps, process_instance_model, user)
+                    else:
+                        self._run_engine_steps_without_threads(engine_steps, process_instance_model, user)
+                finally:
+                    if current_app.config["SPIFFWORKFLOW_BACKEND_CONNECTOR_PROXY_USE_BATCH"]:
+                        ServiceTaskDelegate.discard_prefetched_connector_responses(engine_steps)
 
             if self.should_break_after(engine_steps):
                 # we could call the stuff at the top of the loop again and find out, but let's not do that unless we need to
@@ -225,25 +244,17 @@ class ExecutionStrategy:
         # code in parallel, we are just waiting for I/O in parallel.  So it can run a ton of
         # service tasks at once - many api calls, and then get those responses back without
         # waiting for each individual task to complete.
-        futures = []
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            for spiff_task in engine_steps:
-                self.delegate.will_complete_task(spiff_task)
-                futures.append(
-                    executor.submit(
-                        self._run,
-                        spiff_task,
-                        current_app._get_current_object(),
-                        user,
-                        process_instance.process_model_identifier,
-                        process_instance.id,
-                    )
-                )
-            for future in concurrent.futures.as_completed(futures):
-                spiff_task = future.result()
-
-            for spiff_task in engine_steps:
-                self.delegate.did_complete_task(spiff_task)
+        for spiff_task in engine_steps:
+            self.delegate.will_complete_task(spiff_task)
+        EngineStepExecutorService.run(
+            [functools.partial(self._run_spiff_task, spiff_task) for spiff_task in engine_steps],
+            current_app._get_current_object(),
+            before_each=functools.partial(
+                self._set_up_context_for_task, user, process_instance.process_model_identifier, process_instance.id
+            ),
+        )
+        for spiff_task in engine_steps:
+            self.delegate.did_complete_task(spiff_task)
 
     def _run_engine_steps_without_threads(
         self, engine_steps: list[SpiffTask], process_instance: ProcessInstanceModel, user: UserModel | None
@@ -274,6 +285,7 @@ class TaskModelSavingDelegate(EngineStepDelegate):
         secondary_engine_step_delegate: EngineStepDelegate | None = None,
         task_model_mapping: dict[str, TaskModel] | None = None,
         bpmn_subprocess_mapping: dict[str, BpmnProcessModel] | None = None,
+        task_data_fingerprints: dict[str, TaskDataFingerprint] | None = None,
     ) -> None:
         self.secondary_engine_step_delegate = secondary_engine_step_delegate
         self.process_instance = process_instance
@@ -293,6 +305,7 @@ class TaskModelSavingDelegate(EngineStepDelegate):
             run_started_at=time.time(),
             task_model_mapping=task_model_mapping,
             bpmn_subprocess_mapping=bpmn_subprocess_mapping,
+            task_data_fingerprints=task_data_fingerprints,
         )
 
     def will_complete_task(self, spiff_task: SpiffTask) -> None:
@@ -338,7 +351,9 @@ class TaskModelSavingDelegate(EngineStepDelegate):
         # ANOTHER NOTE: at one point we attempted to be smarter about what tasks we considered for persistence,
         # but it didn't quite work in all cases, so we deleted it. you can find it in commit
         # 1ead87b4b496525df8cc0e27836c3e987d593dc0 if you are curious.
-        for waiting_spiff_task in bpmn_process_instance.get_tasks(
+        #
+        # we still consider all of those tasks but only save the ones that differ from what is in the database.
+        spiff_tasks = bpmn_process_instance.get_tasks(
             state=TaskState.WAITING
             | TaskState.CANCELLED
             | TaskState.READY
@@ -347,8 +362,8 @@ class TaskModelSavingDelegate(EngineStepDelegate):
             | TaskState.FUTURE
             | TaskState.STARTED
             | TaskState.ERROR,
-        ):
-            self.task_service.update_task_model_with_spiff_task(waiting_spiff_task)
+        )
+        self.task_service.update_changed_task_models_with_spiff_tasks(spiff_tasks)
 
         self.task_service.save_objects_to_database()
 
@@ -428,6 +443,56 @@ class RunCurrentReadyTasksExecutionStrategy(ExecutionStrategy):
         return True
 
 
+class TimeSlicedExecutionStrategy(ExecutionStrategy):
+    """When you want to run tasks like greedy does but give up the worker after a budget of engine steps or seconds.
+
+    A process instance that stops because its slice ran out reports has_ready_tasks so it gets requeued behind the
+    other instances that are waiting, rather than keeping the worker until it is done.
+    With celery, instructions for end users are queued like queue_instructions_for_end_user does, without stopping for them.
+    """
+
+    def __init__(self, delegate: EngineStepDelegate, options: dict | None = None):
+        super().__init__(delegate, options)
+        self.max_steps: int = current_app.config["SPIFFWORKFLOW_BACKEND_ENGINE_STEP_TIME_SLICE_MAX_STEPS"]
+        self.max_seconds: int = current_app.config["SPIFFWORKFLOW_BACKEND_ENGINE_STEP_TIME_SLICE_MAX_SECONDS"]
+        self.queue_instructions_for_end_user: bool = current_app.config["SPIFFWORKFLOW_BACKEND_CELERY_ENABLED"]
+        self.tasks_that_have_been_seen: set[str] = set()
+        self.steps_run = 0
+        self.started_at_in_seconds = time.monotonic()
+        self.time_slice_used_up = False
+
+    def should_do_before(self, bpmn_process_instance: BpmnWorkflow, process_instance_model: ProcessInstanceModel) -> None:
+        if self.queue_instructions_for_end_user:
+            tasks = bpmn_process_instance.get_tasks(state=TaskState.WAITING | TaskState.READY)
+            JinjaService.add_instruction_for_end_user_if_appropriate(
+                tasks, process_instance_model.id, self.tasks_that_have_been_seen
+            )
+
+    def should_break_after(self, tasks: list[SpiffTask]) -> bool:
+        self.steps_run += len(tasks)
+        if self.max_steps > 0 and self.steps_run >= self.max_steps:
+            self.time_slice_used_up = True
+        elif self.max_seconds > 0 and time.monotonic() - self.started_at_in_seconds >= self.max_seconds:
+            self.time_slice_used_up = True
+        return self.time_slice_used_up
+
+    def spiff_run(
+        self, bpmn_process_instance: BpmnWorkflow, process_instance_model: ProcessInstanceModel, exit_at: None = None
+    ) -> TaskRunnability:
+        self.steps_run = 0
+        self.started_at_in_seconds = time.monotonic()
+        self.time_slice_used_up = False
+        task_runnability = super().spiff_run(bpmn_process_instance, process_instance_model, exit_at=exit_at)
+        if self.time_slice_used_up:
+            if len(self.get_ready_engine_steps(bpmn_process_instance)) > 0:
+                current_app.logger.info(
+                    f"Time slice used up for process instance {process_instance_model.id} after {self.steps_run} engine steps."
+                    " It will be requeued."
+                )
+                return TaskRunnability.has_ready_tasks
+        return task_runnability
+
+
 class SkipOneExecutionStrategy(ExecutionStrategy):
     """When you want to skip over the next task, rather than execute it."""
 
@@ -459,6 +524,7 @@ def execution_strategy_named(name: str, delegate: EngineStepDelegate) -> Executi
         "run_until_user_message": RunUntilUserTaskOrMessageExecutionStrategy,
         "run_current_ready_tasks": RunCurrentReadyTasksExecutionStrategy,
         "skip_one": SkipOneExecutionStrategy,
+        "time_sliced": TimeSlicedExecutionStrategy,
     }[name]
 
     return cls(delegate)
@@ -551,6 +617,8 @@ class WorkflowExecutionService:
 
         finally:
             if self.process_instance_model.persistence_level != "none":
+                # the lock may belong to something else now, in which case nothing from this run can be saved
+                ProcessInstanceLockService.raise_if_lease_lost(self.process_instance_model.id)
                 # even if a task fails, try to persist all tasks, which will include the error state.
                 self.execution_strategy.add_object_to_db_session(self.bpmn_process_instance)
                 if save:
@@ -584,6 +652,8 @@ class WorkflowExecutionService:
                         run_at_in_seconds=run_at_in_seconds,
                         queued_to_run_at_in_seconds=queued_to_run_at_in_seconds,
                     )
+                    if queued_to_run_at_in_seconds is None:
+                        BackgroundWakeupService.notify(BACKGROUND_WAKEUP_TOPIC_FUTURE_TASK, run_at_in_seconds)
 
     def process_bpmn_messages(self) -> None:
         # FIXE: get_events clears out the events so if we have other events we care about
@@ -604,6 +674,7 @@ class WorkflowExecutionService:
                 correlation_keys=self.bpmn_process_instance.correlations,
             )
             db.session.add(message_instance)
+            BackgroundWakeupService.notify(BACKGROUND_WAKEUP_TOPIC_MESSAGE)
 
             bpmn_process = self.process_instance_model.bpmn_process
             if bpmn_process is not None:
@@ -646,6 +717,7 @@ class WorkflowExecutionService:
                 )
                 db.session.add(message_correlation)
             db.session.add(message_instance)
+            BackgroundWakeupService.notify(BACKGROUND_WAKEUP_TOPIC_MESSAGE)
 
             bpmn_process = self.process_instance_model.bpmn_process
 
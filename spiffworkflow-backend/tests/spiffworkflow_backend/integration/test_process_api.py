@@ -16,12 +16,14 @@ from spiffworkflow_backend.exceptions.process_entity_not_found_error import Proc
 from spiffworkflow_backend.models.bpmn_process import BpmnProcessModel
 from spiffworkflow_backend.models.bpmn_process_definition import BpmnProcessDefinitionModel
 from spiffworkflow_backend.models.db import db
+from spiffworkflow_backend.models.json_data import JsonDataModel
 from spiffworkflow_backend.models.process_instance import ProcessInstanceModel
 from spiffworkflow_backend.models.process_instance import ProcessInstanceStatus
 from spiffworkflow_backend.models.process_instance_event import ProcessInstanceEventModel
 from spiffworkflow_backend.models.process_instance_event import ProcessInstanceEventType
 from spiffworkflow_backend.models.process_instance_file_data import ProcessInstanceFileDataModel
 from spiffworkflow_backend.models.process_instance_metadata import ProcessInstanceMetadataModel
+from spiffworkflow_backend.models.process_instance_queue import ProcessInstanceQueueModel
 from spiffworkflow_backend.models.process_instance_report import ProcessInstanceReportModel
 from spiffworkflow_backend.models.process_instance_report import ReportMetadata
 from spiffworkflow_backend.models.process_model import NotificationType
@@ -2055,6 +2057,28 @@ class TestProcessApi(BaseTest):
         assert response.json[0]["identifier"] == report_identifier
         assert response.json[0]["report_metadata"]["order_by"] == ["month"]
 
+    def test_process_instance_report_show_with_a_compressed_report_hash(
+        self,
+        app: Flask,
+        client: FlaskClient,
+        with_db_and_bpmn_file_cleanup: None,
+        with_super_admin_user: UserModel,
+    ) -> None:
+        report_metadata: ReportMetadata = {"order_by": ["month"], "filter_by": [], "columns": []}
+        with self.app_config_mock(app, "SPIFFWORKFLOW_BACKEND_JSON_DATA_CODEC", "zlib"):
+            with self.app_config_mock(app, "SPIFFWORKFLOW_BACKEND_JSON_DATA_COMPRESSION_MIN_BYTES", 0):
+                report_hash = JsonDataModel.create_and_insert_json_data_from_dict(dict(report_metadata))
+        db.session.commit()
+        assert JsonDataModel.query.filter_by(hash=report_hash).one().codec == "zlib"
+
+        response = client.get(
+            f"/v1.0/process-instances/report-metadata?report_hash={report_hash}",
+            headers=self.logged_in_headers(with_super_admin_user),
+        )
+        assert response.status_code == 200
+        assert response.json is not None
+        assert response.json["report_metadata"] == report_metadata
+
     def test_error_handler(
         self,
         app: Flask,
@@ -2466,6 +2490,37 @@ class TestProcessApi(BaseTest):
         process_instance = ProcessInstanceService().get_process_instance(process_instance_id)
         assert process_instance.status == "waiting"
 
+    def test_process_instance_priority_update(
+        self,
+        app: Flask,
+        client: FlaskClient,
+        with_db_and_bpmn_file_cleanup: None,
+        with_super_admin_user: UserModel,
+    ) -> None:
+        process_model = load_test_spec(
+            process_model_id="test_group/manual_task",
+            process_model_source_directory="manual_task",
+        )
+        process_instance = self.create_process_instance_from_process_model(process_model=process_model)
+        url = f"/v1.0/process-instance-priority/{process_model.modified_process_model_identifier()}/{process_instance.id}"
+        headers = self.logged_in_headers(with_super_admin_user)
+
+        response = client.post(url, headers=headers, content_type="application/json", data=json.dumps({"priority": 0}))
+        assert response.status_code == 200
+        queue_entry = ProcessInstanceQueueModel.query.filter_by(process_instance_id=process_instance.id).first()
+        assert queue_entry is not None
+        assert queue_entry.priority == 0
+
+        response = client.post(url, headers=headers, content_type="application/json", data=json.dumps({"priority": 10}))
+        assert response.status_code == 400
+
+        db.session.delete(queue_entry)
+        db.session.commit()
+        response = client.post(url, headers=headers, content_type="application/json", data=json.dumps({"priority": 1}))
+        assert response.status_code == 400
+        assert response.json is not None
+        assert response.json["error_code"] == "process_instance_not_enqueued"
+
     def test_script_unit_test_run(
         self,
         app: Flask,
@@ -3388,7 +3443,7 @@ class TestProcessApi(BaseTest):
             "http_status": 200,
             "operator_identifier": "http/GetRequestV2",
         }
-        with patch("requests.post") as mock_post:
+        with patch("requests.Session.post") as mock_post:
             mock_post.return_value.status_code = 200
             mock_post.return_value.ok = True
             mock_post.return_value.text = json.dumps(connector_response)
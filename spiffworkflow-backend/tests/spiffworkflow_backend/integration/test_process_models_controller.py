@@ -128,7 +128,7 @@ class TestProcessModelsController(BaseTest):
             "http_status": 200,
             "operator_identifier": "http/GetRequestV2",
         }
-        with patch("requests.post") as mock_post:
+        with patch("requests.Session.post") as mock_post:
             mock_post.return_value.status_code = 200
             mock_post.return_value.ok = True
             mock_post.return_value.text = json.dumps(connector_response)
@@ -108,6 +108,10 @@ class TestAuthorizationService(BaseTest):
                 ("/process-groups/some-process-group:some-process-model:*", "delete"),
                 ("/process-groups/some-process-group:some-process-model:*", "read"),
                 ("/process-groups/some-process-group:some-process-model:*", "update"),
+                (
+                    "/process-instance-priority/some-process-group:some-process-model:*",
+                    "create",
+                ),
                 (
                     "/process-instance-suspend/some-process-group:some-process-model:*",
                     "create",
@@ -192,6 +196,10 @@ class TestAuthorizationService(BaseTest):
                 ("/logs/typeahead-filter-values/some-process-group:some-process-model/*", "read"),
                 ("/message-models/some-process-group:some-process-model/*", "read"),
                 ("/process-data/some-process-group:some-process-model/*", "read"),
+                (
+                    "/process-instance-priority/some-process-group:some-process-model/*",
+                    "create",
+                ),
                 (
                     "/process-instance-suspend/some-process-group:some-process-model/*",
                     "create",
@@ -530,6 +538,7 @@ class TestAuthorizationService(BaseTest):
                 ("/messages/*", "create"),
                 ("/process-data-file-download/*", "read"),
                 ("/process-data/*", "read"),
+                ("/process-instance-priority/*", "create"),
                 ("/process-instance-reset/*", "create"),
                 ("/process-instance-resume/*", "create"),
                 ("/process-instance-suspend/*", "create"),
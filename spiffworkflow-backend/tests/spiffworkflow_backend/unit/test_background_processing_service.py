@@ -1,5 +1,7 @@
 import time
+from typing import Any
 
+import pytest
 from flask import Flask
 from pytest_mock.plugin import MockerFixture
 from spiffworkflow_backend.background_processing.background_processing_service import BackgroundProcessingService
@@ -10,8 +12,8 @@ from spiffworkflow_backend.models.process_instance import ProcessInstanceStatus
 from spiffworkflow_backend.models.process_instance_queue import ProcessInstanceQueueModel
 from spiffworkflow_backend.models.process_model import ProcessModelInfo
 from spiffworkflow_backend.services.process_instance_processor import ProcessInstanceProcessor
-from spiffworkflow_backend.services.process_instance_queue_service import ProcessInstanceQueueService
 from spiffworkflow_backend.services.process_instance_service import ProcessInstanceService
+from spiffworkflow_backend.services.workflow_execution_service import TaskRunnability
 
 from tests.spiffworkflow_backend.helpers.base_test import BaseTest
 from tests.spiffworkflow_backend.helpers.test_data import load_test_spec
@@ -84,16 +86,84 @@ class TestBackgroundProcessingService(BaseTest):
         )
         process_instance = self.create_process_instance_from_process_model(process_model=process_model, status="waiting")
         assert process_instance.status == ProcessInstanceStatus.waiting.value
+        # old enough to be picked up if it were not locked
+        ProcessInstanceQueueModel.query.filter_by(process_instance_id=process_instance.id).update(
+            {"locked_by": "test:test_waiting", "locked_at_in_seconds": round(time.time()), "updated_at_in_seconds": 0}
+        )
+        db.session.commit()
+
+        run_process_instance = mocker.spy(ProcessInstanceService, "run_process_instance_with_processor")
+        ProcessInstanceService.do_waiting(ProcessInstanceStatus.waiting.value)
+        assert run_process_instance.call_count == 0
+        assert process_instance.status == ProcessInstanceStatus.waiting.value
         queue_entry = ProcessInstanceQueueModel.query.filter_by(process_instance_id=process_instance.id).first()
         assert queue_entry is not None
-        queue_entry.locked_by = "test:test_waiting"
-        queue_entry.locked_at_seconds = round(time.time())
-        db.session.add(queue_entry)
+        assert queue_entry.locked_by == "test:test_waiting"
+
+    def test_do_waiting_only_claims_the_process_instance_it_is_running(
+        self,
+        app: Flask,
+        mocker: MockerFixture,
+        with_db_and_bpmn_file_cleanup: None,
+    ) -> None:
+        process_model = load_test_spec(
+            process_model_id="test_group/model_with_lanes",
+            bpmn_file_name="lanes.bpmn",
+            process_model_source_directory="model_with_lanes",
+        )
+        process_instances = [
+            self.create_process_instance_from_process_model(process_model=process_model, status="waiting") for _ in range(3)
+        ]
+        ProcessInstanceQueueModel.query.update({"updated_at_in_seconds": 0})
         db.session.commit()
 
-        mocker.patch.object(ProcessInstanceQueueService, "peek_many", return_value=[process_instance.id])
+        locked_process_instance_ids_while_running: list[set[int]] = []
+
+        def run_process_instance(process_instance: ProcessInstanceModel, **_kwargs: Any) -> tuple[None, TaskRunnability]:
+            locked_process_instance_ids_while_running.append(
+                {
+                    queue_entry.process_instance_id
+                    for queue_entry in ProcessInstanceQueueModel.query.filter(
+                        ProcessInstanceQueueModel.locked_by != None  # noqa: E711
+                    ).all()
+                }
+            )
+            return (None, TaskRunnability.unknown_if_ready_tasks)
+
+        mocker.patch.object(ProcessInstanceService, "run_process_instance_with_processor", side_effect=run_process_instance)
+        with self.app_config_mock(app, "SPIFFWORKFLOW_BACKEND_BACKGROUND_SCHEDULER_CLAIM_BATCH_SIZE", 2):
+            ProcessInstanceService.do_waiting(ProcessInstanceStatus.waiting.value)
+        # the others are left for other pollers while each one runs, and the rest wait for the next poll
+        assert len(locked_process_instance_ids_while_running) == 2
+        assert all(len(locked_ids) == 1 for locked_ids in locked_process_instance_ids_while_running)
+        assert len(set.union(*locked_process_instance_ids_while_running)) == 2
+
         ProcessInstanceService.do_waiting(ProcessInstanceStatus.waiting.value)
-        assert process_instance.status == ProcessInstanceStatus.waiting.value
+        assert set.union(*locked_process_instance_ids_while_running) == {pi.id for pi in process_instances}
+
+    def test_do_process_future_tasks_only_queues_each_future_task_once(
+        self,
+        app: Flask,
+        mocker: MockerFixture,
+        with_db_and_bpmn_file_cleanup: None,
+    ) -> None:
+        with self.app_config_mock(app, "SPIFFWORKFLOW_BACKEND_CELERY_ENABLED", True):
+            mock = mocker.patch("celery.current_app.send_task")
+            self._load_up_a_future_task_and_return_instance()
+            BackgroundProcessingService.do_process_future_tasks(99999999999999999)
+            BackgroundProcessingService.do_process_future_tasks(99999999999999999)
+            assert mock.call_count == 1
+            future_task = FutureTaskModel.query.first()
+            assert future_task is not None
+            assert future_task.queued_to_run_at_in_seconds == future_task.run_at_in_seconds
+
+            # a future task that could not be queued is left for the next poll
+            mock.side_effect = Exception("broker is down")
+            FutureTaskModel.query.update({"queued_to_run_at_in_seconds": None})
+            db.session.commit()
+            with pytest.raises(Exception, match="broker is down"):
+                BackgroundProcessingService.do_process_future_tasks(99999999999999999)
+            assert len(BackgroundProcessingService.imminent_future_tasks(99999999999999999)) == 1
 
     def test_does_not_queue_future_tasks_if_requested(
         self,
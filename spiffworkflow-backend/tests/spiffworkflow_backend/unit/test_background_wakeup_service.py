@@ -0,0 +1,129 @@
+import threading
+import time
+from datetime import datetime
+from datetime import timezone
+
+from apscheduler.schedulers.background import BackgroundScheduler  # type: ignore
+from flask import Flask
+from spiffworkflow_backend.background_processing.apscheduler import BackgroundJobWaker
+from spiffworkflow_backend.models.db import db
+from spiffworkflow_backend.models.process_instance_queue import ProcessInstanceQueueModel
+from spiffworkflow_backend.services.background_wakeup_service import BACKGROUND_WAKEUP_TOPIC_FUTURE_TASK
+from spiffworkflow_backend.services.background_wakeup_service import BACKGROUND_WAKEUP_TOPIC_MESSAGE
+from spiffworkflow_backend.services.background_wakeup_service import BackgroundWakeupService
+
+from tests.spiffworkflow_backend.helpers.base_test import BaseTest
+from tests.spiffworkflow_backend.helpers.test_data import load_test_spec
+
+
+class TestBackgroundWakeupService(BaseTest):
+    def test_wakeups_are_published_when_their_transaction_commits(
+        self,
+        app: Flask,
+        with_db_and_bpmn_file_cleanup: None,
+    ) -> None:
+        BackgroundWakeupService.wait_for_local_payloads(0)
+        BackgroundWakeupService.notify(BACKGROUND_WAKEUP_TOPIC_MESSAGE, 100)
+        assert BackgroundWakeupService.wait_for_local_payloads(0) == []
+        db.session.rollback()
+        db.session.commit()
+        assert BackgroundWakeupService.wait_for_local_payloads(0) == []
+
+        BackgroundWakeupService.notify(BACKGROUND_WAKEUP_TOPIC_MESSAGE, 100)
+        BackgroundWakeupService.notify(BACKGROUND_WAKEUP_TOPIC_MESSAGE, 100)
+        db.session.commit()
+        assert BackgroundWakeupService.wait_for_local_payloads(0) == ["message:100"]
+
+        process_model = load_test_spec(
+            process_model_id="test_group/model_with_lanes",
+            bpmn_file_name="lanes.bpmn",
+            process_model_source_directory="model_with_lanes",
+        )
+        process_instance = self.create_process_instance_from_process_model(process_model=process_model)
+        queue_entry = ProcessInstanceQueueModel.query.filter_by(process_instance_id=process_instance.id).first()
+        assert queue_entry is not None
+        assert f"not_started:{queue_entry.run_at_in_seconds}" in BackgroundWakeupService.wait_for_local_payloads(0)
+
+        with self.app_config_mock(app, "SPIFFWORKFLOW_BACKEND_BACKGROUND_SCHEDULER_WAKEUPS_ENABLED", False):
+            BackgroundWakeupService.notify(BACKGROUND_WAKEUP_TOPIC_MESSAGE, 100)
+            db.session.commit()
+        assert BackgroundWakeupService.wait_for_local_payloads(0) == []
+
+    def test_only_sends_wakeups_the_scheduler_listens_for(
+        self,
+        app: Flask,
+        with_db_and_bpmn_file_cleanup: None,
+    ) -> None:
+        BackgroundWakeupService.wait_for_local_payloads(0)
+        # nothing runs process instances because they finished
+        BackgroundWakeupService.notify("complete", 100)
+        BackgroundWakeupService.notify("waiting", 100)
+        BackgroundWakeupService.notify(BACKGROUND_WAKEUP_TOPIC_FUTURE_TASK, 100)
+        db.session.commit()
+        assert BackgroundWakeupService.wait_for_local_payloads(0) == ["waiting:100"]
+
+        # celery workers run waiting process instances and the scheduler queues future tasks for them instead
+        with self.app_config_mock(app, "SPIFFWORKFLOW_BACKEND_CELERY_ENABLED", True):
+            BackgroundWakeupService.notify("waiting", 100)
+            BackgroundWakeupService.notify(BACKGROUND_WAKEUP_TOPIC_FUTURE_TASK, 100)
+            db.session.commit()
+        assert BackgroundWakeupService.wait_for_local_payloads(0) == ["future_task:100"]
+
+    def test_listener_calls_back_for_each_wakeup(
+        self,
+        app: Flask,
+        with_db_and_bpmn_file_cleanup: None,
+    ) -> None:
+        BackgroundWakeupService.wait_for_local_payloads(0)
+        wakeups: list[tuple[str, int]] = []
+        received = threading.Event()
+
+        def on_wakeup(topic: str, not_before_in_seconds: int) -> None:
+            wakeups.append((topic, not_before_in_seconds))
+            received.set()
+
+        stop_event = threading.Event()
+        listener = threading.Thread(target=BackgroundWakeupService.listen, args=(app, on_wakeup, stop_event))
+        listener.start()
+        try:
+            BackgroundWakeupService.notify(BACKGROUND_WAKEUP_TOPIC_MESSAGE, 100)
+            db.session.commit()
+            assert received.wait(5)
+            assert wakeups == [("message", 100)]
+        finally:
+            stop_event.set()
+            listener.join()
+
+    def test_job_waker_moves_up_the_next_run_of_jobs(
+        self,
+        app: Flask,
+    ) -> None:
+        scheduler = BackgroundScheduler()
+        waker = BackgroundJobWaker(scheduler)
+        run_count = 0
+
+        def poll() -> None:
+            nonlocal run_count
+            run_count += 1
+            # this came in after the job looked for work so it has to run again
+            waker.wake("waiting", round(time.time()) - 60)
+
+        scheduler.add_job(waker.wakeable("poll", poll), "interval", seconds=3600, id="poll")
+        waker.add_job("waiting", "poll", delay_in_seconds=60)
+        scheduler.start(paused=True)
+        try:
+            polling_run_time = scheduler.get_job("poll").next_run_time
+            waker.wake("other_topic", round(time.time()))
+            assert scheduler.get_job("poll").next_run_time == polling_run_time
+
+            now = round(time.time())
+            waker.wake("waiting", now + 100)
+            waker.wake("waiting", now)
+            assert scheduler.get_job("poll").next_run_time == datetime.fromtimestamp(now + 60, timezone.utc)
+
+            # a wakeup during a run of the job is not lost
+            scheduler.get_job("poll").func()
+            assert run_count == 1
+            assert scheduler.get_job("poll").next_run_time < datetime.fromtimestamp(now + 60, timezone.utc)
+        finally:
+            scheduler.shutdown(wait=False)
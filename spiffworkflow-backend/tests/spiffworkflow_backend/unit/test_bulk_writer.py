@@ -0,0 +1,129 @@
+from uuid import uuid4
+
+from flask import Flask
+from pytest_mock.plugin import MockerFixture
+from spiffworkflow_backend.helpers.bulk_writer import BulkWriter
+from spiffworkflow_backend.helpers.query_counter import count_queries
+from spiffworkflow_backend.models.bpmn_process import BpmnProcessModel
+from spiffworkflow_backend.models.db import db
+from spiffworkflow_backend.models.process_instance import ProcessInstanceModel
+from spiffworkflow_backend.models.process_instance_event import ProcessInstanceEventModel
+from spiffworkflow_backend.models.process_instance_metadata import ProcessInstanceMetadataModel
+from spiffworkflow_backend.models.task import TaskModel
+from spiffworkflow_backend.services.process_instance_processor import ProcessInstanceProcessor
+from sqlalchemy.dialects import mysql
+
+from tests.spiffworkflow_backend.helpers.base_test import BaseTest
+from tests.spiffworkflow_backend.helpers.test_data import load_test_spec
+
+
+class TestBulkWriter(BaseTest):
+    def test_can_insert_and_update_models_in_one_statement(
+        self,
+        app: Flask,
+        with_db_and_bpmn_file_cleanup: None,
+    ) -> None:
+        process_instance = self._run_simple_script_process_instance()
+        task_models = TaskModel.query.filter_by(process_instance_id=process_instance.id).all()
+        existing_task_model = task_models[0]
+        existing_task_model.state = "ERROR"
+        new_task_model = TaskModel(
+            guid=str(uuid4()),
+            bpmn_process_id=existing_task_model.bpmn_process_id,
+            process_instance_id=process_instance.id,
+            task_definition_id=existing_task_model.task_definition_id,
+            state="READY",
+            properties_json={"state": 16},
+            json_data_hash=existing_task_model.json_data_hash,
+            python_env_data_hash=existing_task_model.python_env_data_hash,
+        )
+
+        with count_queries() as query_counter:
+            BulkWriter.upsert_models([existing_task_model, new_task_model], conflict_column_names=["guid"])
+            # the session should not write the change to the existing task again
+            db.session.flush()
+        assert query_counter.count == 1
+
+        db.session.commit()
+        db.session.expire_all()
+        assert TaskModel.query.filter_by(guid=existing_task_model.guid).first().state == "ERROR"
+        assert TaskModel.query.filter_by(guid=new_task_model.guid).first().properties_json == {"state": 16}
+        assert TaskModel.query.filter_by(process_instance_id=process_instance.id).count() == len(task_models) + 1
+
+    def test_splits_rows_into_statements_by_size(
+        self,
+        app: Flask,
+        with_db_and_bpmn_file_cleanup: None,
+    ) -> None:
+        process_instance = self._run_simple_script_process_instance()
+        rows = [
+            {
+                "process_instance_id": process_instance.id,
+                "key": f"key_{index}",
+                "value": "x" * 150,
+                "created_at_in_seconds": index,
+                "updated_at_in_seconds": index,
+            }
+            for index in range(10)
+        ]
+
+        with self.app_config_mock(app, "SPIFFWORKFLOW_BACKEND_BULK_WRITE_MAX_BYTES", 500):
+            with count_queries() as query_counter:
+                BulkWriter.upsert(
+                    ProcessInstanceMetadataModel.__table__, rows, conflict_column_names=["process_instance_id", "key"]
+                )
+            assert query_counter.count == 5
+
+            # rows that exist already are updated
+            with count_queries() as query_counter:
+                BulkWriter.upsert(
+                    ProcessInstanceMetadataModel.__table__,
+                    [{**row, "value": "y" * 150} for row in rows[:4]],
+                    conflict_column_names=["process_instance_id", "key"],
+                )
+            assert query_counter.count == 2
+
+        db.session.commit()
+        metadata = ProcessInstanceMetadataModel.query.filter_by(process_instance_id=process_instance.id).all()
+        assert sorted(m.value[0] for m in metadata) == ["x"] * 6 + ["y"] * 4
+
+    def test_only_updates_rows_that_match_the_conflict_columns_with_mysql(
+        self,
+        app: Flask,
+        mocker: MockerFixture,
+    ) -> None:
+        mocker.patch("spiffworkflow_backend.helpers.bulk_writer.dialect_name", return_value="mysql")
+        statement = BulkWriter._insert_statement(BpmnProcessModel.__table__, ["guid", "properties_json"], ["id"])
+        sql = str(statement.compile(dialect=mysql.dialect()))  # type: ignore
+        # guid is another unique key so a row that matches on it alone must not update a different process
+        assert "guid = CASE WHEN (bpmn_process.id = VALUES(id)) THEN VALUES(guid) ELSE bpmn_process.guid END" in sql
+        assert "properties_json = CASE WHEN (bpmn_process.id = VALUES(id)) THEN VALUES(properties_json)" in sql
+
+    def test_inserts_new_models_without_ids(
+        self,
+        app: Flask,
+        with_db_and_bpmn_file_cleanup: None,
+    ) -> None:
+        process_instance = self._run_simple_script_process_instance()
+        event_count = ProcessInstanceEventModel.query.count()
+        events = [
+            ProcessInstanceEventModel(
+                process_instance_id=process_instance.id, event_type="task_completed", task_guid=str(uuid4()), timestamp=index
+            )
+            for index in range(3)
+        ]
+        with count_queries() as query_counter:
+            BulkWriter.insert_models(events)
+        assert query_counter.count == 1
+        db.session.commit()
+        assert ProcessInstanceEventModel.query.count() == event_count + 3
+
+    def _run_simple_script_process_instance(self) -> ProcessInstanceModel:
+        process_model = load_test_spec(
+            process_model_id="test_group/simple_script",
+            process_model_source_directory="simple_script",
+        )
+        process_instance = self.create_process_instance_from_process_model(process_model=process_model)
+        processor = ProcessInstanceProcessor(process_instance)
+        processor.do_engine_steps(save=True, execution_strategy_name="greedy")
+        return process_instance
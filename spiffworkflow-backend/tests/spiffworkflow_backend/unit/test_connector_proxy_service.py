@@ -0,0 +1,203 @@
+import json
+import threading
+from collections.abc import Callable
+from collections.abc import Generator
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+from typing import Any
+from unittest.mock import patch
+
+from flask import Flask
+from prometheus_client import REGISTRY
+from SpiffWorkflow.task import Task as SpiffTask  # type: ignore
+from spiffworkflow_backend.services.connector_proxy_service import ConnectorProxyService
+from spiffworkflow_backend.services.process_instance_processor import ProcessInstanceProcessor
+from spiffworkflow_backend.services.service_task_service import CustomServiceTask
+from spiffworkflow_backend.services.service_task_service import ServiceTaskDelegate
+
+from tests.spiffworkflow_backend.helpers.base_test import BaseTest
+from tests.spiffworkflow_backend.helpers.test_data import load_test_spec
+
+# a path the proxy was called with and the port the call came from
+ConnectorProxyCall = tuple[str, int]
+
+
+class TestConnectorProxyService(BaseTest):
+    def test_reuses_connections_to_the_connector_proxy(
+        self,
+        app: Flask,
+    ) -> None:
+        ConnectorProxyService.reset()
+        call_count_before = self._call_count("test/operator")
+        with self._connector_proxy() as (url, calls):
+            for _ in range(3):
+                response = ConnectorProxyService.post("test/operator", f"{url}/v1/do/test/operator", {"a": 1})
+                assert response.json() == {"received": {"a": 1}}
+        assert len(calls) == 3
+        assert len({client_port for _, client_port in calls}) == 1
+        assert self._call_count("test/operator") == call_count_before + 3
+
+    def test_configures_the_pool_and_retries(
+        self,
+        app: Flask,
+    ) -> None:
+        ConnectorProxyService.reset()
+        with self.app_config_mock(app, "SPIFFWORKFLOW_BACKEND_CONNECTOR_PROXY_POOL_SIZE", 7):
+            with self.app_config_mock(app, "SPIFFWORKFLOW_BACKEND_CONNECTOR_PROXY_RETRY_STATUS_CODES", "502, 503"):
+                session = ConnectorProxyService.session()
+        assert ConnectorProxyService.session() is session
+        adapter = session.get_adapter("http://localhost")
+        assert adapter._pool_maxsize == 7  # type: ignore
+        assert adapter.max_retries.connect == 2  # type: ignore
+        assert adapter.max_retries.read == 0  # type: ignore
+        assert adapter.max_retries.status_forcelist == [502, 503]  # type: ignore
+        ConnectorProxyService.reset()
+
+    def test_sends_ready_service_tasks_in_one_batch(
+        self,
+        app: Flask,
+        with_db_and_bpmn_file_cleanup: None,
+    ) -> None:
+        with self._connector_proxy(self._respond_to_batch) as (url, calls):
+            self._run_parallel_service_tasks(app, url)
+        assert [path for path, _ in calls] == ["/v1/do-batch"]
+
+    def test_evaluates_the_params_of_batched_service_tasks_once(
+        self,
+        app: Flask,
+        with_db_and_bpmn_file_cleanup: None,
+    ) -> None:
+        with patch.object(
+            CustomServiceTask, "evaluated_params", autospec=True, side_effect=CustomServiceTask.evaluated_params
+        ) as mock_evaluated_params:
+            with self._connector_proxy(self._respond_to_batch) as (url, calls):
+                self._run_parallel_service_tasks(app, url)
+        assert [path for path, _ in calls] == ["/v1/do-batch"]
+        assert mock_evaluated_params.call_count == 3
+
+    def test_evaluates_the_params_again_if_the_task_data_changed_in_place(
+        self,
+        app: Flask,
+        with_db_and_bpmn_file_cleanup: None,
+    ) -> None:
+        prefetch_connector_responses = ServiceTaskDelegate.prefetch_connector_responses
+
+        def prefetch_and_change_task_data(spiff_tasks: list[SpiffTask]) -> None:
+            spiff_tasks[0].data["items"] = [1]
+            prefetch_connector_responses(spiff_tasks)
+            spiff_tasks[0].data["items"].append(2)
+
+        with patch.object(
+            CustomServiceTask, "evaluated_params", autospec=True, side_effect=CustomServiceTask.evaluated_params
+        ) as mock_evaluated_params:
+            with patch.object(ServiceTaskDelegate, "prefetch_connector_responses", side_effect=prefetch_and_change_task_data):
+                with self._connector_proxy(self._respond_to_batch) as (url, calls):
+                    self._run_parallel_service_tasks(app, url)
+        # the params still match the prefetched ones so the task uses the prefetched response
+        assert [path for path, _ in calls] == ["/v1/do-batch"]
+        assert mock_evaluated_params.call_count == 4
+
+    def test_only_sends_operators_that_are_safe_to_call_again_in_batches(
+        self,
+        app: Flask,
+        with_db_and_bpmn_file_cleanup: None,
+    ) -> None:
+        with self._connector_proxy(lambda path, body: (200, self._connector_response(body))) as (url, calls):
+            self._run_parallel_service_tasks(app, url, batch_operators="http/PostRequestV2")
+        assert [path for path, _ in calls] == ["/v1/do/http/GetRequestV2"] * 3
+
+    def test_sends_service_tasks_one_by_one_if_the_proxy_cannot_batch(
+        self,
+        app: Flask,
+        with_db_and_bpmn_file_cleanup: None,
+    ) -> None:
+        def respond(path: str, body: dict) -> tuple[int, Any]:
+            if path == "/v1/do-batch":
+                return (404, {"error": "not found"})
+            return (200, self._connector_response(body))
+
+        with self._connector_proxy(respond) as (url, calls):
+            self._run_parallel_service_tasks(app, url)
+        paths = [path for path, _ in calls]
+        assert paths == ["/v1/do-batch"] + ["/v1/do/http/GetRequestV2"] * 3
+
+    def _run_parallel_service_tasks(
+        self, app: Flask, connector_proxy_url: str, batch_operators: str = "http/GetRequestV2"
+    ) -> None:
+        process_model = load_test_spec(
+            process_model_id="test_group/parallel_service_tasks",
+            process_model_source_directory="parallel_service_tasks",
+        )
+        process_instance = self.create_process_instance_from_process_model(process_model=process_model)
+        processor = ProcessInstanceProcessor(process_instance)
+        with self.app_config_mock(app, "SPIFFWORKFLOW_BACKEND_CONNECTOR_PROXY_URL", connector_proxy_url):
+            with self.app_config_mock(app, "SPIFFWORKFLOW_BACKEND_CONNECTOR_PROXY_USE_BATCH", True):
+                with self.app_config_mock(app, "SPIFFWORKFLOW_BACKEND_CONNECTOR_PROXY_BATCH_OPERATORS", batch_operators):
+                    processor.do_engine_steps(save=True)
+        assert process_instance.status == "complete"
+
+        # each task gets the response for its own params
+        data = processor.get_data()
+        for name in ["one", "two", "three"]:
+            assert json.loads(data[f"response_{name}"]["body"])["url"] == f"https://example.com/{name}"
+
+    def _respond_to_batch(self, path: str, body: dict) -> tuple[int, Any]:
+        if path != "/v1/do-batch":
+            return (500, {"error": "expected a batch"})
+        return (
+            200,
+            {
+                "responses": [
+                    {"status_code": 200, "body": json.dumps(self._connector_response(command["params"]))}
+                    for command in body["commands"]
+                ]
+            },
+        )
+
+    def _connector_response(self, params: dict) -> dict:
+        return {
+            "command_response": {"body": json.dumps({"url": params["url"]}), "mimetype": "application/json"},
+            "error": None,
+            "command_response_version": 2,
+        }
+
+    def _call_count(self, operator_identifier: str) -> float:
+        sample_value = REGISTRY.get_sample_value(
+            "spiffworkflow_connector_proxy_call_seconds_count", {"operator_identifier": operator_identifier}
+        )
+        return sample_value or 0
+
+    @contextmanager
+    def _connector_proxy(
+        self, respond: Callable[[str, dict], tuple[int, Any]] | None = None
+    ) -> Generator[tuple[str, list[ConnectorProxyCall]], None, None]:
+        calls: list[ConnectorProxyCall] = []
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self) -> None:  # noqa: N802
+                calls.append((self.path, self.client_address[1]))
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                (status_code, response) = respond(self.path, body) if respond else (200, {"received": body})
+                response_body = json.dumps(response).encode()
+                self.send_response(status_code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(response_body)))
+                self.end_headers()
+                self.wfile.write(response_body)
+
+            def log_message(self, *args: object) -> None:
+                pass
+
+        ConnectorProxyService.reset()
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            yield (f"http://127.0.0.1:{server.server_address[1]}", calls)
+        finally:
+            ConnectorProxyService.reset()
+            server.shutdown()
+            server.server_close()
@@ -0,0 +1,141 @@
+import json
+from typing import Any
+
+from flask import Flask
+from prometheus_client import REGISTRY
+from pytest_mock.plugin import MockerFixture
+from spiffworkflow_backend.models.process_model import ProcessModelInfo
+from spiffworkflow_backend.services.connector_proxy_service import ConnectorProxyService
+from spiffworkflow_backend.services.connector_response_cache_service import ConnectorResponseCacheService
+from spiffworkflow_backend.services.process_instance_processor import ProcessInstanceProcessor
+from spiffworkflow_backend.services.process_model_service import ProcessModelService
+
+from tests.spiffworkflow_backend.helpers.base_test import BaseTest
+from tests.spiffworkflow_backend.helpers.test_data import load_test_spec
+
+
+class FakeConnectorProxyResponse:
+    def __init__(self, status_code: int, body: Any) -> None:
+        self.status_code = status_code
+        self.text = json.dumps(body)
+
+
+class TestConnectorResponseCacheService(BaseTest):
+    def test_reuses_responses_of_operators_configured_in_the_process_model(
+        self,
+        app: Flask,
+        mocker: MockerFixture,
+        with_db_and_bpmn_file_cleanup: None,
+    ) -> None:
+        ConnectorResponseCacheService.cache().clear()
+        process_model = self._process_model_with_cache({"http/GetRequestV2": {"ttl_seconds": 300}})
+        post = mocker.patch.object(ConnectorProxyService, "post", side_effect=self._respond)
+        hits_before = self._sample_value("spiffworkflow_connector_response_cache_hits_total")
+
+        self._run_process_instance(process_model)
+        assert post.call_count == 3
+        self._run_process_instance(process_model)
+        assert post.call_count == 3
+        assert self._sample_value("spiffworkflow_connector_response_cache_hits_total") == hits_before + 3
+
+        # entries that outlived their ttl are fetched again
+        mocker.patch("spiffworkflow_backend.services.connector_response_cache_service.time.monotonic", return_value=10**12)
+        self._run_process_instance(process_model)
+        assert post.call_count == 6
+
+    def test_does_not_cache_operators_that_did_not_opt_in_or_errors(
+        self,
+        app: Flask,
+        mocker: MockerFixture,
+        with_db_and_bpmn_file_cleanup: None,
+    ) -> None:
+        ConnectorResponseCacheService.cache().clear()
+        process_model = self._process_model_with_cache({"http/PostRequestV2": {"ttl_seconds": 300}})
+        post = mocker.patch.object(ConnectorProxyService, "post", side_effect=self._respond)
+        self._run_process_instance(process_model)
+        self._run_process_instance(process_model)
+        assert post.call_count == 6
+        assert len(ConnectorResponseCacheService.cache()) == 0
+
+        ProcessModelService.update_process_model(
+            process_model, {"connector_response_cache": {"http/GetRequestV2": {"ttl_seconds": 300}}}
+        )
+        mocker.patch.object(
+            ConnectorProxyService,
+            "post",
+            return_value=FakeConnectorProxyResponse(200, {"error": {"error_code": "Unavailable", "message": "try later"}}),
+        )
+        mocker.patch("spiffworkflow_backend.services.service_task_service.ServiceTaskDelegate.catch_error_codes")
+        self._run_process_instance(process_model, check_responses=False)
+        assert len(ConnectorResponseCacheService.cache()) == 0
+
+    def test_reads_include_task_data_from_the_process_model_as_a_string_or_a_boolean(
+        self,
+        app: Flask,
+        mocker: MockerFixture,
+    ) -> None:
+        app.config["THREAD_LOCAL_DATA"].process_model_identifier = "test_group/cached_connector"
+        spiff_task = mocker.Mock(task_spec=mocker.Mock(extensions={}))
+        for include_task_data, expected in [("false", False), ("True", True), (False, False), (True, True)]:
+            mocker.patch.object(
+                ProcessModelService,
+                "get_connector_response_cache_config",
+                return_value={"http/GetRequestV2": {"ttl_seconds": 300, "include_task_data": include_task_data}},
+            )
+            config = ConnectorResponseCacheService.config_for_task("http/GetRequestV2", spiff_task)
+            assert config == {"ttl_seconds": 300, "include_task_data": expected}
+        app.config["THREAD_LOCAL_DATA"].process_model_identifier = None
+
+    def test_keys_leave_out_secrets_and_task_data_unless_configured(
+        self,
+        app: Flask,
+        mocker: MockerFixture,
+    ) -> None:
+        spiff_task = mocker.Mock(data={"a": 1})
+        bpmn_params = {"url": {"value": "https://example.com"}, "token": {"value": "secret:api_token"}}
+        config = {"ttl_seconds": 300, "include_task_data": False}
+        key = ConnectorResponseCacheService.cache_key("http/GetRequestV2", bpmn_params, spiff_task, config)  # type: ignore
+        assert "api_token" not in key
+        # params are normalized so their order does not matter
+        reordered_bpmn_params = dict(reversed(list(bpmn_params.items())))
+        assert ConnectorResponseCacheService.cache_key("http/GetRequestV2", reordered_bpmn_params, spiff_task, config) == key  # type: ignore
+
+        spiff_task.data = {"a": 2}
+        assert ConnectorResponseCacheService.cache_key("http/GetRequestV2", bpmn_params, spiff_task, config) == key  # type: ignore
+        config["include_task_data"] = True
+        key_with_task_data = ConnectorResponseCacheService.cache_key("http/GetRequestV2", bpmn_params, spiff_task, config)  # type: ignore
+        assert key_with_task_data != key
+        spiff_task.data = {"a": 1}
+        assert ConnectorResponseCacheService.cache_key("http/GetRequestV2", bpmn_params, spiff_task, config) != key_with_task_data  # type: ignore
+
+    def _process_model_with_cache(self, connector_response_cache: dict) -> ProcessModelInfo:
+        process_model = load_test_spec(
+            process_model_id="test_group/parallel_service_tasks",
+            process_model_source_directory="parallel_service_tasks",
+        )
+        ProcessModelService.update_process_model(process_model, {"connector_response_cache": connector_response_cache})
+        return process_model
+
+    def _run_process_instance(self, process_model: ProcessModelInfo, check_responses: bool = True) -> None:
+        process_instance = self.create_process_instance_from_process_model(process_model=process_model)
+        processor = ProcessInstanceProcessor(process_instance)
+        processor.do_engine_steps(save=True)
+        assert process_instance.status == "complete"
+        if not check_responses:
+            return
+        data = processor.get_data()
+        for name in ["one", "two", "three"]:
+            assert json.loads(data[f"response_{name}"]["body"])["url"] == f"https://example.com/{name}"
+
+    def _respond(self, operator_identifier: str, url: str, json_data: dict) -> FakeConnectorProxyResponse:
+        return FakeConnectorProxyResponse(
+            200,
+            {
+                "command_response": {"body": json.dumps({"url": json_data["url"]}), "mimetype": "application/json"},
+                "error": None,
+                "command_response_version": 2,
+            },
+        )
+
+    def _sample_value(self, name: str) -> float:
+        return REGISTRY.get_sample_value(name, {"operator_identifier": "http/GetRequestV2"}) or 0
@@ -0,0 +1,72 @@
+import threading
+import time
+
+import pytest
+from flask import Flask
+from flask import g
+from spiffworkflow_backend.services.engine_step_executor_service import EngineStepExecutorService
+
+from tests.spiffworkflow_backend.helpers.base_test import BaseTest
+
+
+class TestEngineStepExecutorService(BaseTest):
+    def test_runs_functions_with_bounded_concurrency_per_call(
+        self,
+        app: Flask,
+    ) -> None:
+        lock = threading.Lock()
+        running = 0
+        max_running = 0
+
+        def step(index: int) -> int:
+            nonlocal running, max_running
+            with lock:
+                running += 1
+                max_running = max(max_running, running)
+            time.sleep(0.01)
+            with lock:
+                running -= 1
+            # g is set up by before_each and cleared between steps
+            assert g.user == "the_user"
+            assert "left_over" not in g
+            g.left_over = True
+            return index
+
+        def before_each() -> None:
+            g.user = "the_user"
+
+        with self.app_config_mock(app, "SPIFFWORKFLOW_BACKEND_ENGINE_STEP_MAX_WORKERS_PER_PROCESS_INSTANCE", 3):
+            results = EngineStepExecutorService.run(
+                [lambda index=index: step(index) for index in range(12)],  # type: ignore
+                app,
+                before_each=before_each,
+            )
+        assert results == list(range(12))
+        assert 1 < max_running <= 3
+        assert EngineStepExecutorService.metrics() == {"queued": 0, "active": 0}
+
+    def test_raises_the_exception_of_a_step_and_skips_the_steps_not_started(
+        self,
+        app: Flask,
+    ) -> None:
+        called = []
+
+        def step(index: int) -> None:
+            called.append(index)
+            if index == 0:
+                raise ValueError("step failed")
+
+        with self.app_config_mock(app, "SPIFFWORKFLOW_BACKEND_ENGINE_STEP_MAX_WORKERS_PER_PROCESS_INSTANCE", 1):
+            with pytest.raises(ValueError, match="step failed"):
+                EngineStepExecutorService.run([lambda index=index: step(index) for index in range(3)], app)  # type: ignore
+        assert called == [0]
+
+    def test_runs_steps_started_from_a_step_in_the_same_thread(
+        self,
+        app: Flask,
+    ) -> None:
+        def outer_step() -> list[str]:
+            return EngineStepExecutorService.run([lambda: threading.current_thread().name], app)
+
+        [inner_thread_names] = EngineStepExecutorService.run([outer_step], app)
+        assert inner_thread_names[0].startswith("engine-step")
@@ -1,4 +1,6 @@
+import pytest
 from flask import Flask
+from SpiffWorkflow.bpmn.exceptions import WorkflowTaskException  # type: ignore
 from spiffworkflow_backend.models.task import TaskModel  # noqa: F401
 from spiffworkflow_backend.services.jinja_service import JinjaService
 from spiffworkflow_backend.services.process_instance_processor import ProcessInstanceProcessor
@@ -60,3 +62,34 @@ class TestJinjaService(BaseTest):
                 r"* From ScriptTask: Sanitized \| from \| script \| task",
             ]
         )
+
+    def test_reuses_compiled_templates_and_reports_error_lines(self, app: Flask, with_db_and_bpmn_file_cleanup: None) -> None:
+        process_model = load_test_spec(
+            process_model_id="test_group/manual-task-with-sanitized-markdown",
+            process_model_source_directory="manual-task-with-sanitized-markdown",
+        )
+        process_instance = self.create_process_instance_from_process_model(process_model=process_model)
+        processor = ProcessInstanceProcessor(process_instance)
+        processor.do_engine_steps(save=True)
+        spiff_task = processor.get_all_ready_or_waiting_tasks()[0]
+
+        template_cache = JinjaService.template_cache()
+        template_cache.clear()
+        template = "Hello {{ name }}\n{{ 1 / count }}"
+        for name in ["one", "two"]:
+            assert JinjaService.render_jinja_template("Hello {{ name | sanitize_for_md }}", task_data={"name": name}) == (
+                f"Hello {name}"
+            )
+        assert (template_cache.misses, template_cache.hits) == (1, 1)
+
+        # errors from templates that were already compiled still point at the line they happened on
+        for _ in range(2):
+            with pytest.raises(WorkflowTaskException) as exception:
+                JinjaService.render_jinja_template(template, spiff_task, task_data={"name": "one", "count": 0})
+            assert exception.value.line_number == 2
+            assert exception.value.error_line == "{{ 1 / count }}"
+
+        with pytest.raises(WorkflowTaskException) as exception:
+            JinjaService.render_jinja_template("{{ name }\n", spiff_task, task_data={"name": "one"})
+        assert exception.value.line_number == 1
+        assert len(template_cache) == 2
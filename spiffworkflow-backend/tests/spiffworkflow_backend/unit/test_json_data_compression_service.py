@@ -0,0 +1,131 @@
+import json
+from hashlib import sha256
+
+from flask import Flask
+from SpiffWorkflow.util.task import TaskState  # type: ignore
+from spiffworkflow_backend.data_migrations.json_data_compression_migrator import JsonDataCompressionMigrator
+from spiffworkflow_backend.helpers.query_counter import count_queries
+from spiffworkflow_backend.models.db import db
+from spiffworkflow_backend.models.json_data import JSON_DATA_NOT_COMPRESSED
+from spiffworkflow_backend.models.json_data import JsonDataModel
+from spiffworkflow_backend.models.process_model import ProcessModelInfo
+from spiffworkflow_backend.services.json_data_compression_service import JsonDataCompressionService
+from spiffworkflow_backend.services.process_instance_processor import ProcessInstanceProcessor
+
+from tests.spiffworkflow_backend.helpers.base_test import BaseTest
+from tests.spiffworkflow_backend.helpers.test_data import load_test_spec
+
+
+class TestJsonDataCompressionService(BaseTest):
+    def test_compresses_json_data_as_it_is_written(
+        self,
+        app: Flask,
+        with_db_and_bpmn_file_cleanup: None,
+    ) -> None:
+        process_model = self._load_simple_script_process_model()
+        with self.app_config_mock(app, "SPIFFWORKFLOW_BACKEND_JSON_DATA_CODEC", "zlib"):
+            processor = self._run_process_instance(process_model)
+            expected_data = processor.get_data()
+
+            codecs = {json_data.codec for json_data in JsonDataModel.query.all()}
+            assert codecs == {"zlib", JSON_DATA_NOT_COMPRESSED}
+            self._assert_json_data_is_readable_and_matches_its_hash()
+
+            process_instance = processor.process_instance_model
+            db.session.expunge_all()
+            processor = ProcessInstanceProcessor(db.session.merge(process_instance))
+            assert processor.get_data() == expected_data
+
+    def test_can_compress_with_a_dictionary_for_the_process_model(
+        self,
+        app: Flask,
+        with_db_and_bpmn_file_cleanup: None,
+    ) -> None:
+        process_model = self._load_simple_script_process_model()
+        for run in range(4):
+            self._run_process_instance(process_model, run)
+
+        with self.app_config_mock(app, "SPIFFWORKFLOW_BACKEND_JSON_DATA_CODEC", "zlib"):
+            with self.app_config_mock(app, "SPIFFWORKFLOW_BACKEND_JSON_DATA_USE_DICTIONARIES", True):
+                dictionaries = JsonDataCompressionService.train_missing_dictionaries()
+                assert len(dictionaries) == 1
+                assert dictionaries[0].process_model_identifier == process_model.id
+                assert JsonDataCompressionService.train_missing_dictionaries() == []
+
+                json_data_hashes_before = {json_data.hash for json_data in JsonDataModel.query.all()}
+                with self.app_config_mock(app, "SPIFFWORKFLOW_BACKEND_JSON_DATA_COMPRESSION_MIN_BYTES", 0):
+                    self._run_process_instance(process_model, 4)
+
+            # read the columns as they are stored rather than through the model, which decompresses them
+            new_stored_rows = [
+                row
+                for row in JsonDataModel.query.with_entities(
+                    JsonDataModel.hash, JsonDataModel.data, JsonDataModel.codec, JsonDataModel.dictionary_id
+                ).all()
+                if row.hash not in json_data_hashes_before
+            ]
+            assert len(new_stored_rows) > 0
+            compressed_rows = [row for row in new_stored_rows if row.codec == "zlib"]
+            assert len(compressed_rows) > 0
+            assert {row.dictionary_id for row in compressed_rows} == {dictionaries[0].id}
+            assert all(row.data is None for row in compressed_rows)
+
+            # the dictionary is read at most once for all of the records and then comes from the cache
+            new_hashes = {row.hash for row in new_stored_rows}
+            with count_queries() as query_counter:
+                json_data_dicts = JsonDataModel.json_data_dicts_by_hash(new_hashes)
+            assert query_counter.count <= 2
+            with count_queries() as query_counter:
+                assert JsonDataModel.json_data_dicts_by_hash(new_hashes) == json_data_dicts
+            assert query_counter.count == 1
+            self._assert_json_data_is_readable_and_matches_its_hash()
+
+    def test_migrator_compresses_existing_json_data(
+        self,
+        app: Flask,
+        with_db_and_bpmn_file_cleanup: None,
+    ) -> None:
+        process_model = self._load_simple_script_process_model()
+        processor = self._run_process_instance(process_model)
+        expected_data = processor.get_data()
+        json_data_count = JsonDataModel.query.count()
+        assert JsonDataModel.query.filter(JsonDataModel.codec == None).count() == json_data_count  # noqa: E711
+
+        assert JsonDataCompressionMigrator.compress_existing_json_data(batch_size=10) == 0
+        with self.app_config_mock(app, "SPIFFWORKFLOW_BACKEND_JSON_DATA_CODEC", "zlib"):
+            looked_at_count = 0
+            while (batch_count := JsonDataCompressionMigrator.compress_existing_json_data(batch_size=10)) > 0:
+                looked_at_count += batch_count
+            assert looked_at_count == json_data_count
+
+        assert JsonDataModel.query.filter(JsonDataModel.codec == None).count() == 0  # noqa: E711
+        assert JsonDataModel.query.filter(JsonDataModel.codec == "zlib").count() > 0
+        self._assert_json_data_is_readable_and_matches_its_hash()
+
+        process_instance = processor.process_instance_model
+        db.session.expunge_all()
+        processor = ProcessInstanceProcessor(db.session.merge(process_instance))
+        assert processor.get_data() == expected_data
+
+    def _load_simple_script_process_model(self) -> ProcessModelInfo:
+        return load_test_spec(
+            process_model_id="test_group/simple_script",
+            process_model_source_directory="simple_script",
+        )
+
+    def _run_process_instance(self, process_model: ProcessModelInfo, run: int = 0) -> ProcessInstanceProcessor:
+        process_instance = self.create_process_instance_from_process_model(process_model=process_model)
+        processor = ProcessInstanceProcessor(process_instance)
+        # give the tasks the sort of repetitive data that is worth compressing
+        for spiff_task in processor.bpmn_process_instance.get_tasks(state=TaskState.READY):
+            spiff_task.data["items"] = [{"name": f"item {run}-{index}", "status": "in stock"} for index in range(100)]
+        processor.do_engine_steps(save=True, execution_strategy_name="greedy")
+        assert process_instance.status == "user_input_required"
+        return processor
+
+    def _assert_json_data_is_readable_and_matches_its_hash(self) -> None:
+        db.session.expire_all()
+        for json_data in JsonDataModel.query.all():
+            assert json_data.data is not None
+            assert sha256(json.dumps(json_data.data, sort_keys=True).encode("utf8")).hexdigest() == json_data.hash
+            assert JsonDataModel.find_data_dict_by_hash(json_data.hash) == json_data.data
@@ -0,0 +1,132 @@
+from unittest.mock import patch
+from uuid import UUID
+
+from flask import Flask
+from SpiffWorkflow.util.task import TaskState  # type: ignore
+from spiffworkflow_backend.models.db import db
+from spiffworkflow_backend.models.json_data import JsonDataDelta
+from spiffworkflow_backend.models.json_data import JsonDataModel
+from spiffworkflow_backend.models.process_model import ProcessModelInfo
+from spiffworkflow_backend.models.task import TaskModel
+from spiffworkflow_backend.services.process_instance_processor import ProcessInstanceProcessor
+
+from tests.spiffworkflow_backend.helpers.base_test import BaseTest
+from tests.spiffworkflow_backend.helpers.test_data import load_test_spec
+
+
+class TestJsonDataDelta(BaseTest):
+    def test_can_create_and_apply_a_delta(
+        self,
+        app: Flask,
+    ) -> None:
+        base_data = {"a": 1, "b": [1, 2], "c": "same", "d": "removed", "e": {"x": 1}, "f": True}
+        data = {"a": 2, "b": [1, 2, 3], "c": "same", "e": {"x": 1}, "f": 1, "g": "new", "h": "same too"}
+        base_data["h"] = "same too"
+        delta = JsonDataDelta.create(base_data, data)
+        assert delta is not None
+        assert delta["appended"] == {"b": [3]}
+        assert delta["removed"] == ["d"]
+        # True and 1 are equal in python but not in the stored json
+        assert delta["set"] == {"a": 2, "f": 1, "g": "new"}
+
+        rebuilt_data = JsonDataDelta.apply(base_data, delta)
+        assert rebuilt_data == data
+        assert rebuilt_data["f"] is not True
+        assert base_data["b"] == [1, 2]
+
+    def test_does_not_create_a_delta_when_most_of_the_data_changed(
+        self,
+        app: Flask,
+    ) -> None:
+        assert JsonDataDelta.create({"a": 1, "b": 2}, {"a": 3, "b": 4}) is None
+        assert JsonDataDelta.create({"a": 1}, {"a": 1, 2: 2}) is None
+
+    def test_reads_data_that_looks_like_a_delta_as_it_is(
+        self,
+        app: Flask,
+        with_db_and_bpmn_file_cleanup: None,
+    ) -> None:
+        data = {"__spiffworkflow_json_data_delta__": {"base": "missing_hash", "set": {}, "appended": {}, "removed": []}}
+        json_data_hash = JsonDataModel.create_and_insert_json_data_from_dict(data)
+        db.session.commit()
+        assert JsonDataModel.find_data_dict_by_hash(json_data_hash) == data
+
+    def test_stores_task_data_as_deltas_and_rebuilds_it(
+        self,
+        app: Flask,
+        with_db_and_bpmn_file_cleanup: None,
+    ) -> None:
+        process_model = self._load_simple_script_process_model()
+        with self.app_config_mock(app, "SPIFFWORKFLOW_BACKEND_TASK_DATA_DELTA_ENCODING", True):
+            processor = self._run_process_instance(process_model)
+            expected_data = processor.get_data()
+            process_instance = processor.process_instance_model
+
+            delta_base_hashes = self._delta_base_hashes()
+            delta_hashes = {hash for hash, delta_base_hash in delta_base_hashes.items() if delta_base_hash is not None}
+            assert len(delta_hashes) > 0
+            for delta_hash in delta_hashes:
+                assert delta_base_hashes[delta_hash] in delta_base_hashes
+
+            db.session.expire_all()
+            task_models = TaskModel.query.filter_by(process_instance_id=process_instance.id).all()
+            assert any(task_model.json_data_hash in delta_hashes for task_model in task_models)
+            for task_model in task_models:
+                spiff_task = processor.bpmn_process_instance.get_task_from_id(UUID(task_model.guid))
+                assert task_model.json_data() == spiff_task.data
+
+            db.session.expunge_all()
+            processor = ProcessInstanceProcessor(db.session.merge(process_instance))
+            assert processor.get_data() == expected_data
+
+    def test_does_not_hash_task_data_again_to_build_deltas(
+        self,
+        app: Flask,
+        with_db_and_bpmn_file_cleanup: None,
+    ) -> None:
+        process_model = self._load_simple_script_process_model()
+        hash_call_counts = []
+        for delta_encoding in [True, False]:
+            with self.app_config_mock(app, "SPIFFWORKFLOW_BACKEND_TASK_DATA_DELTA_ENCODING", delta_encoding):
+                with patch.object(
+                    JsonDataModel, "json_data_dict_from_dict", wraps=JsonDataModel.json_data_dict_from_dict
+                ) as mock_json_data_dict_from_dict:
+                    self._run_process_instance(process_model)
+                    hash_call_counts.append(mock_json_data_dict_from_dict.call_count)
+        assert hash_call_counts[0] == hash_call_counts[1]
+        assert any(delta_base_hash is not None for delta_base_hash in self._delta_base_hashes().values())
+
+    def test_stores_task_data_in_full_every_checkpoint_interval(
+        self,
+        app: Flask,
+        with_db_and_bpmn_file_cleanup: None,
+    ) -> None:
+        process_model = self._load_simple_script_process_model()
+        with self.app_config_mock(app, "SPIFFWORKFLOW_BACKEND_TASK_DATA_DELTA_ENCODING", True):
+            with self.app_config_mock(app, "SPIFFWORKFLOW_BACKEND_TASK_DATA_DELTA_CHECKPOINT_INTERVAL", 2):
+                self._run_process_instance(process_model)
+
+        delta_depths: dict[str, int] = {}
+        JsonDataModel.json_data_dicts_by_hash(set(self._delta_base_hashes().keys()), delta_depths=delta_depths)
+        assert set(delta_depths.values()) == {0, 1}
+
+    def _load_simple_script_process_model(self) -> ProcessModelInfo:
+        return load_test_spec(
+            process_model_id="test_group/simple_script",
+            process_model_source_directory="simple_script",
+        )
+
+    def _run_process_instance(self, process_model: ProcessModelInfo) -> ProcessInstanceProcessor:
+        process_instance = self.create_process_instance_from_process_model(process_model=process_model)
+        processor = ProcessInstanceProcessor(process_instance)
+        # give the tasks data that mostly stays the same from task to task
+        for spiff_task in processor.bpmn_process_instance.get_tasks(state=TaskState.READY):
+            spiff_task.data.update({f"unchanged_{index}": index for index in range(10)})
+            spiff_task.data["items"] = [{"name": f"item {index}"} for index in range(10)]
+        processor.do_engine_steps(save=True, execution_strategy_name="greedy")
+        assert process_instance.status == "user_input_required"
+        return processor
+
+    def _delta_base_hashes(self) -> dict[str, str | None]:
+        rows = JsonDataModel.query.with_entities(JsonDataModel.hash, JsonDataModel.delta_base_hash).all()
+        return {row.hash: row.delta_base_hash for row in rows}
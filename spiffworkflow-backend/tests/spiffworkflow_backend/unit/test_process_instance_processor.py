@@ -1,27 +1,42 @@
+import json
 from uuid import UUID
 
 import pytest
 from flask import g
 from flask.app import Flask
 from flask.testing import FlaskClient
+from pytest_mock.plugin import MockerFixture
+from SpiffWorkflow.bpmn.exceptions import WorkflowTaskException  # type: ignore
 from SpiffWorkflow.task import Task as SpiffTask  # type: ignore
 from SpiffWorkflow.util.task import TaskState  # type: ignore
 from spiffworkflow_backend.exceptions.error import TaskMismatchError
 from spiffworkflow_backend.exceptions.error import UserDoesNotHaveAccessToTaskError
+from spiffworkflow_backend.helpers.query_counter import count_queries
 from spiffworkflow_backend.models.bpmn_process import BpmnProcessModel
 from spiffworkflow_backend.models.db import db
 from spiffworkflow_backend.models.group import GroupModel
+from spiffworkflow_backend.models.human_task import HumanTaskModel
+from spiffworkflow_backend.models.human_task_user import HumanTaskUserModel
 from spiffworkflow_backend.models.json_data import JsonDataModel  # noqa: F401
 from spiffworkflow_backend.models.process_instance import ProcessInstanceModel
 from spiffworkflow_backend.models.process_instance import ProcessInstanceStatus
 from spiffworkflow_backend.models.process_instance_event import ProcessInstanceEventModel
 from spiffworkflow_backend.models.process_instance_event import ProcessInstanceEventType
+from spiffworkflow_backend.models.process_instance_metadata import ProcessInstanceMetadataModel
 from spiffworkflow_backend.models.task import TaskModel  # noqa: F401
 from spiffworkflow_backend.models.task_definition import TaskDefinitionModel
 from spiffworkflow_backend.models.task_instructions_for_end_user import TaskInstructionsForEndUserModel
+from spiffworkflow_backend.scripts.script import Script
 from spiffworkflow_backend.services.authorization_service import AuthorizationService
+from spiffworkflow_backend.services.lazy_task_data import is_unloaded_task_data
+from spiffworkflow_backend.services.lazy_task_data import loaded_task_data
+from spiffworkflow_backend.services.process_instance_processor import BaseCustomScriptEngineEnvironment
+from spiffworkflow_backend.services.process_instance_processor import CustomBpmnScriptEngine
 from spiffworkflow_backend.services.process_instance_processor import ProcessInstanceProcessor
 from spiffworkflow_backend.services.process_instance_service import ProcessInstanceService
+from spiffworkflow_backend.services.process_model_service import ProcessModelService
+from spiffworkflow_backend.services.process_model_spec_cache_service import ProcessModelSpecCacheService
+from spiffworkflow_backend.services.spec_file_service import SpecFileService
 from spiffworkflow_backend.services.workflow_execution_service import WorkflowExecutionServiceError
 
 from tests.spiffworkflow_backend.helpers.base_test import BaseTest
@@ -216,6 +231,68 @@ class TestProcessInstanceProcessor(BaseTest):
         assert spiff_task is not None
         assert spiff_task.state == TaskState.COMPLETED
 
+    def test_loads_process_instance_in_fixed_number_of_queries(
+        self,
+        app: Flask,
+        with_db_and_bpmn_file_cleanup: None,
+    ) -> None:
+        process_model = load_test_spec(
+            process_model_id="test_group/call_activity_nested",
+            process_model_source_directory="call_activity_nested",
+        )
+        process_instance = self.create_process_instance_from_process_model(process_model=process_model)
+        processor = ProcessInstanceProcessor(process_instance)
+        processor.do_engine_steps(save=True)
+        db.session.expire_all()
+
+        # warm the definition cache so only instance state is loaded below
+        ProcessInstanceProcessor(process_instance)
+        processor = ProcessInstanceProcessor(process_instance)
+        processor_with_subprocesses = ProcessInstanceProcessor(process_instance, include_completed_subprocesses=True)
+        assert len(processor.bpmn_subprocess_mapping) == 0
+        assert len(processor_with_subprocesses.bpmn_subprocess_mapping) > 2
+        assert processor_with_subprocesses.hydration_query_count == processor.hydration_query_count
+        assert processor.hydration_query_count <= 4
+
+    def test_can_lazily_load_task_data(
+        self,
+        app: Flask,
+        with_db_and_bpmn_file_cleanup: None,
+    ) -> None:
+        initiator_user = self.find_or_create_user("initiator_user")
+        process_model = load_test_spec(
+            process_model_id="test_group/manual_task",
+            process_model_source_directory="manual_task",
+        )
+        process_instance = self.create_process_instance_from_process_model(process_model=process_model, user=initiator_user)
+        processor = ProcessInstanceProcessor(process_instance)
+        processor.do_engine_steps(save=True)
+        assert len(process_instance.active_human_tasks) == 1
+        human_task_one = process_instance.active_human_tasks[0]
+
+        processor = ProcessInstanceProcessor(process_instance, lazy_load_task_data=True)
+        assert processor.lazy_task_data_loader is not None
+        assert processor.lazy_task_data_loader.fetch_count == 0
+
+        # spiff may still run the ready task so it gets a plain dict up front
+        spiff_manual_task = processor.bpmn_process_instance.get_task_from_id(UUID(human_task_one.task_id))
+        assert isinstance(spiff_manual_task.data, dict)
+        assert spiff_manual_task.data == {"the_new_var": "HEY"}
+
+        spiff_script_task = spiff_manual_task.parent
+        assert spiff_script_task.state == TaskState.COMPLETED
+        assert is_unloaded_task_data(spiff_script_task.data)
+        assert processor.lazy_task_data_loader.fetch_count == 0
+        assert json.loads(json.dumps(loaded_task_data(spiff_script_task.data))) == {"the_new_var": "HEY"}
+        assert processor.lazy_task_data_loader.fetch_count == 1
+        assert isinstance(spiff_script_task.data, dict)
+
+        ProcessInstanceService.complete_form_task(processor, spiff_manual_task, {"hey": "you"}, initiator_user, human_task_one)
+        assert process_instance.status == ProcessInstanceStatus.complete.value
+        task_model = TaskModel.query.filter_by(guid=human_task_one.task_id).first()
+        assert task_model is not None
+        assert task_model.json_data() == {"the_new_var": "HEY", "hey": "you"}
+
     def test_properly_resets_process_to_given_task(
         self,
         app: Flask,
@@ -1077,6 +1154,266 @@ class TestProcessInstanceProcessor(BaseTest):
         # mypy thinks this is unreachable but it is reachable. summary can be str | None
         assert len(process_instance.summary) == 255  # type: ignore
 
+    def test_reuses_cached_definition_specs_across_instances(
+        self,
+        app: Flask,
+        client: FlaskClient,
+        with_db_and_bpmn_file_cleanup: None,
+    ) -> None:
+        process_model = load_test_spec(
+            process_model_id="group/call_activity_with_manual_task",
+            process_model_source_directory="call_activity_with_manual_task",
+        )
+        ProcessInstanceProcessor.bpmn_definition_spec_cache().clear()
+        process_instance_one = self.create_process_instance_from_process_model(process_model=process_model)
+        processor = ProcessInstanceProcessor(process_instance_one)
+        processor.do_engine_steps(save=True)
+        process_instance_two = self.create_process_instance_from_process_model(process_model=process_model)
+        processor = ProcessInstanceProcessor(process_instance_two)
+        processor.do_engine_steps(save=True)
+        assert process_instance_one.bpmn_process_definition_id == process_instance_two.bpmn_process_definition_id
+
+        processor_one = ProcessInstanceProcessor(process_instance_one)
+        processor_two = ProcessInstanceProcessor(process_instance_two)
+        cache = ProcessInstanceProcessor.bpmn_definition_spec_cache()
+        assert len(cache) == 1
+        assert cache.misses == 1
+        assert cache.hits == 1
+        assert processor_one.bpmn_process_instance.spec is processor_two.bpmn_process_instance.spec
+        assert processor_one.bpmn_definition_to_task_definitions_mappings.keys() == (
+            processor_two.bpmn_definition_to_task_definitions_mappings.keys()
+        )
+
+        # the instance loaded from the cache must still be able to save new tasks against its definitions
+        human_task_one = process_instance_two.active_human_tasks[0]
+        spiff_manual_task = processor_two.bpmn_process_instance.get_task_from_id(UUID(human_task_one.task_id))
+        ProcessInstanceService.complete_form_task(
+            processor_two, spiff_manual_task, {}, process_instance_two.process_initiator, human_task_one
+        )
+        assert process_instance_two.status == ProcessInstanceStatus.complete.value
+
+    def test_reuses_parsed_process_model_specs_until_files_change(
+        self,
+        app: Flask,
+        with_db_and_bpmn_file_cleanup: None,
+    ) -> None:
+        process_model = load_test_spec(
+            process_model_id="test_group/call_activity_nested",
+            process_model_source_directory="call_activity_nested",
+        )
+        ProcessModelSpecCacheService.clear()
+        (spec, subprocesses) = ProcessInstanceProcessor.get_process_model_and_subprocesses(process_model.id)
+        (cached_spec, cached_subprocesses) = ProcessInstanceProcessor.get_process_model_and_subprocesses(process_model.id)
+        assert cached_spec is spec
+        assert cached_subprocesses == subprocesses
+        assert ProcessModelSpecCacheService.cache().hits == 1
+
+        # changes made outside of the api, like a git pull, are caught by the file hashes
+        bpmn_file_path = SpecFileService.full_file_path(process_model, "call_activity_level_3.bpmn")
+        with open(bpmn_file_path, "ab") as f_handle:
+            f_handle.write(b"\n")
+        (reparsed_spec, _) = ProcessInstanceProcessor.get_process_model_and_subprocesses(process_model.id)
+        assert reparsed_spec is not spec
+
+        bpmn_file_data = SpecFileService.get_data(process_model, "call_activity_level_3.bpmn")
+        SpecFileService.update_file(process_model, "call_activity_level_3.bpmn", bpmn_file_data)
+        assert len(ProcessModelSpecCacheService.cache()) == 0
+
+        process_instance = self.create_process_instance_from_process_model(process_model=process_model)
+        processor = ProcessInstanceProcessor(process_instance)
+        processor.do_engine_steps(save=True)
+        assert process_instance.status == ProcessInstanceStatus.complete.value
+
+    def test_adds_human_tasks_for_multiinstance_tasks_together(
+        self,
+        app: Flask,
+        with_db_and_bpmn_file_cleanup: None,
+    ) -> None:
+        process_model = load_test_spec(
+            process_model_id="group/multiinstance_manual_task",
+            process_model_source_directory="multiinstance_manual_task",
+        )
+        process_instance = self.create_process_instance_from_process_model(process_model=process_model)
+        processor = ProcessInstanceProcessor(process_instance)
+        processor.do_engine_steps(save=True)
+        assert len(process_instance.active_human_tasks) == 3
+        for human_task in process_instance.active_human_tasks:
+            assert human_task.potential_owners == [process_instance.process_initiator]
+
+        # one task lookup, one insert of the human tasks, one lookup of their ids and one insert of their users
+        assert self._add_human_tasks_again_and_count_queries(processor) == 4
+        assert len(process_instance.active_human_tasks) == 3
+
+        human_task_one = process_instance.active_human_tasks[0]
+        spiff_manual_task = processor.bpmn_process_instance.get_task_from_id(UUID(human_task_one.task_id))
+        processor.complete_task(spiff_manual_task, human_task_one, user=process_instance.process_initiator)
+        db.session.expire_all()
+        assert len(process_instance.active_human_tasks) == 2
+        assert human_task_one.completed is True
+
+    def test_adds_human_tasks_for_multiinstance_tasks_in_a_group_lane_together(
+        self,
+        app: Flask,
+        with_db_and_bpmn_file_cleanup: None,
+    ) -> None:
+        finance_users = [self.find_or_create_user("testuser1"), self.find_or_create_user("testuser2")]
+        AuthorizationService.import_permissions_from_yaml_file()
+        finance_group = GroupModel.query.filter_by(identifier="Finance Team").first()
+        assert finance_group is not None
+
+        processor = self._run_multiinstance_manual_task_in_lane()
+        process_instance = processor.process_instance_model
+        assert len(process_instance.active_human_tasks) == 3
+        for human_task in process_instance.active_human_tasks:
+            assert human_task.lane_assignment_id == finance_group.id
+            assert sorted(human_task.potential_owners, key=lambda u: u.id) == finance_users
+
+        # the group and its users are looked up once for all of the tasks
+        assert self._add_human_tasks_again_and_count_queries(processor) == 6
+        assert len(process_instance.active_human_tasks) == 3
+        for human_task in process_instance.active_human_tasks:
+            assert human_task.lane_assignment_id == finance_group.id
+            assert sorted(human_task.potential_owners, key=lambda u: u.id) == finance_users
+
+    def test_adds_human_tasks_for_multiinstance_tasks_with_lane_owners_together(
+        self,
+        app: Flask,
+        with_db_and_bpmn_file_cleanup: None,
+    ) -> None:
+        lane_owners = [self.find_or_create_user("testuser3"), self.find_or_create_user("testuser4")]
+        # the tasks go to the group until the lane owners are set
+        self.find_or_create_user("testuser1")
+        AuthorizationService.import_permissions_from_yaml_file()
+        finance_group = GroupModel.query.filter_by(identifier="Finance Team").first()
+        assert finance_group is not None
+
+        processor = self._run_multiinstance_manual_task_in_lane()
+        process_instance = processor.process_instance_model
+        assert len(process_instance.active_human_tasks) == 3
+        for spiff_task in processor.get_all_ready_or_waiting_tasks():
+            spiff_task.data["lane_owners"] = {"Finance Team": [user.username for user in lane_owners]}
+
+        # the group and the lane owner users are looked up once for all of the tasks
+        assert self._add_human_tasks_again_and_count_queries(processor) == 7
+        assert len(process_instance.active_human_tasks) == 3
+        for human_task in process_instance.active_human_tasks:
+            assert human_task.lane_assignment_id == finance_group.id
+            assert sorted(human_task.potential_owners, key=lambda u: u.id) == lane_owners
+
+    def _run_multiinstance_manual_task_in_lane(self) -> ProcessInstanceProcessor:
+        process_model = load_test_spec(
+            process_model_id="group/multiinstance_manual_task_in_lane",
+            process_model_source_directory="multiinstance_manual_task_in_lane",
+        )
+        process_instance = self.create_process_instance_from_process_model(process_model=process_model)
+        processor = ProcessInstanceProcessor(process_instance)
+        processor.do_engine_steps(save=True)
+        return processor
+
+    def _add_human_tasks_again_and_count_queries(self, processor: ProcessInstanceProcessor) -> int:
+        HumanTaskUserModel.query.delete()
+        HumanTaskModel.query.delete()
+        ready_tasks = processor.get_all_ready_or_waiting_tasks()
+        with count_queries() as query_counter:
+            processor.update_human_tasks([], ready_tasks)
+        db.session.commit()
+        db.session.expire_all()
+        return query_counter.count
+
+    def test_extracts_metadata_with_cached_extraction_paths(
+        self,
+        app: Flask,
+        with_db_and_bpmn_file_cleanup: None,
+    ) -> None:
+        process_model = self.create_process_model_with_metadata()
+        process_instance = self.create_process_instance_from_process_model(process_model=process_model)
+        processor = ProcessInstanceProcessor(process_instance)
+        processor.do_engine_steps(save=True)
+        metadata = ProcessInstanceMetadataModel.query.filter_by(process_instance_id=process_instance.id).all()
+        assert sorted(pim.key for pim in metadata) == ["awesome_var", "invoice_number"]
+        created_at_in_seconds_by_key = {pim.key: pim.created_at_in_seconds for pim in metadata}
+
+        cache = ProcessModelService.process_model_json_cache()
+        hits = cache.hits
+        with count_queries() as query_counter:
+            processor.extract_metadata()
+        assert cache.hits == hits + 1
+        # the rows are written in one statement whether or not they exist already
+        assert query_counter.count == 1
+        db.session.commit()
+        db.session.expire_all()
+        metadata = ProcessInstanceMetadataModel.query.filter_by(process_instance_id=process_instance.id).all()
+        assert {pim.key: pim.created_at_in_seconds for pim in metadata} == created_at_in_seconds_by_key
+
+        # changes to the json file made outside of the api, like a git pull, are picked up
+        ProcessModelService.add_json_data_to_json_file(
+            process_model,
+            ProcessModelService.PROCESS_MODEL_JSON_FILE,
+            {"metadata_extraction_paths": [{"key": "inner_again", "path": "outer.inner"}]},
+        )
+        processor.save()
+        metadata = ProcessInstanceMetadataModel.query.filter_by(process_instance_id=process_instance.id).all()
+        assert sorted(pim.key for pim in metadata) == ["awesome_var", "inner_again", "invoice_number"]
+
+    def test_script_engine_reuses_compiled_code(
+        self,
+        app: Flask,
+        with_db_and_bpmn_file_cleanup: None,
+    ) -> None:
+        process_model = load_test_spec(
+            process_model_id="test_group/simple_script",
+            process_model_source_directory="simple_script",
+        )
+        process_instance = self.create_process_instance_from_process_model(process_model=process_model)
+        processor = ProcessInstanceProcessor(process_instance)
+        spiff_task = processor.bpmn_process_instance.get_tasks()[0]
+        spiff_task.data = {"a": 1}
+        script_engine = processor._script_engine
+
+        cache = BaseCustomScriptEngineEnvironment.code_cache()
+        cache.clear()
+        for _ in range(3):
+            assert script_engine.evaluate(spiff_task, " a + 1") == 2
+        script_engine.execute(spiff_task, "b = a + 2")
+        script_engine.execute(spiff_task, "b = a + 2")
+        assert spiff_task.data["b"] == 3
+        assert (cache.misses, cache.hits) == (2, 3)
+
+        # errors still point at the line of the script they happened on
+        with pytest.raises(WorkflowTaskException) as exception:
+            script_engine.execute(spiff_task, "c = 1\nd = not_defined")
+        assert exception.value.line_number == 2
+        assert exception.value.error_line == "d = not_defined"
+
+    def test_script_engine_reuses_augmented_methods_for_the_same_task(
+        self,
+        app: Flask,
+        mocker: MockerFixture,
+        with_db_and_bpmn_file_cleanup: None,
+    ) -> None:
+        process_model = load_test_spec(
+            process_model_id="test_group/simple_script",
+            process_model_source_directory="simple_script",
+        )
+        process_instance = self.create_process_instance_from_process_model(process_model=process_model)
+        processor = ProcessInstanceProcessor(process_instance)
+        [spiff_task, other_spiff_task] = processor.bpmn_process_instance.get_tasks()[0:2]
+        script_engine = CustomBpmnScriptEngine()
+        generate_augmented_list = mocker.spy(Script, "generate_augmented_list")
+
+        assert script_engine.evaluate(spiff_task, "get_env()") == "unit_testing"
+        assert script_engine.evaluate(spiff_task, "get_env()", external_context={"a": 1}) == "unit_testing"
+        script_engine.execute(spiff_task, "env = get_env()")
+        assert generate_augmented_list.call_count == 1
+        assert spiff_task.data["env"] == "unit_testing"
+
+        # methods added by one caller are not seen by the next
+        with pytest.raises(WorkflowTaskException, match="Error evaluating expression 'a'"):
+            script_engine.evaluate(spiff_task, "a")
+
+        script_engine.evaluate(other_spiff_task, "get_env()")
+        assert generate_augmented_list.call_count == 2
+
     # # To test processing times with multiinstance subprocesses
     # def test_large_multiinstance(
     #     self,
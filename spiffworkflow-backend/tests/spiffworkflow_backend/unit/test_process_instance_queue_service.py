@@ -3,11 +3,18 @@ from contextlib import suppress
 
 import pytest
 from flask.app import Flask
+from prometheus_client import REGISTRY
 from pytest_mock.plugin import MockerFixture
+from spiffworkflow_backend.models.db import db
 from spiffworkflow_backend.models.process_instance import ProcessInstanceModel
+from spiffworkflow_backend.models.process_instance_queue import ProcessInstanceQueueModel
+from spiffworkflow_backend.services.process_instance_lock_service import ProcessInstanceLockLostError
 from spiffworkflow_backend.services.process_instance_lock_service import ProcessInstanceLockService
+from spiffworkflow_backend.services.process_instance_processor import ProcessInstanceProcessor
 from spiffworkflow_backend.services.process_instance_queue_service import ProcessInstanceIsAlreadyLockedError
 from spiffworkflow_backend.services.process_instance_queue_service import ProcessInstanceQueueService
+from spiffworkflow_backend.services.process_instance_service import ProcessInstanceService
+from spiffworkflow_backend.services.process_model_service import ProcessModelService
 
 from tests.spiffworkflow_backend.helpers.base_test import BaseTest
 from tests.spiffworkflow_backend.helpers.test_data import load_test_spec
@@ -138,3 +145,217 @@ class TestProcessInstanceQueueService(BaseTest):
             with ProcessInstanceQueueService.dequeued(process_instance):
                 pass
         assert dequeue_mocker.call_count == 6
+
+    def test_claim_many_locks_a_batch_and_skips_what_is_already_claimed(
+        self,
+        app: Flask,
+        with_db_and_bpmn_file_cleanup: None,
+    ) -> None:
+        process_instances = [self._create_process_instance() for _ in range(4)]
+        ProcessInstanceQueueModel.query.filter_by(process_instance_id=process_instances[0].id).update(
+            {"locked_by": "test:another_poller", "locked_at_in_seconds": round(time.time())}
+        )
+        db.session.commit()
+
+        claimed_ids = ProcessInstanceQueueService.claim_many("not_started", round(time.time()), limit=2)
+        assert claimed_ids == [process_instances[1].id, process_instances[2].id]
+        assert ProcessInstanceQueueService.claim_many("not_started", round(time.time()), limit=2) == [process_instances[3].id]
+        assert ProcessInstanceQueueService.claim_many("not_started", round(time.time()), limit=2) == []
+
+        locked_by = ProcessInstanceLockService.locked_by()
+        for process_instance in process_instances[1:]:
+            assert ProcessInstanceLockService.has_lock(process_instance.id)
+            queue_entry = ProcessInstanceQueueModel.query.filter_by(process_instance_id=process_instance.id).first()
+            assert queue_entry is not None
+            assert queue_entry.locked_by == locked_by
+
+        # a claimed process instance runs like a dequeued one and is released after
+        with ProcessInstanceQueueService.claimed(process_instances[1]):
+            with ProcessInstanceQueueService.dequeued(process_instances[1]):
+                assert ProcessInstanceLockService.has_lock(process_instances[1].id)
+        assert not ProcessInstanceLockService.has_lock(process_instances[1].id)
+        queue_entry = ProcessInstanceQueueModel.query.filter_by(process_instance_id=process_instances[1].id).first()
+        assert queue_entry is not None
+        assert queue_entry.locked_by is None
+
+        for process_instance in process_instances[2:]:
+            ProcessInstanceQueueService.release_claim(process_instance)
+        assert ProcessInstanceQueueService.claim_many("not_started", round(time.time()), limit=5) == [
+            process_instance.id for process_instance in process_instances[1:]
+        ]
+
+    def test_can_release_a_claim_without_loading_the_process_instance(
+        self,
+        app: Flask,
+        with_db_and_bpmn_file_cleanup: None,
+    ) -> None:
+        process_instance = self._create_process_instance()
+        assert ProcessInstanceQueueService.claim_many("not_started", round(time.time()), limit=1) == [process_instance.id]
+
+        ProcessInstanceQueueService.release_claim_by_process_instance_id(process_instance.id)
+        assert not ProcessInstanceLockService.has_lock(process_instance.id)
+        queue_entry = ProcessInstanceQueueModel.query.filter_by(process_instance_id=process_instance.id).first()
+        assert queue_entry is not None
+        assert queue_entry.locked_by is None
+        assert queue_entry.status == "not_started"
+        assert ProcessInstanceQueueService.claim_many("not_started", round(time.time()), limit=1) == [process_instance.id]
+
+    def test_claims_by_priority_and_ages_waiting_entries(
+        self,
+        app: Flask,
+        with_db_and_bpmn_file_cleanup: None,
+    ) -> None:
+        bulk, interactive, default = (self._create_process_instance() for _ in range(3))
+        ProcessInstanceQueueService.set_priority(bulk, 5)
+        ProcessInstanceQueueService.set_priority(interactive, 1)
+        now = round(time.time())
+        ProcessInstanceQueueModel.query.update({"run_at_in_seconds": now})
+        db.session.commit()
+        assert ProcessInstanceQueueService.peek_many("not_started", now) == [interactive.id, default.id, bulk.id]
+
+        # waiting a little over three aging intervals is worth three priority levels
+        ProcessInstanceQueueModel.query.filter_by(process_instance_id=bulk.id).update({"run_at_in_seconds": now - 3 * 300 - 1})
+        db.session.commit()
+        with self.app_config_mock(app, "SPIFFWORKFLOW_BACKEND_QUEUE_PRIORITY_AGING_INTERVAL_IN_SECONDS", 300):
+            assert ProcessInstanceQueueService.peek_many("not_started", now) == [interactive.id, bulk.id, default.id]
+            assert ProcessInstanceQueueService.claim_many("not_started", now, limit=2) == [interactive.id, bulk.id]
+        with self.app_config_mock(app, "SPIFFWORKFLOW_BACKEND_QUEUE_PRIORITY_AGING_INTERVAL_IN_SECONDS", 0):
+            assert ProcessInstanceQueueService.peek_many("not_started", now) == [default.id]
+        ProcessInstanceQueueService.release_claim(interactive)
+        ProcessInstanceQueueService.release_claim(bulk)
+
+    def test_new_process_instances_get_the_default_priority_of_their_process_model(
+        self,
+        app: Flask,
+        with_db_and_bpmn_file_cleanup: None,
+    ) -> None:
+        process_instance = self._create_process_instance()
+        queue_entry = ProcessInstanceQueueModel.query.filter_by(process_instance_id=process_instance.id).first()
+        assert queue_entry is not None
+        assert queue_entry.priority == 2
+
+        process_model = ProcessModelService.get_process_model(process_instance.process_model_identifier)
+        ProcessModelService.update_process_model(process_model, {"default_priority": 7})
+        process_instance, _ = ProcessInstanceService.create_process_instance(
+            ProcessModelService.get_process_model(process_model.id), self.find_or_create_user("initiator_user")
+        )
+        queue_entry = ProcessInstanceQueueModel.query.filter_by(process_instance_id=process_instance.id).first()
+        assert queue_entry is not None
+        assert queue_entry.priority == 7
+
+        # the priority survives the process instance being locked and unlocked
+        with ProcessInstanceQueueService.dequeued(process_instance):
+            pass
+        db.session.refresh(queue_entry)
+        assert queue_entry.priority == 7
+
+    def test_expired_locks_can_be_taken_and_are_removed_in_bulk(
+        self,
+        app: Flask,
+        with_db_and_bpmn_file_cleanup: None,
+    ) -> None:
+        crashed, running, legacy = (self._create_process_instance() for _ in range(3))
+        now = round(time.time())
+        self._set_lock(crashed, "test:crashed_worker", now - 120, now - 1)
+        self._set_lock(running, "test:running_worker", now - 120, now + 30)
+        # locked before leases were added
+        self._set_lock(legacy, "test:old_worker", now - app.config["MAX_INSTANCE_LOCK_DURATION_IN_SECONDS"] - 1, None)
+
+        with ProcessInstanceQueueService.dequeued(crashed):
+            assert ProcessInstanceLockService.has_lock(crashed.id)
+        with pytest.raises(ProcessInstanceIsAlreadyLockedError):
+            with ProcessInstanceQueueService.dequeued(running):
+                pass
+
+        self._set_lock(crashed, "test:crashed_worker", now - 120, now - 1)
+        reclaimed_before = REGISTRY.get_sample_value("spiffworkflow_process_instance_locks_reclaimed_total") or 0
+        ProcessInstanceLockService.remove_stale_locks()
+        assert REGISTRY.get_sample_value("spiffworkflow_process_instance_locks_reclaimed_total") == reclaimed_before + 2
+        locked_by = {
+            queue_entry.process_instance_id: queue_entry.locked_by for queue_entry in ProcessInstanceQueueModel.query.all()
+        }
+        assert locked_by == {crashed.id: None, running.id: "test:running_worker", legacy.id: None}
+
+    def test_leases_of_held_locks_are_renewed(
+        self,
+        app: Flask,
+        with_db_and_bpmn_file_cleanup: None,
+    ) -> None:
+        # drops the leases of locks that earlier tests left in this thread
+        ProcessInstanceLockService.set_thread_local_locking_context("web")
+        process_instance = self._create_process_instance()
+        hold_count_before = self._lock_hold_count()
+        with ProcessInstanceQueueService.dequeued(process_instance):
+            queue_entry = ProcessInstanceQueueModel.query.filter_by(process_instance_id=process_instance.id).first()
+            assert queue_entry is not None
+            assert queue_entry.lock_expires_at_in_seconds is not None
+            queue_entry.lock_expires_at_in_seconds = 0
+            db.session.commit()
+
+            ProcessInstanceLockService.renew_leases()
+            db.session.refresh(queue_entry)
+            assert queue_entry.lock_expires_at_in_seconds >= round(time.time()) + 59
+
+            # a lock that expired and was taken by something else is not taken back
+            lost_before = REGISTRY.get_sample_value("spiffworkflow_process_instance_lock_leases_lost_total") or 0
+            queue_entry.locked_by = "test:another_worker"
+            db.session.commit()
+            ProcessInstanceLockService.renew_leases()
+            assert REGISTRY.get_sample_value("spiffworkflow_process_instance_lock_leases_lost_total") == lost_before + 1
+            db.session.refresh(queue_entry)
+            queue_entry.locked_by = ProcessInstanceLockService.locked_by()
+            db.session.commit()
+
+        assert self._lock_hold_count() == hold_count_before + 1
+        db.session.refresh(queue_entry)
+        assert queue_entry.lock_expires_at_in_seconds is None
+
+    def test_runs_stop_and_leave_the_lock_alone_once_their_lease_is_lost(
+        self,
+        app: Flask,
+        with_db_and_bpmn_file_cleanup: None,
+    ) -> None:
+        ProcessInstanceLockService.set_thread_local_locking_context("web")
+        process_instance = self._create_process_instance()
+        processor = ProcessInstanceProcessor(process_instance)
+        with pytest.raises(ProcessInstanceLockLostError):
+            with ProcessInstanceQueueService.dequeued(process_instance):
+                # the lease expired and another worker took the lock before it was renewed
+                self._set_lock(process_instance, "test:another_worker", round(time.time()), round(time.time()) + 60)
+                ProcessInstanceLockService.renew_leases()
+                processor.do_engine_steps(save=True, execution_strategy_name="greedy")
+
+        queue_entry = ProcessInstanceQueueModel.query.filter_by(process_instance_id=process_instance.id).first()
+        assert queue_entry is not None
+        assert queue_entry.locked_by == "test:another_worker"
+        db.session.refresh(process_instance)
+        assert process_instance.status == "not_started"
+        assert not ProcessInstanceLockService.has_lock(process_instance.id)
+
+        # a lease that ran out without being renewed is lost too since something else can take the lock at any time
+        self._set_lock(process_instance, None, None, None)
+        with self.app_config_mock(app, "SPIFFWORKFLOW_BACKEND_INSTANCE_LOCK_LEASE_DURATION_IN_SECONDS", -1):
+            with pytest.raises(ProcessInstanceLockLostError):
+                with ProcessInstanceQueueService.dequeued(process_instance):
+                    processor.do_engine_steps(save=True, execution_strategy_name="greedy")
+        db.session.refresh(process_instance)
+        assert process_instance.status == "not_started"
+
+    def _set_lock(
+        self,
+        process_instance: ProcessInstanceModel,
+        locked_by: str | None,
+        locked_at_in_seconds: int | None,
+        lock_expires_at_in_seconds: int | None,
+    ) -> None:
+        ProcessInstanceQueueModel.query.filter_by(process_instance_id=process_instance.id).update(
+            {
+                "locked_by": locked_by,
+                "locked_at_in_seconds": locked_at_in_seconds,
+                "lock_expires_at_in_seconds": lock_expires_at_in_seconds,
+            }
+        )
+        db.session.commit()
+
+    def _lock_hold_count(self) -> float:
+        return REGISTRY.get_sample_value("spiffworkflow_process_instance_lock_hold_seconds_count", {"domain": "web"}) or 0
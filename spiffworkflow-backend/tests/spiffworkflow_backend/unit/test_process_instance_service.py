@@ -3,13 +3,23 @@ import hashlib
 from datetime import datetime
 from datetime import timezone
 from typing import Any
+from uuid import UUID
 
 import pytest
 from flask.app import Flask
+from pytest_mock.plugin import MockerFixture
 from SpiffWorkflow.bpmn.util import PendingBpmnEvent  # type: ignore
+from spiffworkflow_backend.models.db import db
+from spiffworkflow_backend.models.process_instance import ProcessInstanceModel
+from spiffworkflow_backend.models.process_instance import ProcessInstanceStatus
+from spiffworkflow_backend.models.process_instance_event import ProcessInstanceEventType
+from spiffworkflow_backend.services.process_instance_processor import ProcessInstanceProcessor
 from spiffworkflow_backend.services.process_instance_service import ProcessInstanceService
+from spiffworkflow_backend.services.process_instance_tmp_service import ProcessInstanceTmpService
+from spiffworkflow_backend.services.warm_processor_cache_service import WarmProcessorCacheService
 
 from tests.spiffworkflow_backend.helpers.base_test import BaseTest
+from tests.spiffworkflow_backend.helpers.test_data import load_test_spec
 
 
 def _file_content(i: int) -> bytes:
@@ -146,3 +156,75 @@ class TestProcessInstanceService(BaseTest):
                 datetime.fromisoformat("2023-04-27T20:15:10.626656+00:00"),
             )
         )
+
+    def test_can_run_several_execution_strategies_and_save_once(
+        self,
+        app: Flask,
+        with_db_and_bpmn_file_cleanup: None,
+        mocker: MockerFixture,
+    ) -> None:
+        process_model = load_test_spec(
+            process_model_id="test_group/manual_task",
+            process_model_source_directory="manual_task",
+        )
+        process_instance = self.create_process_instance_from_process_model(process_model=process_model)
+        save_spy = mocker.spy(ProcessInstanceProcessor, "save")
+
+        processor, _task_runnability = ProcessInstanceService.run_process_instance_with_execution_strategies(
+            process_instance,
+            execution_strategy_names=["run_current_ready_tasks", "queue_instructions_for_end_user"],
+        )
+        assert save_spy.call_count == 1
+        assert process_instance.status == ProcessInstanceStatus.user_input_required.value
+        assert len(process_instance.active_human_tasks) == 1
+
+        # a loaded processor can be passed in to keep going without loading the process instance again
+        _processor, _task_runnability = ProcessInstanceService.run_process_instance_with_execution_strategies(
+            process_instance,
+            execution_strategy_names=["queue_instructions_for_end_user"],
+            processor=processor,
+        )
+        assert _processor is processor
+
+    def test_only_reuses_warm_processors_for_unchanged_process_instances(
+        self,
+        app: Flask,
+        with_db_and_bpmn_file_cleanup: None,
+    ) -> None:
+        process_model = load_test_spec(
+            process_model_id="test_group/manual_task",
+            process_model_source_directory="manual_task",
+        )
+        initiator_user = self.find_or_create_user("initiator_user")
+        process_instance = self.create_process_instance_from_process_model(process_model=process_model, user=initiator_user)
+        processor = ProcessInstanceProcessor(process_instance)
+        processor.do_engine_steps(save=True)
+
+        with self.app_config_mock(app, "SPIFFWORKFLOW_BACKEND_CELERY_WARM_PROCESSOR_CACHE_SIZE", 2):
+            WarmProcessorCacheService._cache = None
+            try:
+                WarmProcessorCacheService.keep(processor)
+                # a requeued run gets a new session so make sure nothing loaded before is still attached
+                db.session.expunge_all()
+                initiator_user = self.find_or_create_user("initiator_user")
+                process_instance = ProcessInstanceModel.query.filter_by(id=process_instance.id).first()
+                warm_processor = WarmProcessorCacheService.checkout(process_instance)
+                assert warm_processor is processor
+                assert warm_processor.process_instance_model is process_instance
+                assert len(warm_processor.task_model_mapping) > 0
+                assert WarmProcessorCacheService.checkout(process_instance) is None
+
+                # the reused processor saves through the reloaded records
+                human_task = process_instance.active_human_tasks[0]
+                spiff_task = warm_processor.bpmn_process_instance.get_task_from_id(UUID(human_task.task_id))
+                ProcessInstanceService.complete_form_task(warm_processor, spiff_task, {}, initiator_user, human_task)
+                assert process_instance.status == ProcessInstanceStatus.complete.value
+
+                WarmProcessorCacheService.keep(processor)
+                ProcessInstanceTmpService.add_event_to_process_instance(
+                    process_instance, ProcessInstanceEventType.process_instance_suspended.value
+                )
+                db.session.commit()
+                assert WarmProcessorCacheService.checkout(process_instance) is None
+            finally:
+                WarmProcessorCacheService._cache = None
@@ -0,0 +1,77 @@
+import pytest
+from flask import Flask
+from pytest_mock.plugin import MockerFixture
+from SpiffWorkflow.bpmn.exceptions import WorkflowTaskException  # type: ignore
+from SpiffWorkflow.task import Task as SpiffTask  # type: ignore
+from spiffworkflow_backend.services.process_instance_processor import ProcessInstanceProcessor
+from spiffworkflow_backend.services.script_process_pool_service import ScriptProcessPoolService
+
+from tests.spiffworkflow_backend.helpers.base_test import BaseTest
+from tests.spiffworkflow_backend.helpers.test_data import load_test_spec
+
+
+class TestScriptProcessPoolService(BaseTest):
+    def test_runs_script_tasks_that_opt_in_in_the_process_pool(
+        self,
+        app: Flask,
+        mocker: MockerFixture,
+        with_db_and_bpmn_file_cleanup: None,
+    ) -> None:
+        process_model = load_test_spec(
+            process_model_id="test_group/script_task_in_process_pool",
+            process_model_source_directory="script_task_in_process_pool",
+        )
+        process_instance = self.create_process_instance_from_process_model(process_model=process_model)
+        processor = ProcessInstanceProcessor(process_instance)
+        execute = mocker.spy(ScriptProcessPoolService, "execute")
+        try:
+            processor.do_engine_steps(save=True)
+        finally:
+            ScriptProcessPoolService.reset()
+
+        # only the task with the property ran in the pool
+        assert execute.call_count == 1
+        assert process_instance.status == "complete"
+        data = processor.get_data()
+        assert data["total"] == sum(number * number for number in range(1000))
+        assert len(data["squares"]) == 1000
+        assert "count" not in data
+
+    def test_reports_errors_and_timeouts_of_scripts_in_the_process_pool(
+        self,
+        app: Flask,
+        with_db_and_bpmn_file_cleanup: None,
+    ) -> None:
+        process_model = load_test_spec(
+            process_model_id="test_group/script_task_in_process_pool",
+            process_model_source_directory="script_task_in_process_pool",
+        )
+        process_instance = self.create_process_instance_from_process_model(process_model=process_model)
+        processor = ProcessInstanceProcessor(process_instance)
+        spiff_task = processor.bpmn_process_instance.get_next_task(spec_name="sum_squares")
+        spiff_task.data = {"count": 3}
+        try:
+            with pytest.raises(WorkflowTaskException) as exception:
+                self._execute(processor, spiff_task, "a = 1\nb = count / 0")
+            assert exception.value.line_number == 2
+            assert exception.value.error_line == "b = count / 0"
+            assert "ZeroDivisionError" in str(exception.value)
+
+            # scripts run with the same restricted globals as any other script
+            with pytest.raises(WorkflowTaskException, match="Import not allowed: os"):
+                self._execute(processor, spiff_task, "import os")
+
+            with pytest.raises(WorkflowTaskException, match="MemoryError"):
+                self._execute(processor, spiff_task, "too_big = [0] * (2**32)")
+
+            with pytest.raises(WorkflowTaskException, match="took longer than 2 seconds"):
+                self._execute(processor, spiff_task, "while True:\n    pass")
+
+            self._execute(processor, spiff_task, "total = count + 1")
+            assert spiff_task.data == {"count": 3, "total": 4}
+        finally:
+            ScriptProcessPoolService.reset()
+
+    def _execute(self, processor: ProcessInstanceProcessor, spiff_task: SpiffTask, script: str) -> None:
+        spiff_task.task_spec.script = script
+        processor._script_engine.execute(spiff_task, script)
@@ -57,7 +57,7 @@ class TestServiceTaskDelegate(BaseTest):
         processor.do_engine_steps(save=True)
         spiff_task = processor.next_task()
 
-        with patch("requests.post") as mock_post:
+        with patch("requests.Session.post") as mock_post:
             mock_post.return_value.status_code = 404
             mock_post.return_value.ok = True
             mock_post.return_value.text = '{"error_stuff": "WE ERRORED"}'
@@ -82,7 +82,7 @@ class TestServiceTaskDelegate(BaseTest):
         processor.do_engine_steps(save=True)
         spiff_task = processor.next_task()
 
-        with patch("requests.post", side_effect=Exception("mocked error")):
+        with patch("requests.Session.post", side_effect=Exception("mocked error")):
             with pytest.raises(UncaughtServiceTaskError) as connector_proxy_error:
                 ServiceTaskDelegate.call_connector("my_operation", {}, spiff_task)
             self._assert_error_with_code(str(connector_proxy_error.value), "Exception", "mocked error", 500)
@@ -99,7 +99,7 @@ class TestServiceTaskDelegate(BaseTest):
         spiff_task = processor.next_task()
         return_text = "NOT JSON"
 
-        with patch("requests.post") as mock_post:
+        with patch("requests.Session.post") as mock_post:
             mock_post.return_value.status_code = 200
             mock_post.return_value.ok = True
             mock_post.return_value.text = return_text
@@ -133,7 +133,7 @@ class TestServiceTaskDelegate(BaseTest):
             "command_response_version": 2,
         }
 
-        with patch("requests.post") as mock_post:
+        with patch("requests.Session.post") as mock_post:
             mock_post.return_value.status_code = 500
             mock_post.return_value.ok = False
             mock_post.return_value.text = json.dumps(connector_response)
@@ -162,7 +162,7 @@ class TestServiceTaskDelegate(BaseTest):
             "command_response_version": 2,
         }
 
-        with patch("requests.post") as mock_post:
+        with patch("requests.Session.post") as mock_post:
             mock_post.return_value.status_code = 200
             mock_post.return_value.ok = True
             mock_post.return_value.text = json.dumps(connector_response)
@@ -211,7 +211,7 @@ class TestServiceTaskDelegate(BaseTest):
         failing_object.status_code = 200
         failing_object._content = json.dumps(failing_connector_response).encode()
 
-        with patch("requests.post") as mock_post:
+        with patch("requests.Session.post") as mock_post:
             mock_post.side_effect = [successful_object, successful_object, failing_object, successful_object]
             processor.do_engine_steps(save=True)
         assert process_instance.status == "complete"
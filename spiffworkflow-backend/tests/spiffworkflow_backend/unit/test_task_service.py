@@ -1,4 +1,7 @@
+from typing import Any
+
 from flask import Flask
+from pytest_mock.plugin import MockerFixture
 from spiffworkflow_backend.models.bpmn_process import BpmnProcessModel
 from spiffworkflow_backend.models.bpmn_process_definition import BpmnProcessDefinitionModel
 from spiffworkflow_backend.models.task import TaskModel  # noqa: F401
@@ -176,3 +179,77 @@ class TestTaskService(BaseTest):
         assert signal_event["event"]["name"] == "eat_spam"
         assert signal_event["event"]["typename"] == "SignalEventDefinition"
         assert signal_event["label"] == "Eat Spam"
+
+    def test_hashes_the_data_of_each_bpmn_process_once_per_save(
+        self,
+        app: Flask,
+        mocker: MockerFixture,
+        with_db_and_bpmn_file_cleanup: None,
+    ) -> None:
+        bpmn_file_names = [
+            "call_activity_level_3",
+            "call_activity_level_2b",
+            "call_activity_level_2",
+        ]
+        for bpmn_file_name in bpmn_file_names:
+            load_test_spec(
+                f"test_group/{bpmn_file_name}",
+                process_model_source_directory="call_activity_nested",
+                bpmn_file_name=bpmn_file_name,
+            )
+        process_model = load_test_spec(
+            "test_group/call_activity_nested",
+            process_model_source_directory="call_activity_nested",
+            bpmn_file_name="call_activity_nested",
+        )
+        process_instance = self.create_process_instance_from_process_model(process_model)
+
+        # the bpmn processes whose workflow data was hashed between each save.
+        # new bpmn processes are also hashed once when they are created, from the dict they are created with.
+        hashed_bpmn_processes: list[list[BpmnProcessModel]] = [[]]
+        original_update_task_data_on_bpmn_process = TaskService.update_task_data_on_bpmn_process
+        original_save_objects_to_database = TaskService.save_objects_to_database
+
+        def update_task_data_on_bpmn_process(task_service: TaskService, bpmn_process: BpmnProcessModel, **kwargs: Any) -> Any:
+            if kwargs.get("bpmn_process_instance") is not None:
+                hashed_bpmn_processes[-1].append(bpmn_process)
+            return original_update_task_data_on_bpmn_process(task_service, bpmn_process, **kwargs)
+
+        def save_objects_to_database(task_service: TaskService, **kwargs: Any) -> None:
+            original_save_objects_to_database(task_service, **kwargs)
+            hashed_bpmn_processes.append([])
+
+        mocker.patch.object(TaskService, "update_task_data_on_bpmn_process", update_task_data_on_bpmn_process)
+        mocker.patch.object(TaskService, "save_objects_to_database", save_objects_to_database)
+
+        processor = ProcessInstanceProcessor(process_instance)
+        processor.do_engine_steps(save=True, execution_strategy_name="greedy")
+        assert process_instance.status == "complete"
+
+        assert max(len(bpmn_processes) for bpmn_processes in hashed_bpmn_processes) > 1
+        for bpmn_processes in hashed_bpmn_processes:
+            assert len(bpmn_processes) == len({id(bpmn_process) for bpmn_process in bpmn_processes})
+
+    def test_shares_empty_mappings_with_the_caller(
+        self,
+        app: Flask,
+        with_db_and_bpmn_file_cleanup: None,
+    ) -> None:
+        process_model = load_test_spec(
+            process_model_id="test_group/simple_script",
+            process_model_source_directory="simple_script",
+        )
+        process_instance = self.create_process_instance_from_process_model(process_model)
+        processor = ProcessInstanceProcessor(process_instance)
+        task_model_mapping: dict[str, TaskModel] = {}
+        bpmn_subprocess_mapping: dict[str, BpmnProcessModel] = {}
+        task_service = TaskService(
+            process_instance=process_instance,
+            serializer=processor._serializer,
+            bpmn_definition_to_task_definitions_mappings=processor.bpmn_definition_to_task_definitions_mappings,
+            task_model_mapping=task_model_mapping,
+            bpmn_subprocess_mapping=bpmn_subprocess_mapping,
+        )
+        # the caller keeps using these after the save so the tasks the service adds have to show up in them
+        assert task_service.task_model_mapping is task_model_mapping
+        assert task_service.bpmn_subprocess_mapping is bpmn_subprocess_mapping
@@ -1,6 +1,11 @@
+import pytest
 from flask import Flask
+from pytest_mock.plugin import MockerFixture
+from SpiffWorkflow.util.task import TaskState  # type: ignore
 from spiffworkflow_backend.models.task import TaskModel  # noqa: F401
 from spiffworkflow_backend.services.process_instance_processor import ProcessInstanceProcessor
+from spiffworkflow_backend.services.task_service import TaskService
+from spiffworkflow_backend.services.workflow_execution_service import TaskRunnability
 
 from tests.spiffworkflow_backend.helpers.base_test import BaseTest
 from tests.spiffworkflow_backend.helpers.test_data import load_test_spec
@@ -28,3 +33,109 @@ class TestWorkflowExecutionService(BaseTest):
         self.complete_next_manual_task(processor)
         assert process_instance.last_milestone_bpmn_name == "Completed"
         assert process_instance.status == "complete"
+
+    def test_only_saves_tasks_that_have_changed(
+        self,
+        app: Flask,
+        with_db_and_bpmn_file_cleanup: None,
+        mocker: MockerFixture,
+    ) -> None:
+        process_model = load_test_spec(
+            process_model_id="test_group/manual_task",
+            process_model_source_directory="manual_task",
+        )
+        process_instance = self.create_process_instance_from_process_model(process_model=process_model)
+        processor = ProcessInstanceProcessor(process_instance)
+        processor.do_engine_steps(save=True)
+
+        processor = ProcessInstanceProcessor(process_instance)
+        update_task_model_spy = mocker.spy(TaskService, "update_task_model")
+        processor.do_engine_steps(save=True)
+        assert update_task_model_spy.call_count == 0
+
+        manual_task = processor.get_ready_user_tasks()[0]
+        manual_task.data["the_new_var"] = "changed"
+        processor.do_engine_steps(save=True)
+        assert update_task_model_spy.call_count == 1
+        task_model = TaskModel.query.filter_by(guid=str(manual_task.id)).first()
+        assert task_model is not None
+        assert task_model.json_data()["the_new_var"] == "changed"
+        self._assert_tasks_in_database_match_workflow(processor)
+
+    # these cover the cases the comment in TaskModelSavingDelegate.add_object_to_db_session calls out:
+    # boundary events and the call activities and multiinstance tasks that PP1 relies on.
+    @pytest.mark.parametrize(
+        "process_model_source_directory,bpmn_file_name",
+        [
+            ("user-task-with-timer", "user_task_with_timer.bpmn"),
+            ("boundary_event_reset", None),
+            ("multiinstance_manual_task", None),
+            ("call_activity_with_manual_task", None),
+        ],
+    )
+    def test_saved_tasks_match_the_workflow_when_reloading_between_steps(
+        self,
+        app: Flask,
+        with_db_and_bpmn_file_cleanup: None,
+        process_model_source_directory: str,
+        bpmn_file_name: str | None,
+    ) -> None:
+        process_model = load_test_spec(
+            process_model_id=f"test_group/{process_model_source_directory}",
+            process_model_source_directory=process_model_source_directory,
+            bpmn_file_name=bpmn_file_name,
+        )
+        process_instance = self.create_process_instance_from_process_model(process_model=process_model)
+        processor = ProcessInstanceProcessor(process_instance)
+        processor.do_engine_steps(save=True)
+        self._assert_tasks_in_database_match_workflow(processor)
+
+        while len(processor.get_ready_user_tasks()) > 0:
+            processor = ProcessInstanceProcessor(process_instance)
+            processor.do_engine_steps(save=True)
+            self._assert_tasks_in_database_match_workflow(processor)
+            self.complete_next_manual_task(processor)
+            self._assert_tasks_in_database_match_workflow(processor)
+
+        assert process_instance.status == "complete"
+
+    def test_time_sliced_strategy_stops_after_its_budget_and_reports_ready_tasks(
+        self,
+        app: Flask,
+        with_db_and_bpmn_file_cleanup: None,
+    ) -> None:
+        process_model = load_test_spec(
+            process_model_id="test_group/multiinstance_with_subprocess_and_large_dataset",
+            process_model_source_directory="multiinstance_with_subprocess_and_large_dataset",
+        )
+        process_instance = self.create_process_instance_from_process_model(process_model=process_model)
+        slice_count = 0
+        with self.app_config_mock(app, "SPIFFWORKFLOW_BACKEND_ENGINE_STEP_TIME_SLICE_MAX_STEPS", 100):
+            while process_instance.status != "complete":
+                # load the instance each time like a worker picking it up from the queue would
+                processor = ProcessInstanceProcessor(process_instance)
+                task_runnability = processor.do_engine_steps(save=True, execution_strategy_name="time_sliced")
+                slice_count += 1
+                if process_instance.status != "complete":
+                    assert task_runnability == TaskRunnability.has_ready_tasks
+                    self._assert_tasks_in_database_match_workflow(processor)
+                assert slice_count < 100
+
+        assert slice_count > 1
+        assert processor.get_data()["loop_cnt"] == 5
+
+    def _assert_tasks_in_database_match_workflow(self, processor: ProcessInstanceProcessor) -> None:
+        task_models = {
+            t.guid: t for t in TaskModel.query.filter_by(process_instance_id=processor.process_instance_model.id).all()
+        }
+        workflows = [processor.bpmn_process_instance, *processor.bpmn_process_instance.subprocesses.values()]
+        for workflow in workflows:
+            for spiff_task in workflow.get_tasks():
+                task_dict = processor._serializer.to_dict(spiff_task)
+                task_model = task_models[task_dict["id"]]
+                assert task_model.state == TaskState.get_name(spiff_task.state)
+                assert task_model.properties_json["children"] == task_dict["children"]
+                assert task_model.properties_json["last_state_change"] == task_dict["last_state_change"]
+                # data for tasks that finished before the processor was loaded is not loaded into the workflow
+                if not spiff_task.has_state(TaskState.FINISHED_MASK):
+                    assert task_model.json_data() == task_dict["data"]